@@ -0,0 +1,136 @@
+'''多实例分片轮询测试：在一台机器上启动多个进程，每个进程是一个独立的插件实例，共用一个 SQLite 协调库
+每个进程各自带一份相同种子的模拟 Steam API，按全局轮次推进状态，因此所有进程看到的是同一组玩家的同一段历史。
+统计每轮各实例负责的玩家数与请求数、各实例收到的状态变化（本实例检测 + 其他实例转发）与发送的通知；
+--kill 指定的实例在 --kill-round 轮直接退出（不释放租约），用于验证租约过期后的接管。
+
+需要在已安装 AstrBot 的环境中运行，例如：
+    python data/plugins/astrbot_plugin_steam_status_monitor/bench/cluster_bench.py --instances 3 --players 1000 --kill 0'''
+import os
+import sys
+import time
+import types
+import shutil
+import asyncio
+import argparse
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from mock_steam import MockSteamAPI
+import run_bench
+
+async def run_worker(idx, args, db_path, t0, queue):
+    workdir = tempfile.mkdtemp(prefix=f"steam_cluster_{idx}_")
+    try:
+        target, main_module = run_bench.load_plugin_package(workdir)
+        mock = MockSteamAPI(args.players, latency=args.latency, churn=args.churn, seed=args.seed)
+        bench_args = types.SimpleNamespace(backend="partitioned")
+        plugin, context = await run_bench.make_plugin(
+            main_module, mock, bench_args,
+            poll_interval_sec=args.period,
+            cluster_db_path=db_path,
+            cluster_instance_id=f"bench-{idx}",
+            cluster_shard_count=args.shards,
+            cluster_lease_ttl_sec=args.lease_ttl,
+        )
+        plugin.running = True
+        mock_round = 0
+        for r in range(args.rounds):
+            await asyncio.sleep(max(0, t0 + r * args.period - time.time()))
+            if idx == args.kill and r == args.kill_round:
+                # 模拟进程崩溃：不调用 terminate，租约留在库里等待过期
+                queue.put(("killed", idx, r))
+                queue.close()
+                queue.join_thread()
+                os._exit(0)
+            while mock_round < r:
+                mock.advance()
+                mock_round += 1
+            mock.reset_counters()
+            await plugin._cluster_sync()
+            await plugin.check_status_change()
+            queue.put((
+                "round", idx, r, len(plugin.polled_ids()), mock.requests["summaries"],
+                sorted(plugin.cluster.shards)
+            ))
+        # 最后一轮发布的转换留给其他实例拉取
+        await asyncio.sleep(max(0, t0 + args.rounds * args.period - time.time()))
+        await plugin._cluster_sync()
+        await plugin.notifier.close()
+        m = plugin.metrics
+        queue.put((
+            "done", idx,
+            m.counter_value("steam_transitions_total"),
+            m.counter_value("steam_cluster_transitions_applied_total"),
+            plugin.notifier.sent,
+            plugin.cluster.takeovers,
+        ))
+        await plugin.terminate()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def worker(idx, args, db_path, t0, queue):
+    asyncio.run(run_worker(idx, args, db_path, t0, queue))
+
+def main():
+    parser = argparse.ArgumentParser(description="多实例分片轮询测试（本地模拟 Steam API）")
+    parser.add_argument("--instances", type=int, default=3, help="实例（进程）数")
+    parser.add_argument("--players", type=int, default=1000, help="玩家数，所有实例监控同一组玩家")
+    parser.add_argument("--rounds", type=int, default=12, help="轮询轮数")
+    parser.add_argument("--period", type=float, default=1.0, help="每轮间隔（秒）")
+    parser.add_argument("--shards", type=int, default=16, help="分片数")
+    parser.add_argument("--lease-ttl", type=float, default=3.0, help="租约有效期（秒）")
+    parser.add_argument("--latency", type=float, default=0.01, help="模拟接口延迟（秒）")
+    parser.add_argument("--churn", type=float, default=0.05, help="每轮状态变化的玩家比例")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--kill", type=int, default=-1, help="在 --kill-round 轮退出的实例编号（-1 不退出）")
+    parser.add_argument("--kill-round", type=int, default=4)
+    parser.add_argument("--startup", type=float, default=5.0, help="预留给各进程导入插件的时间（秒）")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="steam_cluster_")
+    db_path = os.path.join(workdir, "cluster.db")
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    t0 = time.time() + args.startup
+    procs = [ctx.Process(target=worker, args=(i, args, db_path, t0, queue)) for i in range(args.instances)]
+    for p in procs:
+        p.start()
+    rounds = {}
+    done = {}
+    finished = 0
+    while finished < args.instances:
+        msg = queue.get(timeout=args.startup + args.rounds * args.period + 60)
+        if msg[0] == "round":
+            _, idx, r, polled, requests, shards = msg
+            rounds.setdefault(r, {})[idx] = (polled, requests, shards)
+        elif msg[0] == "killed":
+            print(f"实例 {msg[1]} 在第 {msg[2]} 轮退出（未释放租约）")
+            finished += 1
+        else:
+            done[msg[1]] = msg[2:]
+            finished += 1
+    for p in procs:
+        p.join()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    single = -(-args.players // 100)
+    print(f"== 每轮各实例负责的玩家数 / GetPlayerSummaries 请求数（单实例每轮 {single} 次） ==")
+    for r in sorted(rounds):
+        row = rounds[r]
+        cells = "  ".join(
+            f"#{i}: {row[i][0]:>5} 人 {row[i][1]:>3} 次 {len(row[i][2]):>2} 片" if i in row else f"#{i}: {'-':>17}"
+            for i in range(args.instances)
+        )
+        covered = sum(v[0] for v in row.values())
+        print(f"第{r:>3}轮  {cells}  合计 {covered} 人 {sum(v[1] for v in row.values())} 次")
+    print("== 各实例收到的状态变化与通知 ==")
+    for i in sorted(done):
+        local, applied, sent, takeovers = done[i]
+        print(
+            f"#{i}: 本实例检测 {local:.0f} 条 + 其他实例转发 {applied:.0f} 条 = {local + applied:.0f} 条，"
+            f"发送通知 {sent} 条，接管分片 {takeovers} 次"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+'''本地模拟的 Steam API（GetPlayerSummaries / ResolveVanityURL / GetRecentlyPlayedGames / appdetails），通过 httpx.MockTransport 接入插件的共享 HTTP 客户端
+可配置响应延迟、错误率以及每轮玩家状态变化比例（churn）；每推进一轮，游戏中的玩家累计 round_minutes 分钟游戏时长；
+key_status 可为指定 API Key 固定返回某个状态码（如 {"bad": 403, "busy": 429}），用于测试多 Key 池'''
+import json
+import time
+import random
+import asyncio
+from collections import Counter
+from urllib.parse import parse_qs
+
+import httpx
+
+SUMMARIES_PATH = "/ISteamUser/GetPlayerSummaries/v2/"
+APPDETAILS_PATH = "/api/appdetails"
+VANITY_PATH = "/ISteamUser/ResolveVanityURL/v1/"
+RECENT_GAMES_PATH = "/IPlayerService/GetRecentlyPlayedGames/v1/"
+
+class MockSteamAPI:
+    def __init__(self, player_count, app_count=200, latency=0.05, error_rate=0.0, churn=0.05, seed=0,
+                 key_status=None, round_minutes=1):
+        self.latency = latency
+        self.round_minutes = round_minutes
+        self.playtime = {}  # steamid -> {appid: 模拟开始后累计的分钟数}
+        self.key_status = dict(key_status or {})
+        self.error_rate = error_rate
+        self.churn = churn
+        self.random = random.Random(seed)
+        self.apps = [str(10 + i * 10) for i in range(app_count)]
+        self.steam_ids = [str(76561198000000000 + i) for i in range(player_count)]
+        now = int(time.time())
+        self.players = {}
+        for sid in self.steam_ids:
+            self.players[sid] = {
+                "steamid": sid,
+                "personaname": f"player{sid[-5:]}",
+                "personastate": 0,
+                "lastlogoff": now - self.random.randint(0, 7 * 86400),
+            }
+            self._randomize(self.players[sid])
+        self.requests = Counter()
+        self.errors = Counter()
+        self.key_requests = Counter()
+
+    def _randomize(self, player):
+        roll = self.random.random()
+        player.pop("gameid", None)
+        player.pop("gameextrainfo", None)
+        if roll < 0.2:
+            appid = self.random.choice(self.apps)
+            player["personastate"] = 1
+            player["gameid"] = appid
+            player["gameextrainfo"] = f"Game {appid}"
+        elif roll < 0.4:
+            player["personastate"] = 1
+        else:
+            if player["personastate"]:
+                # 与 Steam 一致：在线玩家下线时记录下线时间
+                player["lastlogoff"] = int(time.time())
+            player["personastate"] = 0
+
+    def advance(self):
+        '''模拟一轮状态变化：按 churn 比例随机改变玩家状态，返回变化的玩家数'''
+        for sid, player in self.players.items():
+            if player.get("gameid"):
+                games = self.playtime.setdefault(sid, {})
+                games[player["gameid"]] = games.get(player["gameid"], 0) + self.round_minutes
+        changed = self.random.sample(self.steam_ids, int(len(self.steam_ids) * self.churn))
+        for sid in changed:
+            self._randomize(self.players[sid])
+        return len(changed)
+
+    def reset_counters(self):
+        self.requests.clear()
+        self.errors.clear()
+        self.key_requests.clear()
+
+    async def handler(self, request):
+        path = request.url.path
+        endpoint = {
+            SUMMARIES_PATH: "summaries", APPDETAILS_PATH: "appdetails", VANITY_PATH: "vanity",
+            RECENT_GAMES_PATH: "recent_games",
+        }.get(path, path)
+        self.requests[endpoint] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        params = parse_qs(request.url.query.decode())
+        key = params.get("key", [None])[0]
+        if key is not None:
+            self.key_requests[key] += 1
+            if key in self.key_status:
+                self.errors[endpoint] += 1
+                return httpx.Response(self.key_status[key], headers={"Retry-After": "30"})
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.errors[endpoint] += 1
+            return httpx.Response(self.random.choice([429, 500, 503]))
+        if endpoint == "summaries":
+            ids = params.get("steamids", [""])[0].split(",")
+            players = [dict(self.players[sid]) for sid in ids if sid in self.players]
+            return httpx.Response(200, json={"response": {"players": players}})
+        if endpoint == "vanity":
+            # 自定义链接名即玩家昵称（player + SteamID 末五位）
+            name = params.get("vanityurl", [""])[0]
+            sid = next((sid for sid, p in self.players.items() if p["personaname"] == name), None)
+            if sid is None:
+                return httpx.Response(200, json={"response": {"success": 42, "message": "No match"}})
+            return httpx.Response(200, json={"response": {"success": 1, "steamid": sid}})
+        if endpoint == "recent_games":
+            sid = params.get("steamid", [""])[0]
+            games = [
+                {"appid": int(appid), "name": f"Game {appid}", "playtime_2weeks": minutes,
+                 "playtime_forever": 1000 + minutes}
+                for appid, minutes in self.playtime.get(sid, {}).items()
+            ]
+            return httpx.Response(200, json={"response": {"total_count": len(games), "games": games}})
+        if endpoint == "appdetails":
+            appid = params.get("appids", [""])[0]
+            lang = params.get("l", ["en"])[0]
+            if appid not in self.apps:
+                return httpx.Response(200, json={appid: {"success": False}})
+            name = f"游戏 {appid}" if lang == "schinese" else f"Game {appid}"
+            return httpx.Response(200, json={appid: {"success": True, "data": {"name": name}}})
+        return httpx.Response(404, content=json.dumps({"error": "not mocked"}))
+
+    def transport(self):
+        return httpx.MockTransport(self.handler)
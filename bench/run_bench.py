@@ -0,0 +1,251 @@
+'''性能基准：用本地模拟的 Steam API 驱动插件入口，统计轮询延迟、每轮请求数、内存与日志查询开销
+
+需要在已安装 AstrBot 的环境中运行（插件依赖 astrbot.api），例如在 AstrBot 根目录下：
+    python data/plugins/astrbot_plugin_steam_status_monitor/bench/run_bench.py --ids 10,100,1000,10000 --logs 10000,1000000
+
+插件会被复制到临时目录后再导入，基准产生的日志、缓存、快照文件不会写进插件目录。'''
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import tempfile
+import importlib
+import tracemalloc
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from mock_steam import MockSteamAPI
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = "steam_status_monitor_bench"
+DATA_FILES = (
+    "game_log.json", "game_log.jsonl", "game_log.db", "game_log_rollup.json", "game_log_rollup", "game_name_cache.json",
+    "state_snapshot.json", "subscriptions.json", "game_log", "avatar_cache", "cluster.db",
+    "reconcile_state.json",
+)
+
+class FakeContext:
+    '''只记录发送的消息，不连接任何平台'''
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send_message(self, session, chain):
+        self.sent += 1
+
+    def get_platform(self, name):
+        return None
+
+class FakeEvent:
+    unified_msg_origin = "bench:GroupMessage:1"
+
+    def plain_result(self, text):
+        return text
+
+def load_plugin_package(workdir):
+    '''把插件复制到临时目录并以独立包名导入'''
+    target = os.path.join(workdir, PACKAGE)
+    shutil.copytree(
+        PLUGIN_DIR, target,
+        ignore=shutil.ignore_patterns("bench", ".git", "__pycache__", *DATA_FILES)
+    )
+    sys.path.insert(0, workdir)
+    return target, importlib.import_module(f"{PACKAGE}.main")
+
+def clear_data(target):
+    for name in DATA_FILES:
+        path = os.path.join(target, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+def bench_config(steam_ids, args):
+    return {
+        "steam_api_key": "bench",
+        "steam_ids": list(steam_ids),
+        "poll_interval_sec": 60,
+        "retry_times": 1,
+        "adaptive_polling": False,
+        "api_rate_per_sec": 1e6,
+        "api_daily_limit": 10**9,
+        "store_rate_per_sec": 1e6,
+        "notify_coalesce_sec": 0,
+        "game_log_backend": args.backend,
+    }
+
+async def make_plugin(main_module, mock, args, **overrides):
+    context = FakeContext()
+    plugin = main_module.SteamStatusMonitor(context, {**bench_config(mock.steam_ids, args), **overrides})
+    # 替换共享 HTTP 客户端的传输层，所有请求都落到本地模拟接口
+    await plugin.http_client.aclose()
+    plugin.http_client = httpx.AsyncClient(transport=mock.transport())
+    await plugin._restore_task
+    await plugin.subscriptions.subscribe(FakeEvent.unified_msg_origin)
+    return plugin, context
+
+async def drain(gen):
+    async for _ in gen:
+        pass
+
+def fmt_ms(seconds):
+    return f"{seconds * 1000:9.1f} ms"
+
+def fmt_mb(nbytes):
+    return "-" if nbytes is None else f"{nbytes / 1024 / 1024:.1f}MB"
+
+async def traced(coro_factory):
+    '''在 tracemalloc 下执行一次，返回新增内存字节数（tracemalloc 会显著拖慢执行，因此与计时分开测）'''
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        await coro_factory()
+        return tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+async def bench_polling(main_module, target, args):
+    print("== 轮询 / 指令延迟 ==")
+    print(f"{'玩家数':>8} {'首轮(冷缓存)':>14} {'轮询中位数':>12} {'每轮请求':>8} {'/steam list':>13} {'list live':>12} {'内存':>10}")
+    for n in args.ids:
+        clear_data(target)
+        mock = MockSteamAPI(n, latency=args.latency, error_rate=args.error_rate, churn=args.churn, seed=n)
+        plugin, context = await make_plugin(main_module, mock, args)
+        t = time.perf_counter()
+        await plugin.check_status_change()
+        cold = time.perf_counter() - t
+        latencies = []
+        requests = []
+        for _ in range(args.rounds):
+            mock.advance()
+            mock.reset_counters()
+            t = time.perf_counter()
+            await plugin.check_status_change()
+            latencies.append(time.perf_counter() - t)
+            requests.append(sum(mock.requests.values()))
+        t = time.perf_counter()
+        await drain(main_module.handle_steam_list(plugin, FakeEvent()))
+        list_cached = time.perf_counter() - t
+        t = time.perf_counter()
+        await drain(main_module.handle_steam_list(plugin, FakeEvent(), live=True))
+        list_live = time.perf_counter() - t
+        await plugin.terminate()
+        memory = None
+        if args.memory:
+            # 新建插件实例并完成一轮轮询后的常驻内存
+            clear_data(target)
+
+            async def one_round():
+                traced_plugin, _ = await make_plugin(main_module, mock, args)
+                await traced_plugin.check_status_change()
+                await traced_plugin.terminate()
+                one_round.plugin = traced_plugin
+
+            memory = await traced(one_round)
+        latencies.sort()
+        print(
+            f"{n:>8} {fmt_ms(cold):>14} {fmt_ms(latencies[len(latencies) // 2]):>12} "
+            f"{sum(requests) / len(requests):>8.1f} {fmt_ms(list_cached):>13} {fmt_ms(list_live):>12} "
+            f"{fmt_mb(memory):>10}"
+        )
+
+def write_log_file(path, records, player_ids, span):
+    '''直接生成 JSONL 日志文件（比逐条 record_log 快得多），end_time 均匀分布在最近 span 秒内'''
+    now = int(time.time())
+    rnd = random.Random(records)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(records):
+            end_time = now - span + int(span * i / records)
+            sid = rnd.choice(player_ids)
+            f.write(json.dumps({
+                "steamid": sid, "player_name": f"player{sid[-5:]}", "gameid": "10",
+                "game_name": "游戏 10", "duration": 30.0, "end_time": end_time
+            }, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+async def bench_game_log(main_module, target, args):
+    print("== 游玩记录存储 ==")
+    print(f"{'记录数':>10} {'加载':>12} {'24h查询':>12} {'/steam log':>12} {'追加一条':>12} {'清理(无删除)':>14} {'内存':>10}")
+    game_log = importlib.import_module(f"{PACKAGE}.game_log")
+    mock = MockSteamAPI(args.log_players, latency=0, seed=1)
+    for records in args.logs:
+        clear_data(target)
+        write_log_file(os.path.join(target, "game_log.jsonl"), records, mock.steam_ids, args.log_span_days * 86400)
+        if args.backend == "partitioned":
+            # 先完成一次导入与冷分区压缩（不计时），测的是稳定运行时的开销
+            prep = game_log.GameLogManager(backend=args.backend, retention_days=0)
+            await prep.maintain()
+            await prep.close()
+        memory = None
+        if args.memory:
+            async def load_only():
+                traced_manager = game_log.GameLogManager(backend=args.backend, retention_days=0)
+                await traced_manager._load()
+                await traced_manager.close()
+                load_only.manager = traced_manager
+
+            memory = await traced(load_only)
+        manager = game_log.GameLogManager(backend=args.backend, retention_days=0)
+        t = time.perf_counter()
+        await manager._load()
+        load = time.perf_counter() - t
+        t = time.perf_counter()
+        await manager.get_logs_24h(mock.steam_ids)
+        query = time.perf_counter() - t
+        t = time.perf_counter()
+        await manager.record_log(mock.steam_ids[0], "p", "10", "游戏 10", 30.0, int(time.time()))
+        append = time.perf_counter() - t
+        t = time.perf_counter()
+        await manager.clear_logs_older_than(args.log_span_days * 24 + 24)
+        prune = time.perf_counter() - t
+        # /steam log 走完整的指令处理流程
+        plugin, _ = await make_plugin(main_module, mock, args)
+        plugin.game_log = manager
+        t = time.perf_counter()
+        await drain(main_module.handle_steam_log(plugin, FakeEvent()))
+        steam_log = time.perf_counter() - t
+        print(
+            f"{records:>10} {fmt_ms(load):>12} {fmt_ms(query):>12} {fmt_ms(steam_log):>12} "
+            f"{fmt_ms(append):>12} {fmt_ms(prune):>14} {fmt_mb(memory):>10}"
+        )
+        await plugin.terminate()
+
+def int_list(text):
+    return [int(x) for x in text.split(",") if x.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Steam 状态监控插件性能基准（本地模拟 Steam API）")
+    parser.add_argument("--ids", type=int_list, default=[10, 100, 1000, 10000], help="玩家数量，逗号分隔")
+    parser.add_argument("--rounds", type=int, default=5, help="每个规模的轮询轮数")
+    parser.add_argument("--latency", type=float, default=0.05, help="模拟接口延迟（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟接口错误率")
+    parser.add_argument("--churn", type=float, default=0.05, help="每轮状态变化的玩家比例")
+    parser.add_argument("--logs", type=int_list, default=[1000, 100000, 1000000], help="日志记录数，逗号分隔")
+    parser.add_argument("--log-players", type=int, default=200, help="日志涉及的玩家数")
+    parser.add_argument("--log-span-days", type=int, default=180, help="日志覆盖的天数")
+    parser.add_argument("--backend", default="partitioned", choices=["partitioned", "jsonl", "sqlite"], help="日志存储后端")
+    parser.add_argument("--memory", action="store_true", help="额外执行一遍 tracemalloc 统计内存（较慢）")
+    parser.add_argument("--skip-poll", action="store_true", help="跳过轮询基准")
+    parser.add_argument("--skip-log", action="store_true", help="跳过日志基准")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="steam_bench_")
+    try:
+        target, main_module = load_plugin_package(workdir)
+
+        async def run():
+            if not args.skip_poll:
+                await bench_polling(main_module, target, args)
+            if not args.skip_log:
+                await bench_game_log(main_module, target, args)
+
+        asyncio.run(run())
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import re
+import time
+import asyncio
+from urllib.parse import quote
+from astrbot.api import logger
+from .player_state import PlayerState
+
+STEAMID64_BASE = 76561197960265728
+RESOLVE_VANITY_URL = "https://api.steampowered.com/ISteamUser/ResolveVanityURL/v1/"
+
+_PROFILE_RE = re.compile(r"steamcommunity\.com/profiles/(\d{17})", re.I)
+_VANITY_URL_RE = re.compile(r"steamcommunity\.com/id/([^/?#\s]+)", re.I)
+_STEAM2_RE = re.compile(r"^STEAM_[0-5]:([01]):(\d+)$", re.I)
+_STEAM3_RE = re.compile(r"^\[?U:1:(\d+)\]?$", re.I)
+_VANITY_RE = re.compile(r"^[A-Za-z0-9_-]{2,32}$")
+
+def parse_entry(token):
+    '''识别一条输入，返回 ("id", SteamID64) / ("vanity", 自定义链接名) / ("invalid", 原文)
+    支持 64 位 SteamID、个人资料链接（/profiles/ 与 /id/）、STEAM_0:X:Y、[U:1:N] 与自定义链接名'''
+    token = token.strip().strip("<>\"'")
+    if token.isdigit():
+        if len(token) == 17 and int(token) > STEAMID64_BASE:
+            return "id", token
+        return "invalid", token
+    match = _PROFILE_RE.search(token)
+    if match:
+        return "id", match.group(1)
+    match = _VANITY_URL_RE.search(token)
+    if match:
+        return "vanity", match.group(1)
+    match = _STEAM2_RE.match(token)
+    if match:
+        return "id", str(STEAMID64_BASE + int(match.group(2)) * 2 + int(match.group(1)))
+    match = _STEAM3_RE.match(token)
+    if match:
+        return "id", str(STEAMID64_BASE + int(match.group(1)))
+    if _VANITY_RE.match(token):
+        return "vanity", token
+    return "invalid", token
+
+def split_entries(text):
+    '''按空白、逗号、分号拆分输入'''
+    return [t for t in re.split(r"[\s,，;；]+", text or "") if t]
+
+async def _resolve_vanity(self, name):
+    '''自定义链接名 -> SteamID64；不存在返回 None，请求失败抛出异常'''
+    resp = await self.steam_get(f"{RESOLVE_VANITY_URL}?vanityurl={quote(name)}")
+    if resp.status_code != 200:
+        raise Exception(f"HTTP {resp.status_code}")
+    data = resp.json().get("response") or {}
+    if data.get("success") == 1 and data.get("steamid"):
+        return str(data["steamid"])
+    return None
+
+async def handle_steam_import(self, event, text, concurrency=8):
+    '''批量导入监控玩家：解析输入 -> 解析自定义链接 -> 去重 -> 按 100 个一批校验 -> 一次性写入配置
+    已在监控列表中的玩家直接跳过，已在轮询缓存中的玩家无需校验，只有未知玩家才会消耗 API 请求'''
+    entries = split_entries(text)
+    if not entries:
+        yield event.plain_result(
+            "用法：/steam import <SteamID / 个人资料链接 / 自定义链接名 ...>，多个之间用空格、逗号或换行分隔"
+        )
+        return
+    requests_before = self.metrics.counter_value("steam_api_requests_total")
+    existing = set(self.STEAM_IDS)
+    ids = []          # 按输入顺序去重后的候选 SteamID
+    seen = set()
+    vanities = {}     # 小写自定义链接名 -> 原文
+    invalid = []
+    duplicated = 0
+    for token in entries:
+        kind, value = parse_entry(token)
+        if kind == "invalid":
+            invalid.append(value)
+        elif kind == "vanity":
+            if value.lower() in vanities:
+                duplicated += 1
+            vanities.setdefault(value.lower(), value)
+        elif value in seen:
+            duplicated += 1
+        else:
+            seen.add(value)
+            ids.append(value)
+
+    cache = self._vanity_cache
+    unresolved = [v for k, v in vanities.items() if k not in cache]
+    if len(unresolved) > concurrency or len(ids) > 100:
+        yield event.plain_result(
+            f"正在导入 {len(entries)} 条：{len(ids)} 个 SteamID，{len(vanities)} 个自定义链接"
+            f"（需解析 {len(unresolved)} 个），请稍候…"
+        )
+    vanity_failed = []
+    vanity_missing = []
+    if unresolved:
+        sem = asyncio.Semaphore(concurrency)
+
+        async def resolve(name):
+            async with sem:
+                try:
+                    cache[name.lower()] = await _resolve_vanity(self, name)
+                except Exception as e:
+                    logger.warning(f"解析自定义链接 {name} 失败: {e}")
+                    vanity_failed.append(name)
+
+        await asyncio.gather(*(resolve(name) for name in unresolved))
+    for key, name in vanities.items():
+        if key not in cache:
+            continue
+        sid = cache[key]
+        if sid is None:
+            vanity_missing.append(name)
+        elif sid in seen:
+            duplicated += 1
+        else:
+            seen.add(sid)
+            ids.append(sid)
+
+    known = [sid for sid in ids if sid in existing]
+    candidates = [sid for sid in ids if sid not in existing]
+    # 已被订阅或其他实例轮询过的玩家已知存在，无需再校验
+    unknown = [sid for sid in candidates if sid not in self.last_states]
+    not_found = []
+    failed = []
+    fetched = {}
+    for i in range(0, len(unknown), 100):
+        chunk = unknown[i:i + 100]
+        players = await self._fetch_summaries_chunk(chunk, self.RETRY_TIMES)
+        if players is None:
+            failed.extend(chunk)
+            continue
+        for player in players:
+            fetched[str(player.get('steamid', ''))] = PlayerState.from_summary(player)
+        not_found.extend(sid for sid in chunk if sid not in fetched)
+
+    now = int(time.time())
+    unknown_set = set(unknown)
+    added = [sid for sid in candidates if sid in fetched or sid not in unknown_set]
+    for sid in added:
+        status = fetched.get(sid)
+        if status is not None:
+            # 导入时已在游戏中的玩家从现在开始计时，下一轮不会误报“开始玩”
+            if status.gameid:
+                status.session_start = now
+            self.last_states[sid] = status
+            self.state_updated_at[sid] = now
+    if added:
+        self.STEAM_IDS.extend(added)
+        self.config['steam_ids'] = self.STEAM_IDS
+        if hasattr(self.config, "save_config"):
+            self.config.save_config()
+
+    lines = [f"导入完成：新增 {len(added)} 个玩家，监控列表共 {len(self.STEAM_IDS)} 个"]
+    if known:
+        lines.append(f"已在监控列表: {len(known)} 个")
+    if duplicated:
+        lines.append(f"输入中重复: {duplicated} 条")
+    if vanities:
+        lines.append(
+            f"自定义链接: {len(vanities)} 个，解析成功 {len(vanities) - len(vanity_missing) - len(vanity_failed)} 个"
+        )
+    for label, items in (
+        ("无法识别", invalid), ("自定义链接不存在", vanity_missing), ("SteamID 不存在", not_found),
+        ("查询失败（未导入，可稍后重试）", failed + vanity_failed),
+    ):
+        if items:
+            more = f" 等 {len(items)} 个" if len(items) > 10 else ""
+            lines.append(f"{label}: {', '.join(items[:10])}{more}")
+    used = self.metrics.counter_value("steam_api_requests_total") - requests_before
+    lines.append(f"本次 API 请求: {used:.0f} 次")
+    yield event.plain_result("\n".join(lines))
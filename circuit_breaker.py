@@ -0,0 +1,69 @@
+import time
+from astrbot.api import logger
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpen(Exception):
+    '''接口熔断中，请求被直接拒绝'''
+
+class CircuitBreaker:
+    '''单个接口的熔断器
+    连续失败 failure_threshold 次后熔断（open），期间请求立即失败，不再发送注定失败的请求；
+    经过 reset_timeout 秒进入半开（half_open），只放行一个探测请求：成功则恢复，失败则继续熔断。'''
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=60):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0      # 熔断次数
+        self.rejected = 0   # 熔断期间拒绝的请求数
+        self._probe_started = None  # 半开状态下探测请求的发出时间
+
+    def allow(self):
+        '''是否放行本次请求；半开状态只放行一个探测请求'''
+        if self.state == CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == OPEN and now - self.opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+            self._probe_started = None
+        # 探测请求被取消、迟迟没有结果时，超过 reset_timeout 再放行一个
+        if self.state == HALF_OPEN and (
+            self._probe_started is None or now - self._probe_started >= self.reset_timeout
+        ):
+            self._probe_started = now
+            return True
+        self.rejected += 1
+        return False
+
+    def check(self):
+        '''放行则返回，否则抛出 CircuitOpen'''
+        if not self.allow():
+            retry_in = max(0, self.reset_timeout - (time.monotonic() - self.opened_at))
+            raise CircuitOpen(f"{self.name} 接口熔断中，约 {retry_in:.0f} 秒后重新探测")
+
+    def record_success(self):
+        if self.state != CLOSED:
+            logger.info(f"{self.name} 接口已恢复，解除熔断")
+        self.state = CLOSED
+        self.failures = 0
+        self._probe_started = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+            if self.state == CLOSED:
+                logger.warning(f"{self.name} 接口连续失败 {self.failures} 次，熔断 {self.reset_timeout} 秒")
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+            self.trips += 1
+            self._probe_started = None
+
+    def summary(self):
+        state = {CLOSED: "正常", OPEN: "熔断", HALF_OPEN: "探测中"}[self.state]
+        return f"{self.name}: {state}，连续失败 {self.failures}，熔断 {self.trips} 次，拒绝 {self.rejected} 次请求"
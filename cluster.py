@@ -0,0 +1,241 @@
+import os
+import json
+import time
+import zlib
+import socket
+import sqlite3
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from astrbot.api import logger
+from .player_state import PlayerState, Transition
+
+class ShardCoordinator:
+    '''多实例分片轮询协调器
+    同一台机器上的多个 AstrBot 实例共用一个 SQLite 文件：
+    - watch 表登记每个实例需要监控的 SteamID，全部实例的并集才是要轮询的玩家；
+    - SteamID 按 crc32 固定分到 shard_count 个分片，每个分片由一个实例持有租约并负责轮询，
+      存活实例按心跳平分分片，多出的分片主动释放给新加入的实例；
+    - 持有者每轮把查到的状态写入 states 表、把状态转换写入 transitions 表，
+      其他实例拉取后更新自己的状态并向自己的会话推送通知；
+    - 实例停止心跳超过 lease_ttl 秒后，其租约过期，由其他实例接管，
+      接管方已通过 states 表拿到这些玩家的最新状态，不会误报“开始游戏”。
+    所有数据库操作都在专用的单线程执行器中执行，不阻塞事件循环。'''
+
+    def __init__(self, path, instance_id=None, shard_count=16, lease_ttl=90, transition_keep_sec=86400):
+        self.path = path
+        self.instance_id = instance_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.shard_count = max(1, int(shard_count))
+        self.lease_ttl = lease_ttl
+        self.transition_keep_sec = transition_keep_sec
+        self.shards = set()     # 当前持有的分片
+        self.owned_ids = []     # 持有分片中、任一实例在监控的 SteamID
+        self.members = 0
+        self.takeovers = 0      # 接管过期租约的次数
+        self._conn = None
+        self._watch_sig = None
+        self._last_transition = None
+        self._states_since = 0.0
+        self._last_cleanup = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="steam_cluster")
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def shard_of(self, steamid):
+        return zlib.crc32(str(steamid).encode()) % self.shard_count
+
+    def _open(self):
+        if self._conn is not None:
+            return
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(
+            "CREATE TABLE IF NOT EXISTS members (instance TEXT PRIMARY KEY, heartbeat REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS leases (shard INTEGER PRIMARY KEY, owner TEXT, expires REAL NOT NULL DEFAULT 0);"
+            "CREATE TABLE IF NOT EXISTS watch (instance TEXT NOT NULL, steamid TEXT NOT NULL, "
+            "PRIMARY KEY (instance, steamid));"
+            "CREATE TABLE IF NOT EXISTS states (steamid TEXT PRIMARY KEY, origin TEXT, data TEXT, updated_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS idx_states_updated ON states (updated_at);"
+            "CREATE TABLE IF NOT EXISTS transitions (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "origin TEXT, created REAL NOT NULL, payload TEXT NOT NULL);"
+        )
+        self._conn = conn
+        if self._last_transition is None:
+            # 只接收加入之后发布的状态转换，历史转换由各自的持有者处理过了
+            row = conn.execute("SELECT COALESCE(MAX(id), 0) FROM transitions").fetchone()
+            self._last_transition = row[0]
+
+    def _rebalance(self, watched):
+        '''心跳、登记监控列表并重新分配租约，返回 (持有分片, 本实例负责轮询的 SteamID)'''
+        self._open()
+        conn = self._conn
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # 本实例的成员记录不在了，说明心跳中断期间被其他实例当作失效实例清理（watch 记录也一并被删）
+            rejoined = conn.execute(
+                "SELECT 1 FROM members WHERE instance = ?", (self.instance_id,)
+            ).fetchone() is None
+            conn.execute(
+                "INSERT INTO members (instance, heartbeat) VALUES (?, ?) "
+                "ON CONFLICT(instance) DO UPDATE SET heartbeat = excluded.heartbeat",
+                (self.instance_id, now)
+            )
+            dead = [r[0] for r in conn.execute(
+                "SELECT instance FROM members WHERE heartbeat < ?", (now - self.lease_ttl,)
+            )]
+            for instance in dead:
+                conn.execute("DELETE FROM members WHERE instance = ?", (instance,))
+                conn.execute("DELETE FROM watch WHERE instance = ?", (instance,))
+            sig = hash(tuple(sorted(watched)))
+            if not rejoined and watched:
+                rejoined = conn.execute(
+                    "SELECT 1 FROM watch WHERE instance = ? LIMIT 1", (self.instance_id,)
+                ).fetchone() is None
+            if sig != self._watch_sig or rejoined:
+                if rejoined and self._watch_sig is not None:
+                    logger.warning(f"实例 {self.instance_id} 曾被判定失效，重新登记监控列表")
+                conn.execute("DELETE FROM watch WHERE instance = ?", (self.instance_id,))
+                conn.executemany(
+                    "INSERT OR IGNORE INTO watch (instance, steamid) VALUES (?, ?)",
+                    [(self.instance_id, sid) for sid in watched]
+                )
+            conn.executemany(
+                "INSERT OR IGNORE INTO leases (shard, owner, expires) VALUES (?, NULL, 0)",
+                [(i,) for i in range(self.shard_count)]
+            )
+            self.members = conn.execute("SELECT COUNT(*) FROM members").fetchone()[0]
+            fair = -(-self.shard_count // self.members)
+            conn.execute(
+                "UPDATE leases SET expires = ? WHERE owner = ?", (now + self.lease_ttl, self.instance_id)
+            )
+            mine = [r[0] for r in conn.execute(
+                "SELECT shard FROM leases WHERE owner = ? AND shard < ? ORDER BY shard",
+                (self.instance_id, self.shard_count)
+            )]
+            if len(mine) > fair:
+                # 多持有的分片释放出来，由新加入的实例认领
+                for shard in mine[fair:]:
+                    conn.execute("UPDATE leases SET owner = NULL, expires = 0 WHERE shard = ?", (shard,))
+                mine = mine[:fair]
+            elif len(mine) < fair:
+                free = conn.execute(
+                    "SELECT shard, owner FROM leases WHERE shard < ? AND (owner IS NULL OR expires < ?) "
+                    "ORDER BY shard LIMIT ?",
+                    (self.shard_count, now, fair - len(mine))
+                ).fetchall()
+                for shard, owner in free:
+                    conn.execute(
+                        "UPDATE leases SET owner = ?, expires = ? WHERE shard = ?",
+                        (self.instance_id, now + self.lease_ttl, shard)
+                    )
+                    if owner and owner != self.instance_id:
+                        self.takeovers += 1
+                        logger.warning(f"接管实例 {owner} 的过期分片 {shard}")
+                    mine.append(shard)
+            ids = [r[0] for r in conn.execute("SELECT DISTINCT steamid FROM watch")]
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._watch_sig = sig
+        shards = set(mine)
+        return shards, [sid for sid in ids if self.shard_of(sid) in shards]
+
+    async def rebalance(self, watched):
+        self.shards, owned = await self._run(self._rebalance, list(watched))
+        # 本实例自己监控的玩家排在前面，保持通知顺序与配置一致
+        order = {sid: i for i, sid in enumerate(watched)}
+        self.owned_ids = sorted(owned, key=lambda sid: order.get(sid, len(order)))
+        return self.owned_ids
+
+    def _publish(self, states, events, now):
+        self._open()
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO states (steamid, origin, data, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(steamid) DO UPDATE SET origin = excluded.origin, data = excluded.data, "
+                "updated_at = excluded.updated_at",
+                [
+                    (sid, self.instance_id, json.dumps(dict(st.to_dict(), session_start=st.session_start)), now)
+                    for sid, st in states.items()
+                ]
+            )
+            conn.executemany(
+                "INSERT INTO transitions (origin, created, payload) VALUES (?, ?, ?)",
+                [
+                    (self.instance_id, now, json.dumps({
+                        "now": now, **{k: getattr(e, k) for k in Transition.__slots__}
+                    }, ensure_ascii=False))
+                    for e in events
+                ]
+            )
+            if now - self._last_cleanup > 3600:
+                self._last_cleanup = now
+                conn.execute("DELETE FROM transitions WHERE created < ?", (now - self.transition_keep_sec,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    async def publish(self, states, events, now):
+        '''发布本实例查到的玩家状态与状态转换'''
+        await self._run(self._publish, states, events, now)
+
+    def _pull(self):
+        self._open()
+        conn = self._conn
+        rows = conn.execute(
+            "SELECT id, payload FROM transitions WHERE id > ? AND origin != ? ORDER BY id",
+            (self._last_transition, self.instance_id)
+        ).fetchall()
+        events = []
+        for row_id, payload in rows:
+            self._last_transition = row_id
+            data = json.loads(payload)
+            now = data.pop("now")
+            events.append((Transition(**data), now))
+        # 同一秒内写入的状态可能晚于上次拉取，窗口回退 1 秒，重复读取无害
+        states = {}
+        for sid, data, updated_at in conn.execute(
+            "SELECT steamid, data, updated_at FROM states WHERE updated_at > ? AND origin != ?",
+            (self._states_since - 1, self.instance_id)
+        ):
+            data = json.loads(data)
+            states[sid] = (PlayerState.from_dict(sid, data, data.get("session_start")), updated_at)
+            self._states_since = max(self._states_since, updated_at)
+        return events, states
+
+    async def pull(self):
+        '''拉取其他实例发布的状态转换 [(Transition, 发生时间)] 与玩家状态 {steamid: (PlayerState, 更新时间)}'''
+        return await self._run(self._pull)
+
+    def _leave(self):
+        '''正常退出：释放租约并注销，其他实例下一轮即可接管，无需等待租约过期'''
+        if self._conn is None:
+            return
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("UPDATE leases SET owner = NULL, expires = 0 WHERE owner = ?", (self.instance_id,))
+        conn.execute("DELETE FROM watch WHERE instance = ?", (self.instance_id,))
+        conn.execute("DELETE FROM members WHERE instance = ?", (self.instance_id,))
+        conn.execute("COMMIT")
+        conn.close()
+        self._conn = None
+
+    async def close(self):
+        try:
+            await self._run(self._leave)
+        except Exception as e:
+            logger.warning(f"释放分片租约失败: {e}")
+        self._executor.shutdown(wait=False)
+
+    def summary(self):
+        shards = ",".join(str(s) for s in sorted(self.shards)) or "无"
+        return (
+            f"分片轮询: 实例 {self.instance_id}，存活实例 {self.members} 个，"
+            f"持有分片 {shards}（共 {self.shard_count}），负责 {len(self.owned_ids)} 个玩家，接管 {self.takeovers} 次"
+        )
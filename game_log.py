@@ -1,32 +1,154 @@
 import os
-import json
 import asyncio
+from astrbot.api import logger
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from .log_store import JsonlLogStore, SqliteLogStore, PartitionedLogStore
+from .rollups import PlaytimeRollup, day_key
+from .player_state import PlayerState
+from .status_text import format_duration
 
 class GameLogManager:
-    def __init__(self):
-        self.log_path = os.path.join(os.path.dirname(__file__), "game_log.json")
+    '''游玩记录管理器
+    默认按自然日分区存储（game_log/ 目录下每天一个只追加写入的 JSONL 文件，批量 fsync，
+    旧分区自动 gzip 压缩，查询只读取与窗口重叠的分区）；
+    backend="jsonl" 为单个 JSONL 文件，backend="sqlite" 为带 (steamid, end_time) 索引的 SQLite 存储。
+    后台任务定期按 retention_days 清理过期记录（0 表示永久保留）。
+    所有磁盘操作都在专用的单线程执行器中串行执行，不阻塞事件循环；
+    并发写入的记录会合并成一次批量写入。
+    每条记录同时累加到按天/玩家/游戏的汇总（PlaytimeRollup），随 fsync 一起落盘（只重写有变化的月份）。'''
+
+    def __init__(self, backend="partitioned", fsync_batch=20, fsync_interval=5,
+                 retention_days=90, compress_after_days=7, maintenance_interval=6 * 3600):
+        base_dir = os.path.dirname(__file__)
+        jsonl_path = os.path.join(base_dir, "game_log.jsonl")
+        legacy_path = os.path.join(base_dir, "game_log.json")
+        if backend == "sqlite":
+            self._store = SqliteLogStore(os.path.join(base_dir, "game_log.db"), jsonl_path, legacy_path)
+        elif backend == "jsonl":
+            self._store = JsonlLogStore(jsonl_path, legacy_path)
+        else:
+            self._store = PartitionedLogStore(os.path.join(base_dir, "game_log"), jsonl_path, legacy_path)
+        self._rollup = PlaytimeRollup(os.path.join(base_dir, "game_log_rollup"))
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="steam_game_log")
         self._lock = asyncio.Lock()
-        self._logs = None
+        self._loaded = False
+        self._pending = []
+        self._fsync_task = None
+        self._compact_task = None
+        self.retention_days = retention_days
+        self.compress_after_days = compress_after_days
+        self.maintenance_interval = maintenance_interval
+        self._maintenance_task = None
+
+    async def _run(self, func, *args):
+        '''在日志专用线程中执行存储操作（单线程，天然串行）'''
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _load_all(self):
+        self._store.load()
+        # 汇总文件缺失时从全部记录重建；否则只补齐上次落盘后写入的记录
+        self._rollup.load()
+        for item in self._store.iter_since(self._rollup.last_end_time):
+            self._rollup.add(item)
+        if self._rollup.dirty:
+            self._rollup.write(self._rollup.dumps())
 
     async def _load(self):
-        if self._logs is not None:
+        if self._loaded:
             return
-        if os.path.exists(self.log_path):
+        async with self._lock:
+            if not self._loaded:
+                await self._run(self._load_all)
+                self._loaded = True
+                self._maintenance_task = asyncio.create_task(self._maintenance_loop())
+
+    async def maintain(self):
+        '''按保留策略清理过期记录，并压缩冷分区（仅分区存储）'''
+        await self._load()
+        now = datetime.now().timestamp()
+        removed = compressed = 0
+        async with self._lock:
+            if self.retention_days:
+                cutoff = int(now - self.retention_days * 86400)
+                removed = await self._run(self._store.prune, cutoff)
+                # 汇总按天清理：早于截止时间所在那天的汇总随记录一起删除
+                if self._rollup.prune_before(day_key(cutoff)):
+                    await self._run(self._rollup.write, self._rollup.dumps())
+            if self.compress_after_days and hasattr(self._store, "compress_before"):
+                compressed = await self._run(
+                    self._store.compress_before, day_key(now - self.compress_after_days * 86400)
+                )
+        if removed and (self._compact_task is None or self._compact_task.done()):
+            self._compact_task = asyncio.create_task(self._compact())
+        if removed or compressed:
+            logger.info(f"游玩记录维护：清理 {removed} 条过期记录，压缩 {compressed} 个分区")
+        return removed, compressed
+
+    async def _maintenance_loop(self):
+        while True:
             try:
-                with open(self.log_path, "r", encoding="utf-8") as f:
-                    self._logs = json.load(f)
-            except Exception:
-                self._logs = []
-        else:
-            self._logs = []
+                await self.maintain()
+            except Exception as e:
+                logger.warning(f"游玩记录维护失败: {e}")
+            await asyncio.sleep(self.maintenance_interval)
+
+    async def _sync(self):
+        '''fsync 游玩记录并保存汇总（调用方持有 _lock）'''
+        await self._run(self._store.sync)
+        if self._rollup.dirty:
+            await self._run(self._rollup.write, self._rollup.dumps())
+
+    async def _append(self, item):
+        self._pending.append(item)
+        async with self._lock:
+            if not self._pending:
+                # 已被前一个持锁者合并写入
+                return
+            batch, self._pending = self._pending, []
+            for item in batch:
+                self._rollup.add(item)
+            await self._run(self._store.append_many, batch)
+            if self._store.unsynced >= self.fsync_batch:
+                await self._sync()
+            elif self._fsync_task is None or self._fsync_task.done():
+                self._fsync_task = asyncio.create_task(self._delayed_fsync())
+
+    async def _delayed_fsync(self):
+        await asyncio.sleep(self.fsync_interval)
+        async with self._lock:
+            await self._sync()
+
+    async def _compact(self):
+        async with self._lock:
+            await self._run(self._store.compact)
 
-    async def _save(self):
+    async def close(self):
+        '''落盘并关闭存储（插件卸载时调用）'''
+        if self._compact_task is not None:
+            await self._compact_task
+        if self._fsync_task is not None:
+            self._fsync_task.cancel()
+        if self._maintenance_task is not None:
+            self._maintenance_task.cancel()
         async with self._lock:
-            with open(self.log_path, "w", encoding="utf-8") as f:
-                json.dump(self._logs, f, ensure_ascii=False, indent=2)
+            if self._loaded:
+                await self._sync()
+            await self._run(self._store.close)
+        self._executor.shutdown(wait=False)
+
+    def size(self):
+        '''已加载的记录条数（尚未加载时为 0）'''
+        return len(self._store) if self._loaded else 0
 
-    async def record_log(self, steamid, player_name, gameid, game_name, duration, end_time):
+    def disk_usage(self):
+        '''游玩记录占用的磁盘空间（字节）'''
+        return self._store.disk_usage() if self._loaded else 0
+
+    async def record_log(self, steamid, player_name, gameid, game_name, duration, end_time, source=None):
+        '''追加一条游玩记录；source="reconcile" 为会话对账写入的校正记录（duration 可为负）'''
         await self._load()
         log_item = {
             "steamid": steamid,
@@ -36,93 +158,104 @@ class GameLogManager:
             "duration": duration,
             "end_time": end_time
         }
-        self._logs.append(log_item)
-        await self._save()
+        if source:
+            log_item["source"] = source
+        await self._append(log_item)
 
-    async def get_logs_24h(self, steam_ids):
+    async def get_logs_by_user(self, steam_ids, since, until=None):
+        '''按玩家分组返回 since <= end_time <= until 的记录，每个玩家的列表按结束时间倒序'''
+        await self._load()
+        return await self._run(self._store.query, list(steam_ids), since, until)
+
+    async def get_playtime_summary(self, steam_ids, days):
+        '''最近 days 天（含今天）的游玩汇总，见 PlaytimeRollup.summarize'''
         await self._load()
+        return self._rollup.summarize(steam_ids, days)
+
+    def player_name(self, steamid):
+        return self._rollup.player_names.get(steamid)
+
+    def game_name(self, gameid):
+        return self._rollup.game_names.get(str(gameid))
+
+    async def get_logs_24h(self, steam_ids):
         now = int(datetime.now().timestamp())
-        logs = []
-        for item in self._logs:
-            if item["steamid"] in steam_ids and now - item["end_time"] <= 86400:
-                logs.append(item)
-        return logs
+        logs_by_user = await self.get_logs_by_user(steam_ids, now - 86400)
+        return [item for user_logs in logs_by_user.values() for item in user_logs]
 
     async def clear_logs_older_than(self, hours):
         '''清除指定小时数以外的日志，返回剩余日志条数'''
         await self._load()
         now = int(datetime.now().timestamp())
         cutoff = now - int(hours * 3600)
-        self._logs = [item for item in self._logs if item.get("end_time", 0) >= cutoff]
-        await self._save()
-        return len(self._logs)
+        async with self._lock:
+            removed = await self._run(self._store.prune, cutoff)
+        if removed:
+            # 只有确实删除了记录才需要压缩重写文件，放到后台执行
+            if self._compact_task is None or self._compact_task.done():
+                self._compact_task = asyncio.create_task(self._compact())
+        return len(self._store)
 
-async def handle_steam_log(self, event):
+async def handle_steam_log(self, event, steam_ids=None):
     '''输出24小时内所有玩家的游玩记录，分玩家分组显示，无记录也列出玩家名。
-    若日志和状态都无玩家名，则实时调用Steam API获取玩家名并缓存。'''
-    logs = await self.game_log.get_logs_24h(self.STEAM_IDS)
-    logs_by_user = {sid: [] for sid in self.STEAM_IDS}
-    for item in logs:
-        logs_by_user[item["steamid"]].append(item)
+    若日志和状态都无玩家名，则实时调用Steam API获取玩家名并缓存。
+    steam_ids 为要列出的玩家（默认全部监控玩家）。'''
+    steam_ids = self.STEAM_IDS if steam_ids is None else steam_ids
+    now = int(datetime.now().timestamp())
+    # 每个玩家的记录已按结束时间倒序排列，无需再排序
+    logs_by_user = await self.game_log.get_logs_by_user(steam_ids, now - 86400)
     # 优化：只查一次API，后续直接用self.last_states缓存
+    if not hasattr(self, "_steam_log_api_checked"):
+        self._steam_log_api_checked = set()
     name_map = {}
-    for sid in self.STEAM_IDS:
+    unresolved = []
+    for sid in steam_ids:
         user_logs = logs_by_user[sid]
         player_name = None
         if user_logs:
-            user_logs.sort(key=lambda x: x["end_time"], reverse=True)
             player_name = user_logs[0].get("player_name")
         if not player_name:
             state = self.last_states.get(sid)
-            if state and state.get('name'):
-                player_name = state.get('name')
+            if state and state.name:
+                player_name = state.name
+            elif sid not in self._steam_log_api_checked:
+                # 只在本地缓存没有时才查API，收集后批量查询
+                unresolved.append(sid)
             else:
-                # 只在本地缓存没有时才查API
-                if sid not in getattr(self, "_steam_log_api_checked", set()):
-                    try:
-                        url = (
-                            "https://api.steampowered.com/ISteamUser/GetPlayerSummaries/v2/"
-                            f"?key={self.API_KEY}&steamids={sid}"
-                        )
-                        import httpx
-                        resp = await httpx.AsyncClient(timeout=10).get(url)
-                        data = resp.json()
-                        players = data.get('response', {}).get('players', [])
-                        if players and players[0].get('personaname'):
-                            player_name = players[0]['personaname']
-                            if sid not in self.last_states:
-                                self.last_states[sid] = {}
-                            self.last_states[sid]['name'] = player_name
-                        else:
-                            player_name = sid
-                    except Exception:
-                        player_name = sid
-                    # 标记已查过API，避免重复查
-                    if not hasattr(self, "_steam_log_api_checked"):
-                        self._steam_log_api_checked = set()
-                    self._steam_log_api_checked.add(sid)
-                else:
-                    # 已查过API但没查到，直接用sid
-                    player_name = sid
+                # 已查过API但没查到，直接用sid
+                player_name = sid
         name_map[sid] = player_name
+    if unresolved:
+        try:
+            statuses, _ = await self.fetch_players_status(unresolved, retry=1)
+        except Exception:
+            statuses = {}
+        for sid in unresolved:
+            player_name = getattr(statuses.get(sid), 'name', None)
+            if player_name:
+                if sid not in self.last_states:
+                    # 只有名字的占位状态，personastate 为 None 表示尚未轮询过
+                    self.last_states[sid] = PlayerState(sid)
+                self.last_states[sid].name = player_name
+            name_map[sid] = player_name or sid
+            # 标记已查过API，避免重复查
+            self._steam_log_api_checked.add(sid)
     lines = ["[最近24小时游玩记录]"]
-    for sid in self.STEAM_IDS:
+    for sid in steam_ids:
         player_name = name_map[sid]
         lines.append(f"[{player_name}]")
         user_logs = logs_by_user[sid]
         if not user_logs:
             lines.append("  无游玩记录\n")
         else:
-            user_logs.sort(key=lambda x: x["end_time"], reverse=True)
             for item in user_logs:
                 dt = datetime.fromtimestamp(item["end_time"])
                 time_str = dt.strftime("%m-%d %H:%M")
                 game = item["game_name"]
-                duration_min = item['duration']
-                if duration_min < 60:
-                    duration_str = f"{duration_min:.1f}分钟"
+                if item.get("source") == "reconcile":
+                    sign = "补录" if item["duration"] > 0 else "扣除"
+                    lines.append(f"  {time_str} 对账{sign} {format_duration(abs(item['duration']))} {game}")
                 else:
-                    duration_str = f"{duration_min/60:.1f}小时"
-                lines.append(f"  {time_str} 游玩了 {duration_str} {game}")
+                    lines.append(f"  {time_str} 游玩了 {format_duration(item['duration'])} {game}")
             lines.append("")
     yield event.plain_result("\n".join(lines))
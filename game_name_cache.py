@@ -0,0 +1,71 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict
+from .json_file import JsonFile
+
+class GameNameCache:
+    '''appid -> 本地化游戏名 的持久化缓存
+    LRU 淘汰 + TTL 过期；查不到名字的 appid 以短 TTL 的负缓存记录（值为 None），
+    避免下架/锁区游戏每轮都重复请求商店接口。首次访问时才从磁盘加载。'''
+
+    def __init__(self, max_entries=2000, ttl=30 * 86400, negative_ttl=3600):
+        self.cache_path = os.path.join(os.path.dirname(__file__), "game_name_cache.json")
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._file = JsonFile(self.cache_path)
+        self._lock = asyncio.Lock()
+        self._entries = None  # OrderedDict: appid -> [name 或 None, 过期时间戳]
+
+    async def _load(self):
+        if self._entries is not None:
+            return
+        async with self._lock:
+            if self._entries is not None:
+                return
+            entries = OrderedDict()
+            now = time.time()
+            try:
+                data = await self._file.load() or {}
+                # 文件中按最近使用顺序保存，加载时跳过已过期的条目
+                for gid, (name, expires_at) in data.items():
+                    if expires_at > now:
+                        entries[gid] = [name, expires_at]
+            except Exception:
+                entries.clear()
+            self._entries = entries
+            self._evict()
+
+    async def _save(self):
+        await self._file.save(self._entries)
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def size(self):
+        return len(self._entries or ())
+
+    async def get(self, gameid):
+        '''返回 (是否命中, 游戏名)；负缓存命中时游戏名为 None'''
+        await self._load()
+        gid = str(gameid)
+        entry = self._entries.get(gid)
+        if entry is None:
+            return False, None
+        if entry[1] <= time.time():
+            del self._entries[gid]
+            return False, None
+        self._entries.move_to_end(gid)
+        return True, entry[0]
+
+    async def put(self, gameid, name):
+        '''写入游戏名；name 为 None 时写入短期负缓存'''
+        await self._load()
+        gid = str(gameid)
+        ttl = self.ttl if name else self.negative_ttl
+        self._entries[gid] = [name, time.time() + ttl]
+        self._entries.move_to_end(gid)
+        self._evict()
+        await self._save()
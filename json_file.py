@@ -0,0 +1,39 @@
+import os
+import json
+import asyncio
+
+def read_json(path):
+    '''读取 JSON 文件，不存在时返回 None（内容损坏时抛出异常，由调用方决定如何处理）'''
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def write_atomic(path, text):
+    '''先写临时文件并 fsync，再原子替换：中途断电或崩溃时旧文件保持完整'''
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+class JsonFile:
+    '''插件目录下的 JSON 数据文件
+    在事件循环中序列化（得到一致的快照），在线程中落盘；同一文件的写入串行执行。'''
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = asyncio.Lock()
+
+    async def load(self):
+        '''读取文件，不存在时返回 None'''
+        return await asyncio.to_thread(read_json, self.path)
+
+    async def save(self, data):
+        text = dumps(data)
+        async with self._lock:
+            await asyncio.to_thread(write_atomic, self.path, text)
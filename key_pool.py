@@ -0,0 +1,197 @@
+import re
+import time
+import hashlib
+from astrbot.api import logger
+from .quota import ApiQuota, QuotaExceeded, budget_interval
+
+def parse_keys(value):
+    '''steam_api_key 可以是单个 Key、逗号/空白分隔的多个 Key 或列表，返回去重后的 Key 列表'''
+    if isinstance(value, (list, tuple)):
+        items = [str(x) for x in value]
+    else:
+        items = re.split(r"[,，\s]+", str(value or ""))
+    return list(dict.fromkeys(x.strip() for x in items if x.strip()))
+
+def mask(key):
+    return f"{key[:4]}…{key[-4:]}" if len(key) > 8 else key
+
+class ApiKey:
+    '''池中的单个 Key：独立的速率/日配额与停用状态'''
+    __slots__ = ("key", "quota", "benched_until", "bench_reason", "failures")
+
+    def __init__(self, key, rate, daily_limit):
+        self.key = key
+        self.quota = ApiQuota(f"Key {mask(key)}", rate=rate, daily_limit=daily_limit)
+        self.benched_until = 0.0
+        self.bench_reason = None
+        self.failures = 0
+
+    @property
+    def label(self):
+        return mask(self.key)
+
+    @property
+    def key_id(self):
+        '''保存用量时使用的标识，不把 Key 明文写入快照'''
+        return hashlib.sha256(self.key.encode()).hexdigest()[:16]
+
+    def benched(self, now=None):
+        return (now or time.monotonic()) < self.benched_until
+
+class ApiKeyPool:
+    '''多个 Steam Web API Key 组成的池
+    每个 Key 有自己的令牌桶与日配额，每次请求挑选剩余额度最多、且当前可立即发送的 Key，
+    额度相同时轮流使用；吞吐量与日配额随 Key 数量线性增加。
+    返回 403（Key 无效/被封）的 Key 单独停用 bench_sec 秒，返回 429 的 Key 按 Retry-After 暂停，
+    其余 Key 继续工作，不影响轮询。'''
+
+    def __init__(self, keys, rate=5.0, daily_limit=None, bench_sec=3600):
+        self.rate = rate
+        self.daily_limit = daily_limit
+        self.bench_sec = bench_sec
+        self.keys = []
+        self._next = 0
+        self._saved_usage = {}  # key_id -> (日期, 次数)：快照中尚未对应到 Key 的用量
+        self.set_keys(keys)
+
+    def set_keys(self, keys):
+        '''更新 Key 列表，保留已有 Key 的用量与停用状态'''
+        existing = {k.key: k for k in self.keys}
+        self.keys = [existing.get(key) or ApiKey(key, self.rate, self.daily_limit) for key in keys]
+        self._next %= max(1, len(self.keys))
+        self._apply_saved_usage()
+
+    def _apply_saved_usage(self):
+        for k in self.keys:
+            saved = self._saved_usage.pop(k.key_id, None)
+            if saved:
+                k.quota.restore_usage(*saved)
+
+    def usage(self):
+        '''各 Key 的当日用量 {key_id: [日期, 次数]}，用于写入状态快照'''
+        return {k.key_id: list(k.quota.usage()) for k in self.keys}
+
+    def restore_usage(self, data):
+        '''从状态快照恢复当日用量；尚未配置的 Key 的用量在之后 set_keys 时补上'''
+        self._saved_usage.update((key_id, tuple(v)) for key_id, v in (data or {}).items())
+        self._apply_saved_usage()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _usable(self):
+        now = time.monotonic()
+        return [
+            k for k in self.keys
+            if not k.benched(now) and (k.quota.remaining_today() is None or k.quota.remaining_today() > 0)
+        ]
+
+    def has_unblocked(self):
+        '''是否还有未被停用、也未被 429 暂停的 Key'''
+        return any(not k.quota.blocked_for() for k in self._usable())
+
+    async def acquire(self):
+        '''挑选一个 Key 并取得其调用许可；没有可用 Key 时抛出 QuotaExceeded'''
+        usable = self._usable()
+        if not usable:
+            raise QuotaExceeded(f"没有可用的 Steam API Key（{self.brief()}）")
+        n = len(self.keys)
+        index = {id(k): i for i, k in enumerate(self.keys)}
+
+        def rank(k):
+            remaining = k.quota.remaining_today()
+            return (
+                not k.quota.ready(),
+                -(remaining if remaining is not None else float("inf")),
+                (index[id(k)] - self._next) % n
+            )
+
+        key = min(usable, key=rank)
+        self._next = (index[id(key)] + 1) % n
+        await key.quota.acquire()
+        return key
+
+    def report(self, key, status_code, retry_after=None):
+        '''根据响应状态更新 Key：403/401 停用，429 暂停，成功清零连续失败'''
+        if status_code in (401, 403):
+            key.failures += 1
+            key.benched_until = time.monotonic() + self.bench_sec
+            key.bench_reason = f"HTTP {status_code}"
+            logger.warning(f"Steam API Key {key.label} 返回 {status_code}，停用 {self.bench_sec} 秒")
+        elif status_code == 429:
+            key.failures += 1
+            key.quota.penalize(retry_after)
+        elif status_code < 500:
+            key.failures = 0
+            key.bench_reason = None
+
+    @property
+    def used_today(self):
+        return sum(k.quota.used_today for k in self.keys)
+
+    @property
+    def throttled(self):
+        return sum(k.quota.throttled for k in self.keys)
+
+    def remaining_today(self):
+        remaining = [k.quota.remaining_today() for k in self._usable()]
+        if any(r is None for r in remaining):
+            return None
+        return sum(remaining)
+
+    def recovery_in(self):
+        '''没有可用 Key 且有 Key 处于停用中时，返回最早一个恢复的剩余秒数，否则返回 None'''
+        if self._usable():
+            return None
+        now = time.monotonic()
+        waits = [
+            max(k.benched_until - now, k.quota.blocked_for())
+            for k in self.keys
+            if k.benched(now) and (k.quota.remaining_today() is None or k.quota.remaining_today() > 0)
+        ]
+        return min(waits) if waits else None
+
+    def recommended_interval(self, calls_per_round, base_interval):
+        '''按所有可用 Key 的剩余额度之和推算轮询间隔；所有 Key 都被 429 暂停时等到最早恢复的一个，
+        都被停用时等到最早解除停用的一个，只有额度全部用完才等到明天'''
+        usable = self._usable()
+        interval = float(base_interval)
+        if not self.keys:
+            return interval
+        if not usable:
+            recovery = self.recovery_in()
+            if recovery is not None:
+                return max(interval, recovery)
+        else:
+            interval = max(interval, min(k.quota.blocked_for() for k in usable))
+        limit = None if self.daily_limit is None else self.daily_limit * len(usable)
+        reserve = usable[0].quota.reserve_ratio if usable else 0
+        remaining = self.remaining_today() if usable else 0
+        return budget_interval(remaining, limit or 0, reserve, calls_per_round, interval)
+
+    def brief(self):
+        benched = sum(1 for k in self.keys if k.benched())
+        return f"{len(self.keys)} 个 Key，停用 {benched} 个"
+
+    def summary(self):
+        limit = "不限" if self.daily_limit is None else f"{self.daily_limit * len(self.keys)}"
+        remaining = self.remaining_today()
+        left = "" if remaining is None else f"，剩余 {remaining}"
+        return (
+            f"Steam Web API（{self.brief()}）: 今日已用 {self.used_today}/{limit}{left}，"
+            f"429 次数 {self.throttled}"
+        )
+
+    def key_lines(self):
+        '''每个 Key 的用量与状态'''
+        lines = []
+        now = time.monotonic()
+        for k in self.keys:
+            if k.benched(now):
+                state = f"停用中（{k.bench_reason}，{k.benched_until - now:.0f} 秒后恢复）"
+            elif k.quota.blocked_for():
+                state = f"429 暂停 {k.quota.blocked_for():.0f} 秒"
+            else:
+                state = "正常"
+            lines.append(f"  {k.label}: 今日 {k.quota.used_today} 次，429 {k.quota.throttled} 次，{state}")
+        return lines
@@ -0,0 +1,74 @@
+from datetime import datetime
+from .status_text import format_duration
+
+# 统计周期别名 -> 天数（含今天）
+PERIODS = {
+    "day": 1, "today": 1, "日": 1, "今天": 1, "今日": 1,
+    "week": 7, "周": 7, "本周": 7,
+    "month": 30, "月": 30, "本月": 30,
+}
+
+def parse_period(text, default=7):
+    '''解析统计周期：day/week/month 或天数，无法解析返回 None'''
+    text = (text or "").strip().lower()
+    if not text:
+        return default
+    if text in PERIODS:
+        return PERIODS[text]
+    if text.isdigit() and 0 < int(text) <= 366:
+        return int(text)
+    return None
+
+def _player_name(self, sid):
+    state = self.last_states.get(sid)
+    return (state.name if state else None) or self.game_log.player_name(sid) or sid
+
+def _game_name(self, gameid):
+    return self.game_log.game_name(gameid) or gameid or "未知游戏"
+
+async def handle_steam_top(self, event, period="", steam_ids=None, limit=10):
+    '''游玩排行：玩家总时长、热门游戏、最长单局（数据来自增量汇总，与历史长度无关）'''
+    days = parse_period(period)
+    if days is None:
+        yield event.plain_result("无效的统计周期，可用 day / week / month 或天数（如 /steam top 14）")
+        return
+    steam_ids = self.STEAM_IDS if steam_ids is None else steam_ids
+    summary = await self.game_log.get_playtime_summary(steam_ids, days)
+    lines = [f"[最近{days}天游玩排行]"]
+    if not summary["players"]:
+        lines.append("暂无游玩记录")
+        yield event.plain_result("\n".join(lines))
+        return
+    lines.append("🏆 玩家总时长")
+    ranked = sorted(summary["players"].items(), key=lambda x: -x[1])[:limit]
+    for i, (sid, minutes) in enumerate(ranked, 1):
+        lines.append(f"{i}. {_player_name(self, sid)} {format_duration(minutes)}")
+    lines.append("🎮 热门游戏")
+    ranked = sorted(summary["games"].items(), key=lambda x: -x[1][0])[:limit]
+    for i, (gameid, (minutes, sessions, players)) in enumerate(ranked, 1):
+        lines.append(f"{i}. {_game_name(self, gameid)} {format_duration(minutes)}（{players}人，{sessions}局）")
+    lines.append("⏱ 最长单局")
+    for i, (minutes, sid, gameid, end_time) in enumerate(summary["longest"][:5], 1):
+        when = datetime.fromtimestamp(end_time).strftime("%m-%d %H:%M")
+        lines.append(f"{i}. {_player_name(self, sid)} - {_game_name(self, gameid)} {format_duration(minutes)}（{when}结束）")
+    yield event.plain_result("\n".join(lines))
+
+async def handle_playtime_stats(self, event, period, steam_ids=None):
+    '''按玩家列出窗口内的总时长、日均时长与每天的游玩时长'''
+    days = parse_period(period)
+    if days is None:
+        yield event.plain_result("无效的统计周期，可用 day / week / month 或天数（如 /steam stats week）")
+        return
+    steam_ids = self.STEAM_IDS if steam_ids is None else steam_ids
+    summary = await self.game_log.get_playtime_summary(steam_ids, days)
+    lines = [f"[最近{days}天游玩统计]"]
+    for sid in sorted(steam_ids, key=lambda s: -summary["players"].get(s, 0)):
+        total = summary["players"].get(sid, 0)
+        lines.append(f"[{_player_name(self, sid)}]")
+        if not total:
+            lines.append("  无游玩记录")
+            continue
+        lines.append(f"  共 {format_duration(total)}，日均 {format_duration(total / days)}")
+        per_day = summary["daily"].get(sid, {})
+        lines.append("  " + " | ".join(f"{day[5:]} {format_duration(m)}" for day, m in sorted(per_day.items())))
+    yield event.plain_result("\n".join(lines))
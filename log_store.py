@@ -0,0 +1,494 @@
+import os
+import gzip
+import json
+import time
+import bisect
+import sqlite3
+from .rollups import day_key
+
+def _end_time(item):
+    return item.get("end_time", 0)
+
+class JsonlLogStore:
+    '''追加写入的 JSONL 存储：每局游戏一行
+    内存中按 SteamID 维护以 end_time 升序排列的索引，窗口查询用二分定位，
+    清理过期记录只需截掉每个玩家列表的前缀'''
+
+    def __init__(self, path, legacy_path=None):
+        self.path = path
+        self.legacy_path = legacy_path
+        self._index = {}  # steamid -> [记录, ...]（按 end_time 升序）
+        self._count = 0
+        self._file = None
+        self.unsynced = 0
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for records in self._index.values():
+            yield from records
+
+    def _insert(self, item):
+        records = self._index.setdefault(item["steamid"], [])
+        if records and _end_time(records[-1]) > _end_time(item):
+            bisect.insort_right(records, item, key=_end_time)
+        else:
+            # 绝大多数记录按时间顺序到达，直接追加
+            records.append(item)
+        self._count += 1
+
+    def load(self):
+        if os.path.exists(self.path):
+            good_size = 0
+            with open(self.path, "rb") as f:
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        # 末尾半行（写入中途崩溃），丢弃
+                        break
+                    try:
+                        self._insert(json.loads(raw))
+                    except Exception:
+                        pass
+                    good_size += len(raw)
+            if good_size != os.path.getsize(self.path):
+                with open(self.path, "r+b") as f:
+                    f.truncate(good_size)
+        elif self.legacy_path and os.path.exists(self.legacy_path):
+            # 兼容旧版 game_log.json（整个数组），迁移为 JSONL
+            try:
+                with open(self.legacy_path, "r", encoding="utf-8") as f:
+                    for item in json.load(f):
+                        self._insert(item)
+            except Exception:
+                self._index.clear()
+                self._count = 0
+            self.compact()
+
+    @staticmethod
+    def _dump_line(item):
+        return json.dumps(item, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+    def append_many(self, items):
+        for item in items:
+            self._insert(item)
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write("".join(self._dump_line(item) for item in items))
+        self._file.flush()
+        self.unsynced += len(items)
+
+    def sync(self):
+        if self._file is not None and self.unsynced:
+            os.fsync(self._file.fileno())
+        self.unsynced = 0
+
+    def iter_since(self, since):
+        '''遍历 end_time > since 的全部记录（用于重建/补齐汇总）'''
+        for records in self._index.values():
+            yield from records[bisect.bisect_right(records, since, key=_end_time):]
+
+    def query(self, steam_ids, since, until=None):
+        '''返回 {steamid: [记录, ...]}，只包含 since <= end_time <= until 的记录，按 end_time 降序'''
+        result = {}
+        for sid in steam_ids:
+            records = self._index.get(sid)
+            if not records:
+                result[sid] = []
+                continue
+            lo = bisect.bisect_left(records, since, key=_end_time)
+            hi = len(records) if until is None else bisect.bisect_right(records, until, key=_end_time)
+            result[sid] = records[lo:hi][::-1]
+        return result
+
+    def prune(self, cutoff):
+        '''删除 end_time < cutoff 的记录，返回删除条数'''
+        removed = 0
+        for sid in list(self._index):
+            records = self._index[sid]
+            i = bisect.bisect_left(records, cutoff, key=_end_time)
+            if i:
+                del records[:i]
+                removed += i
+            if not records:
+                del self._index[sid]
+        self._count -= removed
+        return removed
+
+    def disk_usage(self):
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def compact(self):
+        '''把内存中的全部记录原子地重写到文件（写临时文件后替换）'''
+        self.close()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for item in self:
+                f.write(self._dump_line(item))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+class SqliteLogStore:
+    '''SQLite 存储，(steamid, end_time) 建索引，适合保存数月历史的部署
+    首次使用时会导入已有的 JSONL / 旧版 JSON 记录'''
+
+    _COLUMNS = ("steamid", "player_name", "gameid", "game_name", "duration", "end_time", "source")
+    _SELECT = "SELECT steamid, player_name, gameid, game_name, duration, end_time, source FROM game_log "
+
+    def __init__(self, path, jsonl_path=None, legacy_path=None):
+        self.path = path
+        self.jsonl_path = jsonl_path
+        self.legacy_path = legacy_path
+        self._conn = None
+        self._count = 0
+        self.unsynced = 0
+
+    def __len__(self):
+        return self._count
+
+    def load(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS game_log ("
+            "id INTEGER PRIMARY KEY, steamid TEXT NOT NULL, player_name TEXT, "
+            "gameid TEXT, game_name TEXT, duration REAL, end_time INTEGER NOT NULL, source TEXT)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(game_log)")}
+        if "source" not in columns:
+            # 旧版本的库没有 source 列（会话对账写入的校正记录为 "reconcile"）
+            self._conn.execute("ALTER TABLE game_log ADD COLUMN source TEXT")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_game_log_sid_end ON game_log (steamid, end_time)"
+        )
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM game_log").fetchone()[0]
+        if not self._count:
+            self._import_existing()
+
+    def _import_existing(self):
+        if not any(p and os.path.exists(p) for p in (self.jsonl_path, self.legacy_path)):
+            return
+        source = JsonlLogStore(self.jsonl_path, self.legacy_path)
+        source.load()
+        source.close()
+        self.append_many(list(source))
+        self.sync()
+
+    def append_many(self, items):
+        self._conn.executemany(
+            "INSERT INTO game_log (steamid, player_name, gameid, game_name, duration, end_time, source) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [tuple(item.get(k) for k in self._COLUMNS) for item in items]
+        )
+        self._count += len(items)
+        self.unsynced += len(items)
+
+    def sync(self):
+        if self.unsynced:
+            self._conn.commit()
+        self.unsynced = 0
+
+    def iter_since(self, since):
+        sql = (
+            self._SELECT + "WHERE end_time > ? ORDER BY end_time"
+        )
+        for row in self._conn.execute(sql, (since,)):
+            yield dict(zip(self._COLUMNS, row))
+
+    def query(self, steam_ids, since, until=None):
+        result = {sid: [] for sid in steam_ids}
+        if not result:
+            return result
+        sql = (
+            self._SELECT + f"WHERE steamid IN ({','.join('?' * len(result))}) AND end_time >= ?"
+        )
+        params = list(result) + [since]
+        if until is not None:
+            sql += " AND end_time <= ?"
+            params.append(until)
+        sql += " ORDER BY end_time DESC"
+        for row in self._conn.execute(sql, params):
+            result[row[0]].append(dict(zip(self._COLUMNS, row)))
+        return result
+
+    def prune(self, cutoff):
+        cur = self._conn.execute("DELETE FROM game_log WHERE end_time < ?", (cutoff,))
+        self._conn.commit()
+        self.unsynced = 0
+        self._count -= cur.rowcount
+        return cur.rowcount
+
+    def disk_usage(self):
+        return sum(os.path.getsize(p) for p in (self.path, self.path + "-wal") if os.path.exists(p))
+
+    def compact(self):
+        # SQLite 删除即生效，无需重写
+        pass
+
+    def close(self):
+        if self._conn is not None:
+            self.sync()
+            self._conn.close()
+            self._conn = None
+
+class PartitionedLogStore:
+    '''按自然日分区的存储：game_log/YYYY-MM-DD.jsonl，每天一个只追加写入的文件
+    最近的（热）分区常驻内存；超过 compress_after_days 天的（冷）分区压缩为 .jsonl.gz，
+    只在查询窗口覆盖到时才读取（保留少量最近读取的冷分区缓存）。
+    冷分区的记录数保存在 index.json 中，统计总数无需解压。
+    首次使用时会导入已有的 game_log.jsonl / 旧版 game_log.json 记录（原文件保留）。'''
+
+    def __init__(self, path, jsonl_path=None, legacy_path=None, cold_cache_size=4):
+        self.path = path
+        self.jsonl_path = jsonl_path
+        self.legacy_path = legacy_path
+        self.cold_cache_size = cold_cache_size
+        self._hot = {}         # day -> [记录, ...]（文件顺序）
+        self._cold = {}        # day -> 记录数
+        self._cold_cache = {}  # day -> [记录, ...]，按读取顺序淘汰
+        self._files = {}       # day -> 追加写入的文件句柄
+        self.unsynced = 0
+
+    def __len__(self):
+        return sum(len(r) for r in self._hot.values()) + sum(self._cold.values())
+
+    def _file_path(self, day, cold=False):
+        return os.path.join(self.path, f"{day}.jsonl.gz" if cold else f"{day}.jsonl")
+
+    def _index_path(self):
+        return os.path.join(self.path, "index.json")
+
+    def _save_index(self):
+        tmp_path = self._index_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._cold, f)
+        os.replace(tmp_path, self._index_path())
+
+    @staticmethod
+    def _read_lines(f):
+        records = []
+        for raw in f:
+            try:
+                records.append(json.loads(raw))
+            except Exception:
+                pass
+        return records
+
+    def _read_hot(self, day):
+        '''读取热分区，丢弃末尾半行（写入中途崩溃）'''
+        path = self._file_path(day)
+        records = []
+        good_size = 0
+        with open(path, "rb") as f:
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break
+                try:
+                    records.append(json.loads(raw))
+                except Exception:
+                    pass
+                good_size += len(raw)
+        if good_size != os.path.getsize(path):
+            with open(path, "r+b") as f:
+                f.truncate(good_size)
+        return records
+
+    def _read_cold(self, day):
+        records = self._cold_cache.pop(day, None)
+        if records is None:
+            with gzip.open(self._file_path(day, cold=True), "rb") as f:
+                records = self._read_lines(f)
+        self._cold_cache[day] = records
+        while len(self._cold_cache) > self.cold_cache_size:
+            self._cold_cache.pop(next(iter(self._cold_cache)))
+        return records
+
+    def _records(self, day):
+        if day in self._hot:
+            return self._hot[day]
+        if day in self._cold:
+            return self._read_cold(day)
+        return []
+
+    def load(self):
+        os.makedirs(self.path, exist_ok=True)
+        index = {}
+        if os.path.exists(self._index_path()):
+            try:
+                with open(self._index_path(), "r", encoding="utf-8") as f:
+                    index = json.load(f)
+            except Exception:
+                index = {}
+        names = sorted(os.listdir(self.path))
+        for name in names:
+            if name.endswith(".jsonl.gz"):
+                day = name[:-len(".jsonl.gz")]
+                if day not in index:
+                    index[day] = len(self._read_cold(day))
+                self._cold[day] = index[day]
+        for name in names:
+            if name.endswith(".jsonl"):
+                day = name[:-len(".jsonl")]
+                if day in self._cold:
+                    # 压缩完成但未来得及删除原文件
+                    os.remove(self._file_path(day))
+                else:
+                    self._hot[day] = self._read_hot(day)
+        self._save_index()
+        if not self._hot and not self._cold:
+            self._import_existing()
+
+    def _import_existing(self):
+        if not any(p and os.path.exists(p) for p in (self.jsonl_path, self.legacy_path)):
+            return
+        source = JsonlLogStore(self.jsonl_path, self.legacy_path)
+        source.load()
+        source.close()
+        self.append_many(sorted(source, key=_end_time))
+        self.sync()
+        self.close()
+
+    def append_many(self, items):
+        by_day = {}
+        for item in items:
+            by_day.setdefault(day_key(_end_time(item)), []).append(item)
+        for day, records in by_day.items():
+            text = "".join(JsonlLogStore._dump_line(item) for item in records)
+            if day in self._cold:
+                # 迟到的记录（如补录的旧会话）以新的 gzip 成员追加到冷分区
+                with gzip.open(self._file_path(day, cold=True), "at", encoding="utf-8") as f:
+                    f.write(text)
+                self._cold[day] += len(records)
+                self._cold_cache.pop(day, None)
+                self._save_index()
+                continue
+            f = self._files.get(day)
+            if f is None:
+                f = self._files[day] = open(self._file_path(day), "a", encoding="utf-8")
+            f.write(text)
+            f.flush()
+            self._hot.setdefault(day, []).extend(records)
+        self.unsynced += len(items)
+
+    def sync(self):
+        if self.unsynced:
+            for f in self._files.values():
+                os.fsync(f.fileno())
+        self.unsynced = 0
+        # 只保留今天的写入句柄
+        today = day_key(time.time())
+        for day in [d for d in self._files if d != today]:
+            self._files.pop(day).close()
+
+    def _days_between(self, since, until=None):
+        first = day_key(since)
+        last = day_key(until) if until is not None else None
+        return [
+            day for day in sorted(set(self._hot) | set(self._cold))
+            if day >= first and (last is None or day <= last)
+        ]
+
+    def iter_since(self, since):
+        for day in self._days_between(since):
+            for item in self._records(day):
+                if _end_time(item) > since:
+                    yield item
+
+    def query(self, steam_ids, since, until=None):
+        '''只读取与窗口重叠的分区'''
+        result = {sid: [] for sid in steam_ids}
+        for day in self._days_between(since, until):
+            for item in self._records(day):
+                records = result.get(item.get("steamid"))
+                end_time = _end_time(item)
+                if records is not None and end_time >= since and (until is None or end_time <= until):
+                    records.append(item)
+        for records in result.values():
+            records.sort(key=_end_time, reverse=True)
+        return result
+
+    def _rewrite(self, day, records):
+        '''原子地重写一个分区（仍保持原来的冷/热形态）'''
+        cold = day in self._cold
+        path = self._file_path(day, cold)
+        if day in self._files:
+            self._files.pop(day).close()
+        tmp_path = path + ".tmp"
+        opener = gzip.open if cold else open
+        with opener(tmp_path, "wt", encoding="utf-8") as f:
+            for item in records:
+                f.write(JsonlLogStore._dump_line(item))
+        os.replace(tmp_path, path)
+        if cold:
+            self._cold[day] = len(records)
+            self._cold_cache.pop(day, None)
+        else:
+            self._hot[day] = records
+
+    def _drop(self, day):
+        if day in self._files:
+            self._files.pop(day).close()
+        cold = day in self._cold
+        os.remove(self._file_path(day, cold))
+        self._cold_cache.pop(day, None)
+        return self._cold.pop(day) if cold else len(self._hot.pop(day))
+
+    def prune(self, cutoff):
+        '''删除 end_time < cutoff 的记录：更早的分区整个删除，只有跨越 cutoff 的那一天需要重写'''
+        cutoff_day = day_key(cutoff)
+        removed = 0
+        for day in sorted(set(self._hot) | set(self._cold)):
+            if day < cutoff_day:
+                removed += self._drop(day)
+            elif day == cutoff_day:
+                records = self._records(day)
+                kept = [item for item in records if _end_time(item) >= cutoff]
+                if len(kept) != len(records):
+                    removed += len(records) - len(kept)
+                    self._rewrite(day, kept)
+        self._save_index()
+        return removed
+
+    def compress_before(self, day):
+        '''把 day 之前的热分区压缩为冷分区，返回压缩的分区数'''
+        compressed = 0
+        for old_day in sorted(d for d in self._hot if d < day):
+            if old_day in self._files:
+                self._files.pop(old_day).close()
+            records = self._hot[old_day]
+            path = self._file_path(old_day, cold=True)
+            with gzip.open(path + ".tmp", "wt", encoding="utf-8") as f:
+                for item in records:
+                    f.write(JsonlLogStore._dump_line(item))
+            os.replace(path + ".tmp", path)
+            self._cold[old_day] = len(records)
+            self._save_index()
+            os.remove(self._file_path(old_day))
+            del self._hot[old_day]
+            compressed += 1
+        return compressed
+
+    def disk_usage(self):
+        return sum(
+            os.path.getsize(os.path.join(self.path, name))
+            for name in os.listdir(self.path) if name.endswith((".jsonl", ".gz"))
+        )
+
+    def compact(self):
+        # 清理时只重写跨越截止时间的分区，无需整体压缩
+        pass
+
+    def close(self):
+        self.sync()
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
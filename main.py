@@ -2,17 +2,36 @@ from astrbot.api.star import Star, register, Context
 from astrbot.api import logger
 from astrbot.api import AstrBotConfig
 from astrbot.api.event import filter, AstrMessageEvent
-from astrbot.api.event import MessageChain
-from astrbot.api.message_components import Plain
 import json
 import time
 import httpx
 import asyncio
 import os
-import random
+from urllib.parse import quote
 from .openbox import handle_openbox  # 新增导入
 from .game_log import GameLogManager, handle_steam_log  # 新增导入
-from .steam_list import handle_steam_list  # 新增导入
+from .steam_list import handle_steam_list, render_status  # 新增导入
+from .game_name_cache import GameNameCache
+from .singleflight import SingleFlight
+from .quota import ApiQuota, QuotaExceeded
+from .key_pool import ApiKeyPool, parse_keys
+from .cluster import ShardCoordinator
+from .bulk_import import handle_steam_import
+from .reconcile import SessionReconciler, handle_reconcile
+from .circuit_breaker import CircuitBreaker, CircuitOpen
+from .scheduler import PollScheduler
+from .notifier import NotificationDispatcher
+from .state_store import StateSnapshotStore
+from .subscriptions import SubscriptionTable, ALL
+from .metrics import Metrics, MetricsHttpServer, endpoint_name
+from .stats import handle_steam_stats
+from .leaderboard import handle_steam_top, handle_playtime_stats
+from .profile_cache import ProfileCache, AvatarCache
+from .player_state import PlayerState, diff_states, START, SWITCH, STOP
+from .status_text import format_duration, play_tail
+
+# GetPlayerSummaries 每次请求最多支持100个SteamID
+STEAM_BATCH_SIZE = 100
 
 @register(
     "steam_status_monitor_test",
@@ -25,37 +44,373 @@ class SteamStatusMonitor(Star):
     def __init__(self, context: Context, config: AstrBotConfig):
         super().__init__(context)
         self.context = context
-        self.last_states = {}
-        self.start_play_times = {}
+        self.last_states = {}  # steamid -> PlayerState（含当前游戏会话的开始时间）
+        self.state_updated_at = {}  # steamid -> 状态最近一次成功刷新的时间戳
         self.running = False
         self.notify_session = None
-        self._game_name_cache = {}
+        # 进行中请求登记表：并发的相同查询共享一次请求
+        self._name_flights = SingleFlight()
+        self._summary_flights = SingleFlight()
+        # steamid -> (状态指纹, 渲染好的状态文本)，状态未变化的玩家直接复用
+        self._status_lines = {}
+        # steamid -> 最近一次发布到分片共享库的时间（未变化的状态定期重新发布，保持其他实例的更新时间）
+        self._cluster_published = {}
+        # /steam import 解析过的自定义链接名（小写）-> SteamID64，不存在为 None
+        self._vanity_cache = {}
+        # 轮询等待期间可被提前唤醒（如所有 Key 停用时更换了新 Key）
+        self._wake = asyncio.Event()
+        # 插件创建的后台任务（保活、后台刷新等），卸载时统一取消
+        self._background = set()
+        # 运行指标：/steam stats 查看，可选导出为 Prometheus 文本
+        self.metrics = Metrics()
         # 统一使用 AstrBot 配置系统
         self.config = config or {}
         logger.info(config)
-        # 兼容旧逻辑，若 config 为空则尝试读取 config.json（可选，建议后续移除）
-        if not self.config:
-            try:
-                config_path = os.path.join(os.path.dirname(__file__), 'config.json')
-                with open(config_path, 'r', encoding='utf-8') as f:
-                    self.config = json.load(f)
-            except Exception as e:
-                logger.error(f"steam_status_monitor 配置读取失败: {e}")
-                self.config = {}
-        # 读取配置项，提供默认值
-        self.API_KEY = self.config.get('steam_api_key', '')
+        self._apply_config()
+        # 插件生命周期内共享的 HTTP 连接池，复用 TCP/TLS 连接，插件卸载时关闭
+        self.http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(self.config.get('http_timeout_sec', 15)),
+            limits=httpx.Limits(
+                max_connections=self.config.get('http_max_connections', 20),
+                max_keepalive_connections=self.config.get('http_max_keepalive', 10),
+                keepalive_expiry=self.config.get('http_keepalive_expiry_sec', 60)
+            )
+        )
+        # Steam Web API 按 Key 计日配额，多个 Key 组成池按剩余额度轮流使用；商店接口无 Key 但有速率限制
+        self.key_pool = ApiKeyPool(
+            self.API_KEYS,
+            rate=self.config.get('api_rate_per_sec', 5),
+            daily_limit=self.config.get('api_daily_limit', 100000) or None,
+            bench_sec=self.config.get('api_key_bench_sec', 3600)
+        )
+        self.store_quota = ApiQuota(
+            "Steam 商店API",
+            rate=self.config.get('store_rate_per_sec', 0.6),
+            burst=20
+        )
+        self._interval_stretched = False
+        # 按接口分别熔断：Steam 故障期间快速跳过，不再发送注定失败的请求
+        self.breakers = {}
+        # 按玩家状态安排查询频率的调度器
+        self.scheduler = PollScheduler(self.POLL_INTERVAL, self.MAX_DETECT_LATENCY)
+        self._poll_task = None
+        # 轮询与 /steam list 触发的后台刷新互斥，同一状态变化只检测、推送一次
+        self._round_lock = asyncio.Lock()
+        # 通知分发器：轮询只入队，由独立任务合并发送
+        self.notifier = NotificationDispatcher(
+            self.context,
+            maxsize=self.config.get('notify_queue_size', 1000),
+            coalesce_window=self.config.get('notify_coalesce_sec', 2),
+            max_retries=self.config.get('notify_retry_times', 3)
+        )
+        self.notifier.start()
+        self.game_log = GameLogManager(
+            backend=self.config.get('game_log_backend', 'partitioned'),
+            retention_days=self.config.get('game_log_retention_days', 90),
+            compress_after_days=self.config.get('game_log_compress_after_days', 7)
+        )  # 新增：游戏日志管理器
+        # 游戏名持久化缓存（含负缓存），重启后无需重新请求商店接口
+        self.game_name_cache = GameNameCache(
+            max_entries=self.config.get('game_name_cache_size', 2000),
+            ttl=self.config.get('game_name_cache_ttl_sec', 30 * 86400),
+            negative_ttl=self.config.get('game_name_negative_ttl_sec', 3600)
+        )
+        # 会话对账：定期用 Steam 记录的游戏时长校正游玩记录，允许使用较长的轮询间隔
+        self.reconciler = SessionReconciler(
+            os.path.join(os.path.dirname(__file__), "reconcile_state.json"),
+            tolerance=self.config.get('reconcile_tolerance_min', 10)
+        )
+        self._reconcile_task = None
+        self._last_reconcile = 0
+        # /steam openbox 的玩家信息缓存与本地头像缓存
+        self.profile_cache = ProfileCache(ttl=self.config.get('openbox_profile_ttl_sec', 300))
+        self.avatar_cache = AvatarCache(max_files=self.config.get('avatar_cache_max_files', 500))
+        # 多实例分片轮询：配置了共享数据库时，各实例只轮询自己持有的分片，状态转换互相转发
+        self.cluster = None
+        if self.config.get('cluster_db_path', ''):
+            self.cluster = ShardCoordinator(
+                self.config.get('cluster_db_path'),
+                instance_id=self.config.get('cluster_instance_id', '') or None,
+                shard_count=self.config.get('cluster_shard_count', 16),
+                lease_ttl=self.config.get('cluster_lease_ttl_sec', 0) or max(90, self.POLL_INTERVAL * 3)
+            )
+        # 会话订阅表：多个群共用一条轮询流水线，按订阅分发通知
+        self.subscriptions = SubscriptionTable()
+        # 状态快照：后台加载，轮询开始前完成恢复
+        self.state_store = StateSnapshotStore()
+        self._last_snapshot = 0
+        self._restore_task = asyncio.create_task(self._restore_state())
+        self._register_metrics()
+        self.metrics_server = None
+        if self.config.get('metrics_http_port', 0):
+            self.metrics_server = MetricsHttpServer(self.metrics, port=self.config.get('metrics_http_port'))
+            self._spawn(self.metrics_server.start())
+        self._last_metrics_export = 0
+        if self.config:
+            self._start_from_config()
+        else:
+            # 兼容旧逻辑，若 config 为空则在后台读取 config.json（可选，建议后续移除）
+            self._spawn(self._load_legacy_config())
+        # 启动保活心跳任务（每30分钟调用一次 get_status）
+        self._spawn(self.keep_alive_task())
+
+    def _spawn(self, coro):
+        '''创建后台任务并保留引用（避免任务被垃圾回收），卸载时统一取消'''
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    def _apply_config(self):
+        '''读取配置项到属性，提供默认值'''
+        # 支持多个 Key（逗号或换行分隔），API_KEY 为第一个，仅用于判断是否已配置
+        self.API_KEYS = parse_keys(self.config.get('steam_api_key', ''))
+        self.API_KEY = self.API_KEYS[0] if self.API_KEYS else ''
+        if hasattr(self, "key_pool"):
+            stalled = self.key_pool.recovery_in() is not None
+            self.key_pool.set_keys(self.API_KEYS)
+            if stalled and self.key_pool.recovery_in() is None:
+                # 轮询正因 Key 全部停用而长时间等待，换了新 Key 后立即恢复
+                self._wake.set()
         self.STEAM_IDS = self.config.get('steam_ids', [])
         self.POLL_INTERVAL = self.config.get('poll_interval_sec', 10)
         self.RETRY_TIMES = self.config.get('retry_times', 3)  # 新增：重试次数
         self.GROUP_ID = self.config.get('notify_group_id', None)
-        self.game_log = GameLogManager()  # 新增：游戏日志管理器
-        # 如果配置了组ID 直接置为启动 并开启线程
+        self.ADAPTIVE_POLLING = self.config.get('adaptive_polling', True)
+        self.MAX_DETECT_LATENCY = self.config.get('max_detect_latency_sec', 600)
+        self.SNAPSHOT_INTERVAL = self.config.get('state_snapshot_interval_sec', 60)
+        self.SESSION_RESUME_GAP = self.config.get('session_resume_gap_sec', 900)
+        self.LIST_FRESH_SEC = self.config.get('list_fresh_sec', 120)
+        self.DEBUG_LOG = self.config.get('debug_log', False)
+        self.RECONCILE_INTERVAL = self.config.get('reconcile_interval_sec', 0)
+        self.METRICS_TEXTFILE = self.config.get('metrics_textfile', '')
+        self.BREAKER_THRESHOLD = self.config.get('breaker_failure_threshold', 5)
+        self.BREAKER_RESET_SEC = self.config.get('breaker_reset_sec', 60)
+        self.HEDGE_AFTER_SEC = self.config.get('hedge_after_sec', 0)
+
+    def _start_from_config(self):
+        '''如果配置了组ID 直接置为启动 并开启轮询任务'''
         if self.GROUP_ID:
             self.running = True
             self.notify_session = self.GROUP_ID
-            asyncio.create_task(self.poll_loop())
-        # 启动保活心跳任务（每30分钟调用一次 get_status）
-        asyncio.create_task(self.keep_alive_task())
+            self._start_polling()
+
+    def _start_polling(self):
+        '''启动轮询任务；已有轮询任务在运行时不重复启动，保证同一时间只有一个轮询循环'''
+        if self._poll_task is None or self._poll_task.done():
+            self._poll_task = asyncio.create_task(self.poll_loop())
+
+    async def _load_legacy_config(self):
+        '''在线程中读取旧版 config.json，避免阻塞事件循环
+        （连接池、日志等组件此时已按默认值创建，旧配置只影响监控相关参数）'''
+        config_path = os.path.join(os.path.dirname(__file__), 'config.json')
+
+        def _read():
+            with open(config_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+
+        try:
+            self.config = await asyncio.to_thread(_read)
+        except Exception as e:
+            logger.error(f"steam_status_monitor 配置读取失败: {e}")
+            return
+        self._apply_config()
+        self._start_from_config()
+
+    async def _restore_state(self):
+        '''加载订阅表并从快照恢复监控状态，失败时从空状态开始'''
+        await self.subscriptions.load()
+        snapshot = await self.state_store.load()
+        if not snapshot:
+            return
+        # 当日 API 用量跨重启累计，日配额不会因重启而重置
+        self.key_pool.restore_usage(snapshot.get("api_usage"))
+        try:
+            await self._apply_snapshot(snapshot)
+        except Exception as e:
+            logger.error(f"从快照恢复状态失败: {e}")
+
+    async def _apply_snapshot(self, snapshot):
+        '''按停机时长决定继续还是结束快照中进行中的游戏会话'''
+        now = int(time.time())
+        saved_at = int(snapshot.get("saved_at") or 0)
+        gap = now - saved_at
+        monitored = set(self.monitored_ids())
+        start_times = snapshot.get("start_play_times") or {}
+        last_states = {
+            sid: PlayerState.from_dict(sid, st, start_times.get(sid))
+            for sid, st in (snapshot.get("last_states") or {}).items() if sid in monitored
+        }
+        updated_at = snapshot.get("state_updated_at") or {}
+        closed = 0
+        if gap > self.SESSION_RESUME_GAP:
+            # 停机太久，无法判断期间是否退出过游戏：会话以快照时间结束，
+            # 丢弃旧状态，下一轮按全新状态检测
+            for sid, state in list(last_states.items()):
+                if state.session_start is None:
+                    continue
+                if state.gameid:
+                    duration_min = (saved_at - int(state.session_start)) / 60
+                    if duration_min > 10:
+                        game_name = await self.get_chinese_game_name(state.gameid, state.gameextrainfo)
+                        await self.game_log.record_log(
+                            steamid=sid,
+                            player_name=state.name or sid,
+                            gameid=state.gameid,
+                            game_name=game_name,
+                            duration=duration_min,
+                            end_time=saved_at
+                        )
+                    closed += 1
+                    del last_states[sid]
+                else:
+                    state.session_start = None
+        # 恢复期间若已有新状态（如 /steam on 已拉取），以新状态为准
+        for sid, st in last_states.items():
+            self.last_states.setdefault(sid, st)
+            if sid in updated_at:
+                self.state_updated_at.setdefault(sid, updated_at[sid])
+        logger.info(
+            f"已从快照恢复 {len(last_states)} 个玩家状态（停机 {gap} 秒，"
+            f"{'结束' if gap > self.SESSION_RESUME_GAP else '继续'}进行中的会话，已结束 {closed} 个）"
+        )
+        session = snapshot.get("notify_session")
+        if session and not self.subscriptions.existed and session != self.GROUP_ID:
+            # 兼容没有订阅表时保存的快照：原推送会话订阅全部玩家（之后退订的会话不再恢复订阅）
+            await self.subscriptions.subscribe(session)
+        if snapshot.get("running") and (session or self.subscriptions) and not self.running:
+            self.running = True
+            self.notify_session = session
+            self._start_polling()
+
+    def _register_metrics(self):
+        '''登记由各组件自行维护的指标（导出时读取当前值）'''
+        m = self.metrics
+        m.describe("steam_poll_round_seconds", "每轮轮询耗时")
+        m.describe("steam_api_request_seconds", "Steam 接口请求耗时（不含配额等待）")
+        m.describe("steam_api_requests_total", "Steam 接口请求次数（按接口与 HTTP 状态）")
+        m.describe("steam_api_retries_total", "GetPlayerSummaries 批量请求重试次数")
+        m.describe("steam_api_failures_total", "放弃的 GetPlayerSummaries 批次")
+        m.describe("game_name_cache_requests_total", "游戏名缓存查询（hit/miss）")
+        m.describe("steam_list_requests_total", "/steam list 请求（cache/live）")
+        m.describe("openbox_profile_cache_total", "/steam openbox 玩家信息缓存（hit/miss）")
+        m.describe("openbox_avatar_total", "/steam openbox 头像来源（file 为本地缓存，url 为下载失败后的回退）")
+        m.gauge("steam_monitored_players", lambda: len(self.monitored_ids()), "监控中的玩家数")
+        m.gauge("steam_polled_players", lambda: len(self.polled_ids()), "本实例负责轮询的玩家数（分片模式下只含持有的分片）")
+        m.describe("steam_cluster_transitions_applied_total", "应用的其他实例转发的状态转换")
+        m.gauge("steam_notify_queue_depth", self.notifier.depth, "通知队列积压")
+        m.gauge("steam_notify_sent_total", lambda: self.notifier.sent, "已发送的通知消息", kind="counter")
+        m.gauge("steam_notify_failed_total", lambda: self.notifier.failed, "发送失败的通知", kind="counter")
+        m.gauge("steam_notify_dropped_total", lambda: self.notifier.dropped, "队列满被丢弃的通知", kind="counter")
+        m.gauge("steam_game_log_records", self.game_log.size, "游玩记录条数")
+        m.gauge("steam_game_log_disk_bytes", self.game_log.disk_usage, "游玩记录占用的磁盘空间")
+        m.gauge("game_name_cache_entries", self.game_name_cache.size, "游戏名缓存条目数")
+        m.gauge("steam_api_used_today", lambda: self.key_pool.used_today, "Steam Web API 今日调用次数")
+        m.gauge("steam_api_throttled_total", lambda: self.key_pool.throttled, "收到 429 的次数", kind="counter")
+        m.gauge(
+            "steam_api_key_used_today",
+            lambda: [({"key": k.label}, k.quota.used_today) for k in self.key_pool.keys],
+            "每个 API Key 今日调用次数"
+        )
+        m.gauge(
+            "steam_api_key_benched",
+            lambda: [({"key": k.label}, int(k.benched())) for k in self.key_pool.keys],
+            "API Key 是否因 401/403 停用"
+        )
+        m.gauge(
+            "steam_api_circuits_open",
+            lambda: sum(1 for b in self.breakers.values() if b.state != "closed"),
+            "处于熔断/探测状态的接口数"
+        )
+        m.gauge(
+            "steam_api_circuit_trips_total",
+            lambda: sum(b.trips for b in self.breakers.values()),
+            "接口熔断次数", kind="counter"
+        )
+
+    async def _export_metrics(self):
+        '''按轮次把指标写入 Prometheus textfile（配置了 metrics_textfile 时，最多每 15 秒一次）'''
+        if not self.METRICS_TEXTFILE:
+            return
+        now = time.time()
+        if now - self._last_metrics_export < 15:
+            return
+        self._last_metrics_export = now
+        try:
+            await asyncio.to_thread(self.metrics.write_textfile, self.METRICS_TEXTFILE)
+        except Exception as e:
+            logger.warning(f"写入指标文件失败: {e}")
+
+    def monitored_ids(self):
+        '''本实例关注的全部玩家：监控列表与各会话订阅的并集（去重）'''
+        return self.subscriptions.union(self.STEAM_IDS)
+
+    def polled_ids(self):
+        '''本实例负责轮询的玩家；分片模式下为持有分片中任一实例关注的玩家'''
+        if self.cluster is not None:
+            return self.cluster.owned_ids
+        return self.monitored_ids()
+
+    async def _cluster_sync(self):
+        '''分片模式下每轮开始前：续约/重新分配分片，并应用其他实例发布的状态与状态转换'''
+        if self.cluster is None:
+            return
+        monitored = self.monitored_ids()
+        try:
+            await self.cluster.rebalance(monitored)
+            events, states = await self.cluster.pull()
+        except Exception as e:
+            # 共享库暂时不可用时沿用上一轮的分片，下轮再试
+            logger.warning(f"分片协调失败: {e}")
+            return
+        for sid, (state, updated_at) in states.items():
+            if updated_at > self.state_updated_at.get(sid, 0):
+                self.last_states[sid] = state
+                self.state_updated_at[sid] = int(updated_at)
+        wanted = set(monitored)
+        for event, now in events:
+            if event.steamid not in wanted:
+                continue
+            self.metrics.inc("steam_cluster_transitions_applied_total", kind=event.kind)
+            try:
+                await self._handle_transition(event, int(now))
+            except Exception as e:
+                logger.error(f"处理其他实例转发的状态变化失败: {e} ({event!r})")
+
+    def _sessions_for(self, steamid):
+        '''关注该玩家的会话；配置的 notify_group_id 视为订阅全部监控玩家'''
+        sessions = self.subscriptions.sessions_for(steamid, self.STEAM_IDS)
+        if self.GROUP_ID and self.GROUP_ID not in self.subscriptions.sessions() and steamid in self.STEAM_IDS:
+            sessions.append(self.GROUP_ID)
+        return sessions
+
+    def _notify(self, steamid, text):
+        '''把玩家的状态通知分发给所有关注该玩家的会话'''
+        sessions = self._sessions_for(steamid)
+        if not sessions:
+            logger.info(f"没有会话订阅 SteamID {steamid}，跳过推送")
+            return
+        for session in sessions:
+            self.notifier.submit(session, text)
+
+    async def _save_snapshot(self, force=False, running=None):
+        '''定期保存状态快照（间隔 state_snapshot_interval_sec）；running 为写入快照的运行状态，默认取当前值'''
+        now = time.time()
+        if not force and now - self._last_snapshot < self.SNAPSHOT_INTERVAL:
+            return
+        self._last_snapshot = now
+        try:
+            last_states = {sid: st.to_dict() for sid, st in self.last_states.items()}
+            start_times = {
+                sid: st.session_start for sid, st in self.last_states.items()
+                if st.session_start is not None
+            }
+            await self.state_store.save(
+                last_states, start_times, self.state_updated_at,
+                self.running if running is None else running, self.notify_session, self.key_pool.usage()
+            )
+        except Exception as e:
+            logger.warning(f"保存状态快照失败: {e}")
 
     async def keep_alive_task(self):
         '''定时调用 get_status 保持NapCat连接活跃，减少掉线概率'''
@@ -72,44 +427,178 @@ class SteamStatusMonitor(Star):
                 logger.warning(f"NapCat保活心跳失败: {e}")
             await asyncio.sleep(self.POLL_INTERVAL)
 
-    async def fetch_player_status(self, steam_id, retry=None):
-        '''拉取单个玩家的 Steam 状态，失败自动重试多次并指数退避'''
+    def _breaker(self, endpoint):
+        breaker = self.breakers.get(endpoint)
+        if breaker is None:
+            breaker = self.breakers[endpoint] = CircuitBreaker(
+                endpoint, self.BREAKER_THRESHOLD, self.BREAKER_RESET_SEC
+            )
+        return breaker
+
+    def _key_get(self, url, key):
+        # 不能用 params=（httpx 会整体替换 url 中已有的查询参数），也不用 URL.copy_add_param：
+        # 批量查询的 url 很长，重新解析一遍的开销与整轮状态比对相当；Key 只含字母数字，直接拼接即可
+        sep = "&" if "?" in url else "?"
+        return asyncio.ensure_future(self.http_client.get(f"{url}{sep}key={quote(key.key)}"))
+
+    async def _hedged_get(self, url, key, endpoint):
+        '''超过 hedge_after_sec 仍未返回时换一个 Key 再发一个相同请求，取先成功的结果（另一个取消）
+        返回 (响应, 实际使用的 Key)'''
+        first = self._key_get(url, key)
+        done, _ = await asyncio.wait({first}, timeout=self.HEDGE_AFTER_SEC)
+        if done:
+            return first.result(), key
+        try:
+            # 对冲请求同样计入配额（优先落到另一个 Key）
+            second_key = await self.key_pool.acquire()
+        except QuotaExceeded:
+            return await first, key
+        self.metrics.inc("steam_api_hedged_total", endpoint=endpoint)
+        tasks = {first: key, self._key_get(url, second_key): second_key}
+        pending = set(tasks)
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result(), tasks[task]
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def steam_get(self, url, store=False):
+        '''所有 Steam 请求的统一出口：先经过接口熔断器并取得配额许可，收到 429 时按 Retry-After 暂停后续请求
+        熔断中直接抛出 CircuitOpen；开启 hedge_after_sec 时 Web API 慢请求会发出对冲请求。
+        Web API 请求的 key 参数由 Key 池填入（url 中不带 key）；某个 Key 返回 401/403 时停用该 Key、返回 429 时暂停该 Key，并立即换下一个可用 Key 重发'''
+        endpoint = endpoint_name(url)
+        breaker = self._breaker(endpoint)
+        try:
+            breaker.check()
+        except CircuitOpen:
+            self.metrics.inc("steam_api_requests_total", endpoint=endpoint, status="circuit_open")
+            raise
+        for _ in range(max(1, len(self.key_pool))):
+            key = None
+            if store:
+                await self.store_quota.acquire()
+            else:
+                key = await self.key_pool.acquire()
+            start = time.perf_counter()
+            try:
+                if store:
+                    resp = await self.http_client.get(url)
+                elif self.HEDGE_AFTER_SEC:
+                    resp, key = await self._hedged_get(url, key, endpoint)
+                else:
+                    resp = await self._key_get(url, key)
+            except Exception:
+                breaker.record_failure()
+                self.metrics.inc("steam_api_requests_total", endpoint=endpoint, status="error")
+                raise
+            finally:
+                self.metrics.observe("steam_api_request_seconds", time.perf_counter() - start, endpoint=endpoint)
+            self.metrics.inc("steam_api_requests_total", endpoint=endpoint, status=str(resp.status_code))
+            if resp.status_code == 429 or resp.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if store:
+                if resp.status_code == 429:
+                    self.store_quota.penalize(resp.headers.get('Retry-After'))
+                return resp
+            self.key_pool.report(key, resp.status_code, resp.headers.get('Retry-After'))
+            if resp.status_code in (401, 403):
+                continue
+            if resp.status_code == 429 and self.key_pool.has_unblocked():
+                continue
+            return resp
+        return resp
+
+    async def _fetch_summaries_chunk(self, chunk, retry):
+        '''拉取一批（最多100个）SteamID 的玩家信息，返回 players 列表；全部重试失败返回 None'''
         url = (
             "https://api.steampowered.com/ISteamUser/GetPlayerSummaries/v2/"
-            f"?key={self.API_KEY}&steamids={steam_id}"
+            f"?steamids={','.join(chunk)}"
         )
         delay = 1
-        retry = retry if retry is not None else self.RETRY_TIMES
         for attempt in range(retry):
-            logger.info(f"正在查询 SteamID: {steam_id}，第{attempt+1}次尝试")  # 改为 info
-            async with httpx.AsyncClient(timeout=15) as client:
+            if attempt:
+                self.metrics.inc("steam_api_retries_total")
+            if self.DEBUG_LOG:
+                logger.info(f"正在批量查询 {len(chunk)} 个 SteamID，第{attempt+1}次尝试")
+            try:
+                resp = await self.steam_get(url)
+                if resp.status_code != 200:
+                    raise Exception(f"HTTP {resp.status_code}")
                 try:
-                    resp = await client.get(url)
-                    if resp.status_code != 200:
-                        raise Exception(f"HTTP {resp.status_code}")
-                    try:
-                        data = resp.json()
-                    except Exception as je:
-                        raise Exception(f"JSON解析失败: {je}")
-                    if not data.get('response') or not data['response'].get('players') or not data['response']['players']:
-                        raise Exception("响应中无玩家数据")
-                    player = data['response']['players'][0]
-                    logger.info(f"SteamID: {steam_id} 查询成功。")  # 改为 info
-                    return {
-                        'name': player.get('personaname'),
-                        'gameid': player.get('gameid'),
-                        'lastlogoff': player.get('lastlogoff'),
-                        'gameextrainfo': player.get('gameextrainfo'),
-                        'personastate': player.get('personastate', 0)
-                    }
-                except Exception as e:
-                    logger.warning(f"拉取 Steam 状态失败: {e} (SteamID: {steam_id}, 第{attempt+1}次重试)")
-                    if attempt < retry - 1:
-                        await asyncio.sleep(delay)
-                        delay *= 2
-        logger.error(f"SteamID {steam_id} 状态获取失败，已重试{retry}次")
+                    data = resp.json()
+                except Exception as je:
+                    raise Exception(f"JSON解析失败: {je}")
+                if not isinstance(data.get('response'), dict):
+                    raise Exception("响应格式错误")
+                return data['response'].get('players') or []
+            except QuotaExceeded as e:
+                # 额度用完时重试只会继续失败，直接放弃本批
+                logger.error(f"{e}，跳过本批 {len(chunk)} 个 SteamID")
+                self.metrics.inc("steam_api_failures_total", reason="quota")
+                return None
+            except CircuitOpen as e:
+                # 熔断期间同样不再重试，本轮很快结束
+                if self.DEBUG_LOG:
+                    logger.info(f"{e}，跳过本批 {len(chunk)} 个 SteamID")
+                self.metrics.inc("steam_api_failures_total", reason="circuit_open")
+                return None
+            except Exception as e:
+                logger.warning(f"批量拉取 Steam 状态失败: {e} (共{len(chunk)}个SteamID, 第{attempt+1}次重试)")
+                if attempt < retry - 1:
+                    await asyncio.sleep(delay)
+                    delay *= 2
+        logger.error(f"{len(chunk)} 个 SteamID 状态获取失败，已重试{retry}次")
+        self.metrics.inc("steam_api_failures_total", reason="retries")
         return None
 
+    async def _fetch_players_batch(self, ids, retry):
+        '''按 STEAM_BATCH_SIZE 分批请求，返回 {steamid: PlayerState}，未返回数据的 SteamID 不在结果中'''
+        results = {}
+        for i in range(0, len(ids), STEAM_BATCH_SIZE):
+            chunk = ids[i:i + STEAM_BATCH_SIZE]
+            players = await self._fetch_summaries_chunk(chunk, retry)
+            if not players:
+                continue
+            wanted = set(chunk)
+            for player in players:
+                sid = str(player.get('steamid', ''))
+                if sid in wanted:
+                    results[sid] = PlayerState.from_summary(player)
+        return results
+
+    async def fetch_players_status(self, steam_ids, retry=None):
+        '''批量拉取玩家的 Steam 状态，每次请求最多打包 STEAM_BATCH_SIZE 个 SteamID
+        与正在进行的查询（如 /steam list 与后台轮询同时发生）共享同一次请求
+        返回 (状态字典 {steamid: PlayerState}, 未返回数据的 SteamID 列表)'''
+        retry = retry if retry is not None else self.RETRY_TIMES
+        ids = list(dict.fromkeys(str(x).strip() for x in steam_ids if str(x).strip()))
+        fetched = await self._summary_flights.do_many(
+            ids, lambda own_ids: self._fetch_players_batch(own_ids, retry)
+        )
+        # 结果可能被多个调用方共享，各自拿一份副本
+        results = {sid: status.copy() for sid, status in fetched.items() if status}
+        missing = [sid for sid in ids if sid not in results]
+        if missing:
+            # 熔断或故障期间每轮都会有大量玩家缺失，只记录数量，逐个列出需开启 debug_log
+            logger.warning(f"{len(missing)} 个 SteamID 未返回数据")
+            if self.DEBUG_LOG:
+                logger.info(f"未返回数据的 SteamID: {', '.join(missing)}")
+        return results, missing
+
+    async def fetch_player_status(self, steam_id, retry=None):
+        '''拉取单个玩家的 Steam 状态（批量接口的单ID包装），失败返回 None'''
+        results, _ = await self.fetch_players_status([steam_id], retry=retry)
+        return results.get(str(steam_id))
+
     async def get_chinese_game_name(self, gameid, fallback_name=None):
         '''
         优先通过 Steam 商店API获取游戏中文名（l=schinese），若无则返回英文名（l=en），最后才返回 fallback_name 或“未知游戏”
@@ -117,226 +606,152 @@ class SteamStatusMonitor(Star):
         if not gameid:
             return fallback_name or "未知游戏"
         gid = str(gameid)
-        if gid in self._game_name_cache:
-            return self._game_name_cache[gid]
+        hit, cached_name = await self.game_name_cache.get(gid)
+        self.metrics.inc("game_name_cache_requests_total", result="hit" if hit else "miss")
+        if hit:
+            return cached_name or fallback_name or "未知游戏"
+        # 同一个游戏的并发查询（如多人同时开始玩新游戏）只请求一次商店接口
+        name = await self._name_flights.do(gid, lambda: self._lookup_game_name(gid))
+        return name or fallback_name or "未知游戏"
+
+    async def _lookup_game_name(self, gid):
+        '''请求商店接口获取游戏名并写入缓存，查不到返回 None'''
         # 优先查中文名（l=schinese），再查英文名（l=en）
         url_zh = f"https://store.steampowered.com/api/appdetails?appids={gid}&l=schinese"
         url_en = f"https://store.steampowered.com/api/appdetails?appids={gid}&l=en"
         try:
-            async with httpx.AsyncClient(timeout=10) as client:
-                # 查中文名
-                resp_zh = await client.get(url_zh)
-                data_zh = resp_zh.json()
-                info_zh = data_zh.get(gid, {}).get("data", {})
-                name_zh = info_zh.get("name")
-                if name_zh:
-                    self._game_name_cache[gid] = name_zh
-                    return name_zh
-                # 查英文名
-                resp_en = await client.get(url_en)
-                data_en = resp_en.json()
-                info_en = data_en.get(gid, {}).get("data", {})
-                name_en = info_en.get("name")
-                if name_en:
-                    self._game_name_cache[gid] = name_en
-                    return name_en
+            # 查中文名
+            resp_zh = await self.steam_get(url_zh, store=True)
+            data_zh = resp_zh.json()
+            info_zh = data_zh.get(gid, {}).get("data", {})
+            name_zh = info_zh.get("name")
+            if name_zh:
+                await self.game_name_cache.put(gid, name_zh)
+                return name_zh
+            # 查英文名
+            resp_en = await self.steam_get(url_en, store=True)
+            data_en = resp_en.json()
+            info_en = data_en.get(gid, {}).get("data", {})
+            name_en = info_en.get("name")
+            if name_en:
+                await self.game_name_cache.put(gid, name_en)
+                return name_en
+            # 商店明确查不到（下架/锁区），写入短期负缓存
+            await self.game_name_cache.put(gid, None)
+        except CircuitOpen:
+            # 商店接口熔断中，本次先用英文名兜底，不缓存
+            pass
         except Exception as e:
+            # 网络等临时错误不缓存，让下次还能重试
             logger.warning(f"获取游戏名失败: {e} (gameid={gid})")
-        # 不缓存 fallback，让下次还能重试
-        return fallback_name or "未知游戏"
+        return None
 
-    async def check_status_change(self):
-        '''轮询检测玩家状态变更并推送通知，并打印所有玩家状态'''
-        logger.info("开始轮询所有玩家状态")  # 改为 info
-        msg_lines = []
+    async def _handle_transition(self, event, now):
+        '''把一次状态转换变成通知与游玩记录'''
+        sid, name = event.steamid, event.name
+        if event.kind in (SWITCH, STOP):
+            prev_game_name = await self.get_chinese_game_name(event.prev_gameid, event.prev_game)
+            if event.session_start is not None:
+                duration_min = (now - event.session_start) / 60
+                msg = f"👋 {name} 不玩 {prev_game_name} 了\n游玩时间 {format_duration(duration_min)} {play_tail(duration_min)}"
+                logger.info(f"{msg}，推送通知")
+                self._notify(sid, msg)
+                # 仅当游玩时间大于10分钟才记录日志
+                if duration_min > 10:
+                    await self.game_log.record_log(
+                        steamid=sid,
+                        player_name=name,
+                        gameid=event.prev_gameid,
+                        game_name=prev_game_name,
+                        duration=duration_min,
+                        end_time=now
+                    )
+            elif event.kind == STOP:
+                # 没有开始时间（如重启前已在游戏中），不记录日志
+                msg = f"👋 {name} 不玩 {prev_game_name} 了\n游玩时间未知"
+                logger.info(f"{msg}，推送通知")
+                self._notify(sid, msg)
+        if event.kind in (START, SWITCH):
+            game_name = await self.get_chinese_game_name(event.gameid, event.game)
+            logger.info(f"{name} 开始玩 {game_name} 了，推送通知")
+            self._notify(sid, f"🟢 {name} 开始玩 {game_name} 了！")
+
+    async def check_status_change(self, steam_ids=None):
+        '''轮询检测玩家状态变更并推送通知
+        steam_ids 为本轮需要查询的玩家（默认全部），返回本轮查到的 {steamid: PlayerState}
+        状态指纹（personastate/gameid/lastlogoff/昵称）未变化的玩家只刷新更新时间，
+        不参与状态转换检测与文本渲染，每轮开销随变化的玩家数而不是总玩家数增长'''
+        steam_ids = self.polled_ids() if steam_ids is None else steam_ids
+        # 逐玩家的状态日志量随玩家数线性增长，只在 debug_log 开启时输出
+        verbose = self.DEBUG_LOG
+        if verbose:
+            logger.info(f"开始轮询 {len(steam_ids)} 个玩家状态")
         now = int(time.time())
-        for sid in self.STEAM_IDS:
-            logger.info(f"检查 SteamID: {sid}")  # 改为 info
-            status = await self.fetch_player_status(sid)
-            if not status:
-                logger.warning(f"SteamID: {sid} 查询失败，跳过")
-                msg_lines.append(f"❌ [{sid}] 获取失败\n")
+        fetched, _ = await self.fetch_players_status(steam_ids)
+        # 按监控列表顺序处理，通知顺序与配置一致
+        statuses = {}
+        changed = {}
+        last_states = self.last_states
+        updated_at = self.state_updated_at
+        for sid in steam_ids:
+            status = fetched.get(sid)
+            if status is None:
                 continue
-            prev = self.last_states.get(sid)
-            name = status.get('name') or sid
-            gameid = status.get('gameid')
-            game = status.get('gameextrainfo')
-            lastlogoff = status.get('lastlogoff')
-            personastate = status.get('personastate', 0)
-            # 获取中文游戏名（如有gameid）
-            zh_game_name = await self.get_chinese_game_name(gameid, game) if gameid else (game or "未知游戏")
-            # 检测游戏切换（包括从A->B，A->无，None->B）
-            prev_gameid = prev.get('gameid') if prev else None
-            prev_game = prev.get('gameextrainfo') if prev else None
-            if gameid and prev_gameid and gameid != prev_gameid:
-                # 游戏切换（A->B）
-                prev_zh_game_name = await self.get_chinese_game_name(prev_gameid, prev_game) if prev_gameid else (prev_game or "未知游戏")
-                # 结束上一个游戏
-                if sid in self.start_play_times:
-                    duration_min = (now - self.start_play_times[sid]) / 60
-                    if duration_min < 60:
-                        duration_str = f"{duration_min:.1f}分钟"
-                    else:
-                        duration_str = f"{duration_min/60:.1f}小时"
-                    now_hour = time.localtime().tm_hour
-                    tail = ""
-                    if 1 <= now_hour < 6:
-                        night_tails = [
-                            "解锁称号：速通人生（0.5分钟版）",
-                            "你是夜猫子吗？咱可是正经猫娘喵，要睡觉的！",
-                            "肝游戏不如肝工作，至少你老板会给你五险一金",
-                            "你妈半夜起来看你还亮着屏幕，现在已经在抄家伙了喵",
-                            "解锁称号：现实技能点全点在了虚拟肝上",
-                            "你再不睡，你妈今晚就得拿电蚊拍给你开机重启了喵",
-                            "再玩下去，咱怕你不是通关，是通灵了喵",
-                            "你还在玩吗？咱都猫叫一晚上了喵～",
-                            "你玩得再久，头发也不会原地复生的喵",
-                            "主人再打下去，咱就得学急救知识啦，虽然咱是猫不会按人中喵～",
-                            "主人你再不睡，咱今晚就罢工不喵叫了，气鼓鼓(｡•ˇ‸ˇ•｡)",
-                            "解锁称号：‘玩到天明’，友情提示：你明天死定了喵～"
-                        ]
-                        tail = random.choice(night_tails)
-                    else:
-                        if duration_min < 5:
-                            tail = "这也叫玩？开机都没热！"
-                        elif duration_min < 10:
-                            tail = "疲软无力的~杂鱼~"
-                        elif duration_min < 30:
-                            tail = "热身运动，指尖刚热"
-                        elif duration_min < 60:
-                            tail = "轻松娱乐一下，刚刚好喵~"
-                        elif duration_min < 120:
-                            tail = "认认真真地沉浸了一阵子喵~"
-                        else:
-                            tail = "根本停不下来喵！眼睛都要冒烟啦！"
-                    msg = f"👋 {name} 不玩 {prev_zh_game_name} 了\n游玩时间 {duration_str} {tail}"
-                    logger.info(f"{msg}，推送通知")
-                    try:
-                        msg_chain = MessageChain([Plain(msg)])
-                        await self.context.send_message(self.notify_session, msg_chain)
-                    except Exception as e:
-                        logger.error(f"推送结束游戏消息失败: {e}")
-                    # 仅当游玩时间大于10分钟才记录日志
-                    if duration_min > 10:
-                        await self.game_log.record_log(
-                            steamid=sid,
-                            player_name=name,
-                            gameid=prev_gameid,
-                            game_name=prev_zh_game_name,
-                            duration=duration_min,
-                            end_time=now
-                        )
-                # 立即记录新游戏开始时间
-                self.start_play_times[sid] = now
-                # 推送新游戏开始
-                try:
-                    if self.notify_session:
-                        msg_chain = MessageChain([Plain(f"🟢 {name} 开始玩 {zh_game_name} 了！")])
-                        await self.context.send_message(self.notify_session, msg_chain)
-                    else:
-                        logger.error("未设置推送会话，无法发送消息")
-                except Exception as e:
-                    logger.error(f"推送新开始游戏消息失败: {e}")
-            # 玩家新开始游戏（无->B）
-            elif gameid and (not prev or not prev.get('gameid')):
-                logger.info(f"{name} 开始玩 {zh_game_name} 了，推送通知")
-                try:
-                    if self.notify_session:
-                        msg_chain = MessageChain([Plain(f"🟢 {name} 开始玩 {zh_game_name} 了！")])
-                        await self.context.send_message(self.notify_session, msg_chain)
-                    else:
-                        logger.error("未设置推送会话，无法发送消息")
-                except Exception as e:
-                    logger.error(f"推送新开始游戏消息失败: {e}")
-                self.start_play_times[sid] = now
-            # 玩家退出游戏（A->无）
-            if prev and prev.get('gameid') and not gameid:
-                prev_gameid = prev.get('gameid')
-                prev_game = prev.get('gameextrainfo')
-                zh_prev_game_name = await self.get_chinese_game_name(prev_gameid, prev_game) if prev_gameid else (prev_game or "未知游戏")
-                try:
-                    if self.notify_session:
-                        if sid in self.start_play_times:
-                            duration_min = (now - self.start_play_times[sid]) / 60
-                            if duration_min < 60:
-                                duration_str = f"{duration_min:.1f}分钟"
-                            else:
-                                duration_str = f"{duration_min/60:.1f}小时"
-                            now_hour = time.localtime().tm_hour
-                            tail = ""
-                            if 1 <= now_hour < 6:
-                                night_tails = [
-                                    "解锁称号：速通人生（0.5分钟版）",
-                                    "你是夜猫子吗？咱可是正经猫娘喵，要睡觉的！",
-                                    "肝游戏不如肝工作，至少你老板会给你五险一金",
-                                    "你妈半夜起来看你还亮着屏幕，现在已经在抄家伙了喵",
-                                    "解锁称号：现实技能点全点在了虚拟肝上",
-                                    "你再不睡，你妈今晚就得拿电蚊拍给你开机重启了喵",
-                                    "再玩下去，咱怕你不是通关，是通灵了喵",
-                                    "你还在玩吗？咱都猫叫一晚上了喵～",
-                                    "你玩得再久，头发也不会原地复生的喵",
-                                    "主人再打下去，咱就得学急救知识啦，虽然咱是猫不会按人中喵～",
-                                    "主人你再不睡，咱今晚就罢工不喵叫了，气鼓鼓(｡•ˇ‸ˇ•｡)",
-                                    "解锁称号：‘玩到天明’，友情提示：你明天死定了喵～"
-                                ]
-                                tail = random.choice(night_tails)
-                            else:
-                                if duration_min < 5:
-                                    tail = "这也叫玩？开机都没热！"
-                                elif duration_min < 10:
-                                    tail = "疲软无力的~杂鱼~"
-                                elif duration_min < 30:
-                                    tail = "热身运动，指尖刚热"
-                                elif duration_min < 60:
-                                    tail = "轻松娱乐一下，刚刚好喵~"
-                                elif duration_min < 120:
-                                    tail = "认认真真地沉浸了一阵子喵~"
-                                else:
-                                    tail = "根本停不下来喵！眼睛都要冒烟啦！"
-                            msg = f"👋 {name} 不玩 {zh_prev_game_name} 了\n游玩时间 {duration_str} {tail}"
-                            logger.info(f"{msg}，推送通知")
-                            try:
-                                msg_chain = MessageChain([Plain(msg)])
-                                await self.context.send_message(self.notify_session, msg_chain)
-                            except Exception as e:
-                                logger.error(f"推送退出游戏消息失败: {e}")
-                            # 仅当游玩时间大于10分钟才记录日志
-                            if duration_min > 10:
-                                await self.game_log.record_log(
-                                    steamid=sid,
-                                    player_name=name,
-                                    gameid=prev_gameid,
-                                    game_name=zh_prev_game_name,
-                                    duration=duration_min,
-                                    end_time=now
-                                )
-                            self.start_play_times.pop(sid, None)
-                        else:
-                            msg = f"👋 {name} 不玩 {zh_prev_game_name} 了\n游玩时间未知"
-                            logger.info(f"{msg}，推送通知")
-                            try:
-                                msg_chain = MessageChain([Plain(msg)])
-                                await self.context.send_message(self.notify_session, msg_chain)
-                            except Exception as e:
-                                logger.error(f"推送退出游戏消息失败: {e}")
-                            # 这里没有游玩时长，不记录日志
-                    else:
-                        logger.error("未设置推送会话，无法发送消息")
-                except Exception as e:
-                    logger.error(f"推送退出游戏消息失败: {e}")
-            self.last_states[sid] = status
-            # 状态文本拼接
-            if gameid:
-                msg_lines.append(f"🟢【{name}】正在玩 {zh_game_name}\n")
-            elif personastate and int(personastate) > 0:
-                msg_lines.append(f"🟡【{name}】在线\n")
-            elif lastlogoff:
-                hours_ago = (now - int(lastlogoff)) / 3600
-                msg_lines.append(f"⚪️【{name}】离线\n上次在线 {hours_ago:.1f} 小时前\n")
+            prev = last_states.get(sid)
+            if prev is not None and prev.fingerprint() == status.fingerprint():
+                # 未变化：沿用原状态对象（保留会话开始时间）
+                statuses[sid] = prev
+                updated_at[sid] = now
             else:
-                msg_lines.append(f"⚪️【{name}】离线\n")
-        logger.warning("自动查询结果：\n" + "".join(msg_lines))
-        logger.warning("本轮轮询结束")
+                statuses[sid] = changed[sid] = status
+        self.metrics.inc("steam_players_changed_total", len(changed))
+        events, starts = diff_states(last_states, changed, now)
+        for sid, status in changed.items():
+            status.session_start = starts[sid]
+        # 分片模式下代其他实例轮询的玩家只发布，不在本实例通知/记录
+        local = set(self.monitored_ids()) if self.cluster is not None else None
+        for event in events:
+            if local is not None and event.steamid not in local:
+                continue
+            self.metrics.inc("steam_transitions_total", kind=event.kind)
+            try:
+                await self._handle_transition(event, now)
+            except Exception as e:
+                logger.error(f"处理状态变化失败: {e} ({event!r})")
+        for sid, status in changed.items():
+            last_states[sid] = status
+            updated_at[sid] = now
+        if self.cluster is not None:
+            await self._cluster_publish(statuses, changed, events, now)
+        if verbose:
+            msg_lines = []
+            for sid in steam_ids:
+                if sid not in fetched:
+                    msg_lines.append(f"❌ [{sid}] 获取失败\n")
+                elif sid in changed:
+                    msg_lines.append(await render_status(self, sid, changed[sid], now) + "\n")
+            unchanged = len(statuses) - len(changed)
+            logger.info(
+                "自动查询结果：\n" + "".join(msg_lines) + f"（其余 {unchanged} 个玩家状态无变化）"
+            )
+            logger.info("本轮轮询结束")
+        return statuses
+
+    async def _cluster_publish(self, statuses, changed, events, now):
+        '''发布有变化的状态与状态转换；未变化的状态每 list_fresh_sec/2 秒重新发布一次，保持其他实例看到的更新时间'''
+        refresh_before = now - self.LIST_FRESH_SEC / 2
+        published = self._cluster_published
+        batch = dict(changed)
+        for sid, status in statuses.items():
+            if sid not in batch and published.get(sid, 0) < refresh_before:
+                batch[sid] = status
+        try:
+            await self.cluster.publish(batch, events, now)
+        except Exception as e:
+            logger.warning(f"发布状态到共享库失败: {e}")
+            return
+        for sid in batch:
+            published[sid] = now
 
     @filter.command("steam on")
     async def steam_on(self, event: AstrMessageEvent):
@@ -350,53 +765,60 @@ class SteamStatusMonitor(Star):
                 "或使用 /steam addid [SteamID] 添加要监控的玩家。"
             )
             return
+        # 等待快照恢复完成（快照中监控正在运行时会自动恢复轮询）
+        await self._restore_task
+        session = event.unified_msg_origin
+        if not self.subscriptions.get(session):
+            # 未单独订阅的会话默认订阅全部监控玩家
+            await self.subscriptions.subscribe(session)
         if self.running:
-            yield event.plain_result("Steam监控已在运行。")
+            yield event.plain_result("Steam监控已在运行，本会话已加入推送。")
             return
         self.running = True
-        self.notify_session = event.unified_msg_origin
+        self.notify_session = session
 
         # 启动时输出一次 steam list 风格的当前状态，不推送“开始玩游戏了”通知
         msg_lines = []
         now = int(time.time())
-        for sid in self.STEAM_IDS:
-            status = await self.fetch_player_status(sid)
-            if status:
-                self.last_states[sid] = status
-                if status.get('gameid'):
-                    self.start_play_times[sid] = int(time.time())
-            name = status.get('name') or sid if status else sid
-            gameid = status.get('gameid') if status else None
-            game = status.get('gameextrainfo') if status else None
-            lastlogoff = status.get('lastlogoff') if status else None
-            personastate = status.get('personastate', 0) if status else 0
-            # 获取中文游戏名
-            zh_game_name = await self.get_chinese_game_name(gameid, game) if gameid else (game or "未知游戏")
+        session_ids = self.subscriptions.ids_for(session, self.STEAM_IDS)
+        statuses, _ = await self.fetch_players_status(self.monitored_ids())
+        for sid, status in statuses.items():
+            if status.gameid:
+                status.session_start = now
+            self.last_states[sid] = status
+            self.state_updated_at[sid] = now
+        for sid in session_ids:
+            status = statuses.get(sid)
             if not status:
                 msg_lines.append(f"❌ [{sid}] 获取失败\n")
-            elif gameid:
+                continue
+            name = status.name or sid
+            if status.gameid:
+                # 获取中文游戏名
+                zh_game_name = await self.get_chinese_game_name(status.gameid, status.gameextrainfo)
                 msg_lines.append(f"🟢 {name} 正在玩 {zh_game_name}\n")
-            elif personastate and int(personastate) > 0:
+            elif status.online:
                 msg_lines.append(f"🟡 {name} 在线\n")
-            elif lastlogoff:
-                hours_ago = (now - int(lastlogoff)) / 3600
+            elif status.lastlogoff:
+                hours_ago = (now - int(status.lastlogoff)) / 3600
                 msg_lines.append(f"⚪️ {name} 离线\n上次在线 {hours_ago:.1f} 小时前\n")
             else:
                 msg_lines.append(f"⚪️ {name} 离线\n")
         yield event.plain_result("".join(msg_lines))
         yield event.plain_result("Steam状态监控启动完成喔！ヾ(≧ω≦)ゞ")
-        asyncio.create_task(self.poll_loop())
+        self._start_polling()
 
     @filter.command("steam list")
-    async def steam_list(self, event: AstrMessageEvent):
-        '''列出所有玩家当前状态'''
+    async def steam_list(self, event: AstrMessageEvent, mode: str = ""):
+        '''列出所有玩家当前状态（默认读取缓存，steam list live 强制实时查询）'''
         if not self.API_KEY:
             yield event.plain_result("未配置 Steam API Key，请先在插件配置中填写 steam_api_key。")
             return
         if not self.STEAM_IDS:
             yield event.plain_result("未设置监控的 SteamID 列表，请先在插件配置中填写 steam_ids。")
             return
-        async for result in handle_steam_list(self, event):
+        steam_ids = self.subscriptions.ids_for(event.unified_msg_origin, self.STEAM_IDS)
+        async for result in handle_steam_list(self, event, live=(mode.strip().lower() == "live"), steam_ids=steam_ids):
             yield result
 
     @filter.command("steam config")
@@ -431,11 +853,7 @@ class SteamStatusMonitor(Star):
             value = [x.strip() for x in value.split(",") if x.strip()]
         self.config[key] = value
         # 同步到属性
-        self.API_KEY = self.config.get('steam_api_key', '')
-        self.STEAM_IDS = self.config.get('steam_ids', [])
-        self.POLL_INTERVAL = self.config.get('poll_interval_sec', 10)
-        self.RETRY_TIMES = self.config.get('retry_times', 3)
-        self.GROUP_ID = self.config.get('notify_group_id', None)
+        self._apply_config()
         # 保存配置（如支持）
         if hasattr(self.config, "save_config"):
             self.config.save_config()
@@ -456,6 +874,18 @@ class SteamStatusMonitor(Star):
             self.config.save_config()
         yield event.plain_result(f"已添加SteamID: {steamid}")
 
+    @filter.command("steam import")
+    async def steam_import(self, event: AstrMessageEvent):
+        '''批量添加监控玩家（如 steam import 7656119xxx https://steamcommunity.com/id/xxx 自定义链接名 ...）'''
+        if not self.API_KEY:
+            yield event.plain_result("未配置 Steam API Key，请先在插件配置中填写 steam_api_key。")
+            return
+        # 参数可能含空格与换行，直接从原始消息中取 import 之后的全部内容
+        text = event.message_str
+        pos = text.find("import")
+        async for result in handle_steam_import(self, event, text[pos + len("import"):] if pos >= 0 else ""):
+            yield result
+
     @filter.command("steam delid")
     async def steam_delid(self, event: AstrMessageEvent, steamid: str):
         '''通过SteamID删除监控对象（如 steam delid 7656119xxxxxxx）'''
@@ -472,12 +902,50 @@ class SteamStatusMonitor(Star):
     async def steam_rs(self, event: AstrMessageEvent):
         '''清除所有状态并初始化（重启插件用）'''
         self.last_states.clear()
-        self.start_play_times.clear()
+        self.state_updated_at.clear()
         self.running = False
         self.notify_session = None
-        self._game_name_cache.clear()
+        await self.subscriptions.clear()
+        await self._save_snapshot(force=True)
+        # 游戏名缓存与玩家状态无关，自带过期机制，重置时保留
         yield event.plain_result("Steam状态监控插件已重置，所有状态已清空。")
 
+    @filter.command("steam sub")
+    async def steam_sub(self, event: AstrMessageEvent, steamids: str = ""):
+        '''本会话订阅玩家状态推送（如 steam sub 7656119xxx,7656119yyy；不填则订阅全部监控玩家）'''
+        ids = [x.strip() for x in steamids.split(",") if x.strip()]
+        invalid = [x for x in ids if not x.isdigit() or len(x) < 10]
+        if invalid:
+            yield event.plain_result(f"无效的 SteamID: {', '.join(invalid)}")
+            return
+        await self.subscriptions.subscribe(event.unified_msg_origin, ids)
+        target = f"{len(ids)} 个玩家" if ids else "全部监控玩家"
+        tip = "" if self.running else "，使用 /steam on 启动监控"
+        yield event.plain_result(f"本会话已订阅{target}{tip}")
+
+    @filter.command("steam unsub")
+    async def steam_unsub(self, event: AstrMessageEvent, steamids: str = ""):
+        '''本会话取消订阅（不填则取消全部订阅）'''
+        ids = [x.strip() for x in steamids.split(",") if x.strip()]
+        if await self.subscriptions.unsubscribe(event.unified_msg_origin, ids):
+            yield event.plain_result("已取消订阅")
+        else:
+            yield event.plain_result("本会话没有相应的订阅")
+
+    @filter.command("steam subs")
+    async def steam_subs(self, event: AstrMessageEvent):
+        '''查看本会话订阅的玩家'''
+        ids = self.subscriptions.get(event.unified_msg_origin)
+        if not ids:
+            yield event.plain_result("本会话没有订阅")
+            return
+        lines = []
+        for sid in self.subscriptions.ids_for(event.unified_msg_origin, self.STEAM_IDS):
+            name = getattr(self.last_states.get(sid), 'name', None)
+            lines.append(f"{name} ({sid})" if name else sid)
+        head = "本会话订阅了全部监控玩家" if ALL in ids else "本会话订阅的玩家"
+        yield event.plain_result(f"{head}（共{len(lines)}个）：\n" + "\n".join(lines))
+
     @filter.command("steam help")
     async def steam_help(self, event: AstrMessageEvent):
         '''显示所有指令帮助'''
@@ -485,17 +953,41 @@ class SteamStatusMonitor(Star):
             "Steam状态监控插件指令：\n"
             "/steam on - 启动监控\n"
             "/steam off - 停止监控\n"
-            "/steam list - 列出所有玩家状态\n"
+            "/steam list [live] - 列出所有玩家状态（加 live 强制实时查询）\n"
             "/steam config - 查看当前配置\n"
             "/steam set [参数] [值] - 设置配置参数\n"
             "/steam addid [SteamID] - 添加SteamID\n"
+            "/steam import [SteamID/链接/自定义链接名 ...] - 批量添加监控玩家\n"
             "/steam delid [SteamID] - 删除SteamID\n"
             "/steam openbox [SteamID] - 查看指定SteamID的全部信息\n"
+            "/steam sub [SteamID,...] - 本会话订阅指定玩家（不填则订阅全部）\n"
+            "/steam unsub [SteamID,...] - 本会话取消订阅（不填则全部取消）\n"
+            "/steam subs - 查看本会话的订阅\n"
+            "/steam stats [周期] - 查看运行指标（带 day/week/month 则查看游玩时长统计）\n"
+            "/steam top [周期] - 游玩排行榜（默认最近7天）\n"
             "/steam rs - 清除状态并初始化\n"
             "/steam help - 显示本帮助"
         )
         yield event.plain_result(help_text)
 
+    @filter.command("steam stats")
+    async def steam_stats(self, event: AstrMessageEvent, period: str = ""):
+        '''不带参数查看运行指标；带统计周期（如 steam stats week）查看各玩家的游玩时长统计'''
+        if period.strip():
+            steam_ids = self.subscriptions.ids_for(event.unified_msg_origin, self.STEAM_IDS)
+            async for result in handle_playtime_stats(self, event, period, steam_ids=steam_ids):
+                yield result
+            return
+        async for result in handle_steam_stats(self, event):
+            yield result
+
+    @filter.command("steam top")
+    async def steam_top(self, event: AstrMessageEvent, period: str = ""):
+        '''游玩排行榜（如 steam top week；可选 day / week / month 或天数，默认最近7天）'''
+        steam_ids = self.subscriptions.ids_for(event.unified_msg_origin, self.STEAM_IDS)
+        async for result in handle_steam_top(self, event, period, steam_ids=steam_ids):
+            yield result
+
     @filter.command("steam openbox")
     async def steam_openbox(self, event: AstrMessageEvent, steamid: str):
         '''查询并格式化展示指定SteamID的全部API返回信息（中文字段名，头像图片附加，位置ID合并，状态字段直观显示）'''
@@ -511,7 +1003,8 @@ class SteamStatusMonitor(Star):
         if not self.STEAM_IDS:
             yield event.plain_result("未设置监控的 SteamID 列表，请先在插件配置中填写 steam_ids。")
             return
-        async for result in handle_steam_log(self, event):
+        steam_ids = self.subscriptions.ids_for(event.unified_msg_origin, self.STEAM_IDS)
+        async for result in handle_steam_log(self, event, steam_ids=steam_ids):
             yield result
 
     @filter.command("steam logc")
@@ -532,11 +1025,134 @@ class SteamStatusMonitor(Star):
         self.running = False
         yield event.plain_result("Steam状态监控已停止。")
 
+    async def terminate(self):
+        '''插件卸载时停止轮询与后台任务并保存状态快照，发送积压通知，关闭共享 HTTP 连接池并落盘游玩记录
+        先取消并等待所有仍在使用连接池、日志执行器的任务结束，再关闭这些共享资源'''
+        # 快照恢复不取消：中途取消后再保存快照会覆盖掉尚未恢复的状态（恢复本身很快）
+        await asyncio.gather(self._restore_task, return_exceptions=True)
+        was_running = self.running
+        self.running = False
+        tasks = [t for t in (self._poll_task, self._reconcile_task) if t is not None]
+        tasks.extend(self._background)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # 快照记录卸载前的运行状态，重启后据此恢复轮询
+        await self._save_snapshot(force=True, running=was_running)
+        await self.notifier.close()
+        await self.http_client.aclose()
+        await self.game_log.close()
+        if self.metrics_server is not None:
+            await self.metrics_server.close()
+        if self.cluster is not None:
+            await self.cluster.close()
+
+    def _next_poll_interval(self):
+        '''按 API 剩余额度自动放大轮询间隔，避免超出每日配额'''
+        calls_per_round = -(-len(self.polled_ids()) // STEAM_BATCH_SIZE)
+        interval = self.key_pool.recommended_interval(calls_per_round, self.POLL_INTERVAL)
+        stretched = interval > self.POLL_INTERVAL
+        if stretched != self._interval_stretched:
+            if stretched and self.key_pool.recovery_in() is not None:
+                logger.warning(f"所有 API Key 均已停用，{interval:.0f} 秒后重试（{self.key_pool.summary()}）")
+            elif stretched:
+                logger.warning(f"API 额度吃紧，轮询间隔临时调整为 {interval:.0f} 秒（{self.key_pool.summary()}）")
+            else:
+                logger.info(f"轮询间隔恢复为 {self.POLL_INTERVAL} 秒")
+            self._interval_stretched = stretched
+        return interval
+
+    async def _poll_round(self, interval):
+        '''执行一轮轮询：开启自适应轮询时只查询调度器中到期的玩家'''
+        if not self.ADAPTIVE_POLLING:
+            await self.check_status_change()
+            return
+        now = time.time()
+        self.scheduler.base_interval = interval
+        self.scheduler.max_interval = max(interval, self.MAX_DETECT_LATENCY)
+        self.scheduler.sync(self.polled_ids(), now)
+        # 半个节拍内即将到期的玩家也并入本轮，减少零散请求
+        due = self.scheduler.pop_due(now + interval / 2)
+        if not due:
+            return
+        prev_states = {sid: self.last_states.get(sid) for sid in due}
+        statuses = await self.check_status_change(due)
+        now = time.time()
+        for sid in due:
+            status = statuses.get(sid)
+            prev = prev_states.get(sid)
+            changed = (
+                not prev
+                or prev.gameid != getattr(status, 'gameid', None)
+                or prev.personastate != getattr(status, 'personastate', None)
+            )
+            self.scheduler.reschedule(sid, status, now, changed)
+
     async def poll_loop(self):
-        '''定时轮询Steam状态变化'''
+        '''定时轮询Steam状态变化
+        轮次按固定节拍对齐（扣除本轮耗时，不累积漂移）；某轮超时则顺延，轮次之间不会重叠'''
+        await self._restore_task
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
         while self.running:
+            await self._cluster_sync()
+            interval = self._next_poll_interval()
+            start = time.perf_counter()
             try:
-                await self.check_status_change()
+                async with self._round_lock:
+                    await self._poll_round(interval)
             except Exception as e:
+                self.metrics.inc("steam_poll_errors_total")
                 logger.error(f"轮询Steam状态时发生异常: {e}")
-            await asyncio.sleep(self.POLL_INTERVAL)
+            self.metrics.observe("steam_poll_round_seconds", time.perf_counter() - start)
+            await self._save_snapshot()
+            await self._export_metrics()
+            self._maybe_reconcile()
+            next_tick += interval
+            now = loop.time()
+            if next_tick < now:
+                # 本轮耗时超过间隔：丢弃错过的节拍，从现在重新对齐
+                next_tick = now
+            await self._idle(next_tick - now)
+            if self._wake.is_set():
+                self._wake.clear()
+                next_tick = loop.time()
+
+    def _maybe_reconcile(self):
+        '''每隔 reconcile_interval_sec 在后台执行一次会话对账（不阻塞轮询）'''
+        if not self.RECONCILE_INTERVAL or time.time() - self._last_reconcile < self.RECONCILE_INTERVAL:
+            return
+        if self._reconcile_task is not None and not self._reconcile_task.done():
+            return
+        self._last_reconcile = time.time()
+        self._reconcile_task = asyncio.create_task(self.reconcile_sessions())
+
+    async def reconcile_sessions(self):
+        try:
+            checked, corrected = await handle_reconcile(self)
+            if corrected or self.DEBUG_LOG:
+                logger.info(f"会话对账完成：查询 {checked} 个玩家，写入 {corrected} 条校正记录")
+        except Exception as e:
+            logger.warning(f"会话对账失败: {e}")
+
+    async def _idle(self, seconds):
+        '''等待下一轮；分片模式下间隔被拉长时分段等待并续约，避免租约在两轮之间过期'''
+        if self.cluster is None:
+            await self._sleep(seconds)
+            return
+        step = self.cluster.lease_ttl / 3
+        while seconds > step and self.running and not self._wake.is_set():
+            await self._sleep(step)
+            seconds -= step
+            try:
+                await self.cluster.rebalance(self.monitored_ids())
+            except Exception as e:
+                logger.warning(f"分片续约失败: {e}")
+        await self._sleep(seconds)
+
+    async def _sleep(self, seconds):
+        '''等待指定秒数，_wake 被设置时提前返回'''
+        try:
+            await asyncio.wait_for(self._wake.wait(), max(0, seconds))
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,187 @@
+import os
+import asyncio
+from urllib.parse import urlparse
+from astrbot.api import logger
+
+# 延迟直方图的默认分桶（秒）
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def endpoint_name(url):
+    '''从请求 URL 提取接口名（如 GetPlayerSummaries、appdetails），作为延迟指标的标签'''
+    parts = [p for p in urlparse(url).path.split("/") if p]
+    if len(parts) >= 2 and parts[0].startswith("I"):
+        return parts[1]
+    return parts[-1] if parts else "unknown"
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key, extra=None):
+    items = list(key) + (extra or [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q):
+        '''按分桶估算分位数（返回所在桶的上界）'''
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return float("inf")
+
+class Metrics:
+    '''进程内指标：计数器、延迟直方图与按需读取的仪表（gauge），可导出 Prometheus 文本格式'''
+
+    def __init__(self):
+        self._counters = {}    # name -> {label_key: value}
+        self._histograms = {}  # name -> {label_key: Histogram}
+        self._gauges = {}      # name -> (取值函数, 类型)
+        self._help = {}
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def inc(self, name, value=1, **labels):
+        series = self._counters.setdefault(name, {})
+        key = _label_key(labels)
+        series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS, **labels):
+        series = self._histograms.setdefault(name, {})
+        key = _label_key(labels)
+        hist = series.get(key)
+        if hist is None:
+            hist = series[key] = Histogram(buckets)
+        hist.observe(value)
+
+    def gauge(self, name, func, help_text=None, kind="gauge"):
+        '''登记按需读取的指标；由其他组件自行累计的总数以 kind="counter" 导出
+        func 也可以返回 [(标签字典, 值), ...]，导出为带标签的多条序列'''
+        self._gauges[name] = (func, kind)
+        if help_text:
+            self._help[name] = help_text
+
+    def counter_value(self, name, **labels):
+        series = self._counters.get(name, {})
+        if labels:
+            return series.get(_label_key(labels), 0)
+        return sum(series.values())
+
+    def histogram(self, name, **labels):
+        return self._histograms.get(name, {}).get(_label_key(labels))
+
+    def series(self, name):
+        '''返回某个直方图的全部序列 [(标签字典, Histogram), ...]'''
+        return [(dict(k), h) for k, h in self._histograms.get(name, {}).items()]
+
+    def counter_series(self, name):
+        return [(dict(k), v) for k, v in self._counters.get(name, {}).items()]
+
+    def read(self, name, default=0):
+        entry = self._gauges.get(name)
+        if entry is None:
+            return default
+        try:
+            return entry[0]()
+        except Exception:
+            return default
+
+    def render_prometheus(self):
+        lines = []
+        for name, series in self._counters.items():
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in series.items():
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        for name, series in self._histograms.items():
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, hist in series.items():
+                cumulative = 0
+                for bound, n in zip(hist.buckets, hist.counts):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {hist.count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {hist.sum}")
+                lines.append(f"{name}_count{_format_labels(key)} {hist.count}")
+        for name, (func, kind) in self._gauges.items():
+            try:
+                value = func()
+            except Exception:
+                continue
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+            if isinstance(value, list):
+                for labels, v in value:
+                    lines.append(f"{name}{_format_labels(_label_key(labels))} {v}")
+            else:
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        '''写入 Prometheus node_exporter textfile 目录（先写临时文件再替换）'''
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+class MetricsHttpServer:
+    '''极简的本地 HTTP 指标端点，任何 GET 请求都返回 Prometheus 文本'''
+
+    def __init__(self, metrics, host="127.0.0.1", port=9108):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self):
+        try:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port)
+            logger.info(f"Steam 监控指标端点已启动: http://{self.host}:{self.port}/metrics")
+        except Exception as e:
+            logger.error(f"Steam 监控指标端点启动失败: {e}")
+
+    async def _handle(self, reader, writer):
+        try:
+            await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5)
+            body = self.metrics.render_prometheus().encode("utf-8")
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except Exception:
+            pass
+        finally:
+            writer.close()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
@@ -0,0 +1,114 @@
+import time
+import asyncio
+from astrbot.api import logger
+from astrbot.api.event import MessageChain
+from astrbot.api.message_components import Plain
+
+class NotificationDispatcher:
+    '''异步通知分发器
+    轮询只负责把通知放进有界队列，由独立的分发任务发送，消息发送再慢也不拖累轮询节拍；
+    同一会话在 coalesce_window 秒内的多条通知合并成一条消息，发送失败按指数退避重试。'''
+
+    def __init__(self, context, maxsize=1000, coalesce_window=2.0, max_retries=3, send_timeout=30):
+        self.context = context
+        self.coalesce_window = coalesce_window
+        self.max_retries = max_retries
+        self.send_timeout = send_timeout
+        self._queue = asyncio.Queue(maxsize=maxsize)
+        self._task = None
+        # 背压指标
+        self.submitted = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.last_latency = 0.0
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def submit(self, session, text):
+        '''提交一条通知，不等待发送；队列已满时丢弃并计数'''
+        if not session:
+            logger.error("未设置推送会话，无法发送消息")
+            return False
+        try:
+            self._queue.put_nowait((session, text, time.monotonic()))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.error(f"通知队列已满（{self._queue.maxsize}），丢弃消息: {text}")
+            return False
+        self.submitted += 1
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+        return True
+
+    async def _collect(self):
+        '''取出一条通知，并在合并窗口内继续收集，按会话分组（保持顺序）'''
+        first = await self._queue.get()
+        batch = [first]
+        deadline = time.monotonic() + self.coalesce_window
+        while True:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        grouped = {}
+        for session, text, queued_at in batch:
+            grouped.setdefault(session, []).append((text, queued_at))
+        return grouped, len(batch)
+
+    async def _send(self, session, text):
+        delay = 1
+        for attempt in range(self.max_retries):
+            try:
+                await asyncio.wait_for(
+                    self.context.send_message(session, MessageChain([Plain(text)])),
+                    self.send_timeout
+                )
+                return True
+            except Exception as e:
+                logger.warning(f"推送消息失败: {e!r} (会话: {session}, 第{attempt+1}次尝试)")
+                if attempt < self.max_retries - 1:
+                    await asyncio.sleep(delay)
+                    delay *= 2
+        return False
+
+    async def _run(self):
+        while True:
+            grouped, count = await self._collect()
+            for session, items in grouped.items():
+                text = "\n\n".join(t for t, _ in items)
+                if await self._send(session, text):
+                    self.sent += 1
+                    self.coalesced += len(items) - 1
+                    self.last_latency = time.monotonic() - items[0][1]
+                else:
+                    self.failed += len(items)
+                    logger.error(f"推送消息最终失败，已放弃 {len(items)} 条通知 (会话: {session})")
+            for _ in range(count):
+                self._queue.task_done()
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def summary(self):
+        return (
+            f"通知队列: 积压 {self.depth()}（峰值 {self.max_depth}），已提交 {self.submitted}，"
+            f"已发送 {self.sent} 条消息（合并 {self.coalesced} 条），失败 {self.failed}，丢弃 {self.dropped}，"
+            f"最近延迟 {self.last_latency:.1f} 秒"
+        )
+
+    async def close(self, timeout=10):
+        '''尽量发送完积压的通知后停止分发任务'''
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"插件卸载时仍有 {self.depth()} 条通知未发送")
+        self._task.cancel()
@@ -1,12 +1,12 @@
 import time
-import httpx
 from astrbot.api.message_components import Plain, Image
 
 async def handle_openbox(self, event, steamid: str):
-    '''查询并格式化展示指定SteamID的全部API返回信息（中文字段名，头像图片附加，位置ID合并，状态字段直观显示）'''
+    '''查询并格式化展示指定SteamID的全部API返回信息（中文字段名，头像图片附加，位置ID合并，状态字段直观显示）
+    玩家信息在 openbox_profile_ttl_sec 内直接复用缓存，头像使用本地缓存文件'''
     url = (
         "https://api.steampowered.com/ISteamUser/GetPlayerSummaries/v2/"
-        f"?key={self.API_KEY}&steamids={steamid}"
+        f"?steamids={steamid}"
     )
     field_map = {
         "steamid": "SteamID",
@@ -48,8 +48,10 @@ async def handle_openbox(self, event, steamid: str):
         2: "所有人可评论"
     }
     try:
-        async with httpx.AsyncClient(timeout=15) as client:
-            resp = await client.get(url)
+        player = self.profile_cache.get(steamid)
+        self.metrics.inc("openbox_profile_cache_total", result="hit" if player else "miss")
+        if player is None:
+            resp = await self.steam_get(url)
             if resp.status_code != 200:
                 yield event.plain_result(f"API请求失败: HTTP {resp.status_code}")
                 return
@@ -59,45 +61,52 @@ async def handle_openbox(self, event, steamid: str):
                 yield event.plain_result("未查到该SteamID信息")
                 return
             player = players[0]
-            avatar_url = player.get("avatarfull") or player.get("avatar")
-            loc_country = player.get("loccountrycode")
-            loc_state = player.get("locstatecode")
-            loc_city = player.get("loccityid")
-            lines = []
-            now = int(time.time())
-            for k, v in player.items():
-                if k in ("avatarmedium", "avatarfull", "loccountrycode", "locstatecode", "loccityid"):
-                    continue
-                if k == "avatar":
-                    continue
-                zh_key = field_map.get(k, k)
-                if k == "personastate":
-                    state_str = personastate_map.get(v, str(v))
-                    if v == 0:
-                        lastlogoff = player.get("lastlogoff")
-                        if lastlogoff:
-                            hours_ago = (now - int(lastlogoff)) / 3600
-                            state_str += f"-上次在线-{hours_ago:.1f}小时前"
-                    v = state_str
-                elif k == "communityvisibilitystate":
-                    v = communityvisibilitystate_map.get(v, str(v))
-                elif k == "profilestate":
-                    v = profilestate_map.get(v, str(v))
-                elif k == "commentpermission":
-                    v = commentpermission_map.get(v, str(v))
-                elif k == "personastateflags":
-                    v = str(v)
-                elif k in ("lastlogoff", "timecreated") and isinstance(v, int):
-                    from datetime import datetime
-                    v = datetime.fromtimestamp(v).strftime("%Y-%m-%d %H:%M:%S")
-                lines.append(f"{zh_key}: {v}")
-            if loc_country or loc_state or loc_city:
-                loc_str = "-".join(str(x) for x in [loc_country, loc_state, loc_city] if x)
-                lines.append(f"位置ID: {loc_str}")
-            msg_chain = []
-            if avatar_url:
+            self.profile_cache.put(steamid, player)
+        avatar_url = player.get("avatarfull") or player.get("avatar")
+        loc_country = player.get("loccountrycode")
+        loc_state = player.get("locstatecode")
+        loc_city = player.get("loccityid")
+        lines = []
+        now = int(time.time())
+        for k, v in player.items():
+            if k in ("avatarmedium", "avatarfull", "loccountrycode", "locstatecode", "loccityid"):
+                continue
+            if k == "avatar":
+                continue
+            zh_key = field_map.get(k, k)
+            if k == "personastate":
+                state_str = personastate_map.get(v, str(v))
+                if v == 0:
+                    lastlogoff = player.get("lastlogoff")
+                    if lastlogoff:
+                        hours_ago = (now - int(lastlogoff)) / 3600
+                        state_str += f"-上次在线-{hours_ago:.1f}小时前"
+                v = state_str
+            elif k == "communityvisibilitystate":
+                v = communityvisibilitystate_map.get(v, str(v))
+            elif k == "profilestate":
+                v = profilestate_map.get(v, str(v))
+            elif k == "commentpermission":
+                v = commentpermission_map.get(v, str(v))
+            elif k == "personastateflags":
+                v = str(v)
+            elif k in ("lastlogoff", "timecreated") and isinstance(v, int):
+                from datetime import datetime
+                v = datetime.fromtimestamp(v).strftime("%Y-%m-%d %H:%M:%S")
+            lines.append(f"{zh_key}: {v}")
+        if loc_country or loc_state or loc_city:
+            loc_str = "-".join(str(x) for x in [loc_country, loc_state, loc_city] if x)
+            lines.append(f"位置ID: {loc_str}")
+        msg_chain = []
+        if avatar_url:
+            avatar_path = await self.avatar_cache.get(self.http_client, avatar_url)
+            self.metrics.inc("openbox_avatar_total", source="file" if avatar_path else "url")
+            if avatar_path:
+                msg_chain.append(Image.fromFileSystem(avatar_path, width=64, height=64))
+            else:
+                # 下载失败时退回由平台自行拉取
                 msg_chain.append(Image.fromURL(avatar_url, width=64, height=64))
-            msg_chain.append(Plain("SteamID详细信息：\n" + "\n".join(lines)))
-            yield event.chain_result(msg_chain)
+        msg_chain.append(Plain("SteamID详细信息：\n" + "\n".join(lines)))
+        yield event.chain_result(msg_chain)
     except Exception as e:
         yield event.plain_result(f"请求异常: {e}")
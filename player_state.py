@@ -0,0 +1,118 @@
+# 状态转换事件类型
+START = "start"      # 开始玩游戏（无 -> B）
+SWITCH = "switch"    # 切换游戏（A -> B）
+STOP = "stop"        # 退出游戏（A -> 无）
+
+class PlayerState:
+    '''单个玩家的监控状态
+    使用 __slots__ 紧凑存储（没有每实例的 __dict__），数万玩家时内存占用远小于每人一个 dict；
+    session_start 为当前游戏会话的开始时间，不在游戏中时为 None。'''
+    __slots__ = ("steamid", "name", "personastate", "gameid", "gameextrainfo", "lastlogoff", "session_start")
+
+    def __init__(self, steamid, name=None, personastate=None, gameid=None,
+                 gameextrainfo=None, lastlogoff=None, session_start=None):
+        self.steamid = steamid
+        self.name = name
+        self.personastate = personastate
+        self.gameid = gameid
+        self.gameextrainfo = gameextrainfo
+        self.lastlogoff = lastlogoff
+        self.session_start = session_start
+
+    @classmethod
+    def from_summary(cls, player):
+        '''从 GetPlayerSummaries 返回的玩家对象中提取监控所需字段'''
+        return cls(
+            str(player.get('steamid', '')),
+            name=player.get('personaname'),
+            personastate=player.get('personastate', 0),
+            gameid=player.get('gameid'),
+            gameextrainfo=player.get('gameextrainfo'),
+            lastlogoff=player.get('lastlogoff')
+        )
+
+    @classmethod
+    def from_dict(cls, steamid, data, session_start=None):
+        '''从快照中的状态字典恢复'''
+        return cls(
+            steamid,
+            name=data.get('name'),
+            personastate=data.get('personastate'),
+            gameid=data.get('gameid'),
+            gameextrainfo=data.get('gameextrainfo'),
+            lastlogoff=data.get('lastlogoff'),
+            session_start=session_start
+        )
+
+    def to_dict(self):
+        '''快照用的状态字典（会话开始时间单独保存在 start_play_times 中）'''
+        return {
+            'name': self.name,
+            'gameid': self.gameid,
+            'lastlogoff': self.lastlogoff,
+            'gameextrainfo': self.gameextrainfo,
+            'personastate': self.personastate
+        }
+
+    def copy(self):
+        return PlayerState(
+            self.steamid, self.name, self.personastate, self.gameid,
+            self.gameextrainfo, self.lastlogoff, self.session_start
+        )
+
+    def fingerprint(self):
+        '''决定状态是否变化的字段：相同则不会产生状态转换，渲染出的状态文本也不变'''
+        return (self.personastate, self.gameid, self.lastlogoff, self.name)
+
+    @property
+    def online(self):
+        return bool(self.personastate) and int(self.personastate) > 0
+
+class Transition:
+    '''一次状态转换事件；prev_* 与 session_start 描述被结束的游戏会话（SWITCH/STOP）'''
+    __slots__ = ("kind", "steamid", "name", "gameid", "game", "prev_gameid", "prev_game", "session_start")
+
+    def __init__(self, kind, steamid, name, gameid=None, game=None,
+                 prev_gameid=None, prev_game=None, session_start=None):
+        self.kind = kind
+        self.steamid = steamid
+        self.name = name
+        self.gameid = gameid
+        self.game = game
+        self.prev_gameid = prev_gameid
+        self.prev_game = prev_game
+        self.session_start = session_start
+
+    def __repr__(self):
+        return f"Transition({self.kind}, {self.steamid}, {self.prev_gameid} -> {self.gameid})"
+
+def diff_states(prev_states, current, now):
+    '''对比上一轮状态与本轮状态，返回 (按 current 顺序排列的转换事件列表, {steamid: 会话开始时间})
+    会话开始时间：继续中的会话沿用原开始时间，新会话从 now 开始，不在游戏中为 None，由调用方写回新状态。
+    纯函数：不读时钟、不发通知、不写日志，也不修改 prev_states 与 current，可单独测试与压测。'''
+    events = []
+    starts = {}
+    for sid, cur in current.items():
+        prev = prev_states.get(sid)
+        name = cur.name or sid
+        prev_gameid = prev.gameid if prev else None
+        if cur.gameid:
+            if prev_gameid and cur.gameid != prev_gameid:
+                events.append(Transition(
+                    SWITCH, sid, name, cur.gameid, cur.gameextrainfo,
+                    prev_gameid, prev.gameextrainfo, prev.session_start
+                ))
+                starts[sid] = now
+            elif not prev_gameid:
+                events.append(Transition(START, sid, name, cur.gameid, cur.gameextrainfo))
+                starts[sid] = now
+            else:
+                starts[sid] = prev.session_start
+        else:
+            starts[sid] = None
+            if prev_gameid:
+                events.append(Transition(
+                    STOP, sid, name, prev_gameid=prev_gameid,
+                    prev_game=prev.gameextrainfo, session_start=prev.session_start
+                ))
+    return events, starts
@@ -0,0 +1,91 @@
+import os
+import re
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from astrbot.api import logger
+from .singleflight import SingleFlight
+
+class ProfileCache:
+    '''SteamID -> GetPlayerSummaries 完整玩家对象 的内存缓存（TTL + LRU），供 /steam openbox 复用'''
+
+    def __init__(self, ttl=300, max_entries=500):
+        self.ttl = ttl
+        self.max_entries = max(1, int(max_entries))
+        self._entries = OrderedDict()  # steamid -> (过期时间戳, 玩家对象)
+
+    def get(self, steamid):
+        entry = self._entries.get(steamid)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            del self._entries[steamid]
+            return None
+        self._entries.move_to_end(steamid)
+        return entry[1]
+
+    def put(self, steamid, player):
+        if self.ttl <= 0:
+            return
+        self._entries[steamid] = (time.time() + self.ttl, player)
+        self._entries.move_to_end(steamid)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+# Steam 头像地址形如 .../<40位哈希>_full.jpg，哈希随头像内容变化
+_AVATAR_RE = re.compile(r"/([0-9a-f]{40}(?:_\w+)?\.(?:jpg|png|gif))$", re.IGNORECASE)
+
+class AvatarCache:
+    '''按头像地址中的内容哈希保存在磁盘上的头像缓存（avatar_cache/ 目录）
+    头像没变时直接发送本地文件，不再重复下载；同一头像的并发下载只进行一次。
+    文件数超过 max_files 时删除最久未使用的头像。'''
+
+    def __init__(self, max_files=500):
+        self.path = os.path.join(os.path.dirname(__file__), "avatar_cache")
+        self.max_files = max(1, int(max_files))
+        self._flights = SingleFlight()
+
+    @staticmethod
+    def key_for(url):
+        match = _AVATAR_RE.search(url)
+        if match:
+            return match.group(1).lower()
+        # 非标准地址按 URL 本身取哈希
+        return hashlib.sha1(url.encode("utf-8")).hexdigest() + ".img"
+
+    def _lookup(self, file_path):
+        if os.path.exists(file_path):
+            os.utime(file_path)  # 刷新使用时间，供淘汰时参考
+            return True
+        return False
+
+    def _write(self, file_path, content):
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = file_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, file_path)
+        names = [n for n in os.listdir(self.path) if not n.endswith(".tmp")]
+        if len(names) > self.max_files:
+            paths = sorted((os.path.join(self.path, n) for n in names), key=os.path.getmtime)
+            for old in paths[:len(names) - self.max_files]:
+                os.remove(old)
+
+    async def get(self, http_client, url):
+        '''返回头像的本地文件路径（命中缓存或下载成功）；下载失败返回 None'''
+        file_path = os.path.join(self.path, self.key_for(url))
+        if await asyncio.to_thread(self._lookup, file_path):
+            return file_path
+        return await self._flights.do(file_path, lambda: self._download(http_client, url, file_path))
+
+    async def _download(self, http_client, url, file_path):
+        try:
+            resp = await http_client.get(url)
+            if resp.status_code != 200 or not resp.content:
+                raise Exception(f"HTTP {resp.status_code}")
+            await asyncio.to_thread(self._write, file_path, resp.content)
+            return file_path
+        except Exception as e:
+            logger.warning(f"下载头像失败: {e} ({url})")
+            return None
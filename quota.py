@@ -0,0 +1,121 @@
+import time
+import asyncio
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+
+class QuotaExceeded(Exception):
+    '''当日 API 调用额度已用完'''
+
+def budget_interval(remaining, daily_limit, reserve_ratio, calls_per_round, interval):
+    '''把剩余额度均摊到当天剩余时间内，返回不超额的最短轮询间隔（remaining 为 None 表示不限）'''
+    if remaining is None or calls_per_round <= 0:
+        return interval
+    now = datetime.now()
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    seconds_left = (tomorrow - now).total_seconds()
+    budget = remaining - daily_limit * reserve_ratio
+    if budget < calls_per_round:
+        # 额度吃紧：只保留预留部分，等到明天额度刷新
+        return max(interval, seconds_left)
+    return max(interval, seconds_left * calls_per_round / budget)
+
+class ApiQuota:
+    '''Steam API 调用配额管理
+    令牌桶限制每秒请求速率，另按自然日统计调用总量（daily_limit 为 None 表示不限）；
+    收到 429 时按 Retry-After 暂停所有请求，并据剩余额度推算建议的轮询间隔。'''
+
+    def __init__(self, name, rate=5.0, burst=None, daily_limit=None, reserve_ratio=0.1):
+        self.name = name
+        self.rate = max(0.01, float(rate))
+        self.burst = max(1.0, float(burst if burst is not None else self.rate))
+        self.daily_limit = daily_limit
+        self.reserve_ratio = reserve_ratio
+        self._tokens = self.burst
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._day = datetime.now().date()
+        self.used_today = 0
+        self.throttled = 0  # 收到 429 的次数
+        self._lock = asyncio.Lock()
+
+    def _roll_day(self):
+        today = datetime.now().date()
+        if today != self._day:
+            self._day = today
+            self.used_today = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def usage(self):
+        '''当日调用量 (日期, 次数)，保存到状态快照中，重启后继续按同一日配额计数'''
+        self._roll_day()
+        return self._day.isoformat(), self.used_today
+
+    def restore_usage(self, day, used):
+        '''累加快照中保存的当日调用量（日期不是今天则忽略）'''
+        self._roll_day()
+        if day == self._day.isoformat():
+            self.used_today += int(used)
+
+    def remaining_today(self):
+        self._roll_day()
+        if self.daily_limit is None:
+            return None
+        return max(0, self.daily_limit - self.used_today)
+
+    async def acquire(self):
+        '''取得一次调用许可；额度用完抛出 QuotaExceeded，其余情况按速率等待'''
+        async with self._lock:
+            self._roll_day()
+            if self.daily_limit is not None and self.used_today >= self.daily_limit:
+                raise QuotaExceeded(f"{self.name} 今日调用额度已用完（{self.daily_limit}次）")
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._refill()
+                if self._tokens >= 1:
+                    break
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+            self._tokens -= 1
+            self.used_today += 1
+
+    def penalize(self, retry_after=None, default=10):
+        '''收到 429 后暂停请求；retry_after 为响应头中的 Retry-After（秒或 HTTP 日期）'''
+        self.throttled += 1
+        delay = default
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                except Exception:
+                    delay = default
+        self._blocked_until = max(self._blocked_until, time.monotonic() + max(0, delay))
+        self._tokens = 0
+
+    def ready(self):
+        '''当前是否可以立即发出请求（未被 429 暂停且令牌桶有余量）'''
+        self._refill()
+        return time.monotonic() >= self._blocked_until and self._tokens >= 1
+
+    def blocked_for(self):
+        return max(0.0, self._blocked_until - time.monotonic())
+
+    def recommended_interval(self, calls_per_round, base_interval):
+        '''按当日剩余额度（预留 reserve_ratio 给其他指令）与当天剩余时间，推算不超额的最短轮询间隔'''
+        interval = max(float(base_interval), self.blocked_for())
+        return budget_interval(
+            self.remaining_today(), self.daily_limit, self.reserve_ratio, calls_per_round, interval
+        )
+
+    def summary(self):
+        remaining = self.remaining_today()
+        limit = "不限" if self.daily_limit is None else f"{self.daily_limit}"
+        left = "" if remaining is None else f"，剩余 {remaining}"
+        return f"{self.name}: 今日已用 {self.used_today}/{limit}{left}，429 次数 {self.throttled}"
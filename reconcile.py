@@ -0,0 +1,157 @@
+import time
+import asyncio
+from .json_file import JsonFile
+
+RECENT_GAMES_URL = "https://api.steampowered.com/IPlayerService/GetRecentlyPlayedGames/v1/"
+TWO_WEEKS = 14 * 86400
+
+def _overlap_minutes(item, since, until):
+    '''一条游玩记录与 (since, until] 的重叠时长（分钟）'''
+    end = int(item["end_time"])
+    start = end - float(item.get("duration") or 0) * 60
+    return max(0.0, min(end, until) - max(start, since)) / 60
+
+class SessionReconciler:
+    '''用 Steam 记录的游戏总时长校正轮询得到的游玩记录
+    每个玩家每个游戏保存一份基线 (playtime_forever, 取值时间)，下次对账时
+    Steam 时长增量 - 期间游玩记录覆盖的时长 = 漏记（轮询间隔中的短局、停机期间的会话）或多记（结束检测滞后）的分钟数，
+    超过 tolerance 分钟时写入一条 source="reconcile" 的校正记录。
+    正在玩的游戏、刚结束不久（Steam 可能尚未更新时长）的游戏本次不对账，基线保持不变。
+    基线保存在插件目录的 reconcile_state.json，重启后停机期间的游玩时长也能补录。'''
+
+    def __init__(self, path, tolerance=10, settle_sec=600):
+        self.path = path
+        self._file = JsonFile(path)
+        self.tolerance = tolerance
+        self.settle_sec = settle_sec
+        # steamid -> {"t": 上次对账时间, "games": {appid: [playtime_forever, 取值时间] 或 None（待定）}}
+        self.baselines = {}
+        self._loaded = False
+
+    async def load(self):
+        if self._loaded:
+            return
+        try:
+            self.baselines = await self._file.load() or {}
+        except Exception:
+            self.baselines = {}
+        self._loaded = True
+
+    async def save(self):
+        await self._file.save(self.baselines)
+
+    def needs_check(self, steamid, state):
+        '''上次对账后可能玩过游戏的玩家：没有基线、在线/游戏中，或上次下线时间晚于上次对账'''
+        baseline = self.baselines.get(steamid)
+        if baseline is None:
+            return True
+        if state is None:
+            return False
+        if state.gameid or state.online:
+            return True
+        return bool(state.lastlogoff) and int(state.lastlogoff) >= baseline["t"]
+
+    def reconcile(self, steamid, games, logs, playing_gameid, now):
+        '''对比一个玩家的 GetRecentlyPlayedGames 结果与期间的游玩记录，更新基线
+        games 为接口返回的 games 列表，logs 为该玩家最近的游玩记录；
+        返回校正列表 [(gameid, 游戏名, 校正分钟数)]，首次对账只建立基线'''
+        baseline = self.baselines.get(steamid)
+        entries = baseline["games"] if baseline else {}
+        adjustments = []
+        for game in games:
+            appid = str(game.get("appid", ""))
+            forever = game.get("playtime_forever")
+            if not appid or forever is None:
+                continue
+            if appid == str(playing_gameid or "") or any(
+                str(item.get("gameid")) == appid and int(item["end_time"]) > now - self.settle_sec
+                for item in logs
+            ):
+                # 还没有基线的游戏记为待定（null），之后不能再用两周时长推算
+                entries.setdefault(appid, None)
+                continue
+            pending = appid in entries and entries[appid] is None
+            entry = entries.get(appid)
+            entries[appid] = [forever, now]
+            if baseline is None or pending:
+                continue
+            if entry is not None:
+                since = entry[1]
+                delta = forever - entry[0]
+            elif now - baseline["t"] < TWO_WEEKS:
+                # 上次对账时不在最近游玩列表中：这两周的时长都发生在上次对账之后
+                since = baseline["t"]
+                delta = game.get("playtime_2weeks") or 0
+            else:
+                continue
+            logged = sum(
+                _overlap_minutes(item, since, now) for item in logs
+                if str(item.get("gameid")) == appid and item.get("source") != "reconcile"
+            )
+            diff = round(delta - logged, 1)
+            if abs(diff) >= self.tolerance:
+                adjustments.append((appid, game.get("name") or appid, diff))
+        if baseline is not None and now - baseline["t"] < TWO_WEEKS:
+            # 不在最近游玩列表中的游戏这段时间没有玩过，基线时间直接前移
+            listed = {str(game.get("appid", "")) for game in games}
+            for appid, entry in entries.items():
+                if entry is not None and appid not in listed:
+                    entry[1] = now
+        self.baselines[steamid] = {"t": now, "games": entries}
+        return adjustments
+
+    def oldest(self, steam_ids):
+        '''这些玩家中最早的一次对账时间（用于一次性查出期间的游玩记录）'''
+        times = [
+            min([self.baselines[sid]["t"]] + [e[1] for e in self.baselines[sid]["games"].values() if e])
+            for sid in steam_ids if sid in self.baselines
+        ]
+        return min(times) if times else None
+
+async def handle_reconcile(self):
+    '''执行一次会话对账：只查询上次对账后可能玩过游戏的玩家，每人一次 GetRecentlyPlayedGames
+    返回 (查询人数, 校正条数)'''
+    reconciler = self.reconciler
+    await reconciler.load()
+    candidates = [
+        sid for sid in self.monitored_ids()
+        if reconciler.needs_check(sid, self.last_states.get(sid))
+    ]
+    if not candidates:
+        return 0, 0
+    since = reconciler.oldest(candidates)
+    logs_by_user = await self.game_log.get_logs_by_user(candidates, since) if since is not None else {}
+    sem = asyncio.Semaphore(4)
+
+    async def fetch(sid):
+        async with sem:
+            resp = await self.steam_get(f"{RECENT_GAMES_URL}?steamid={sid}")
+            if resp.status_code != 200:
+                raise Exception(f"HTTP {resp.status_code}")
+            return (resp.json().get("response") or {}).get("games") or []
+
+    results = await asyncio.gather(*(fetch(sid) for sid in candidates), return_exceptions=True)
+    now = int(time.time())
+    checked = corrected = 0
+    for sid, games in zip(candidates, results):
+        if isinstance(games, Exception):
+            self.metrics.inc("steam_reconcile_failures_total")
+            continue
+        checked += 1
+        state = self.last_states.get(sid)
+        playing = state.gameid if state else None
+        for gameid, game_name, minutes in reconciler.reconcile(sid, games, logs_by_user.get(sid, []), playing, now):
+            corrected += 1
+            self.metrics.inc("steam_reconcile_adjustments_total", direction="add" if minutes > 0 else "remove")
+            self.metrics.inc("steam_reconcile_minutes_total", abs(minutes), direction="add" if minutes > 0 else "remove")
+            await self.game_log.record_log(
+                steamid=sid,
+                player_name=(state.name if state and state.name else None) or self.game_log.player_name(sid) or sid,
+                gameid=gameid,
+                game_name=await self.get_chinese_game_name(gameid, game_name),
+                duration=minutes,
+                end_time=now,
+                source="reconcile"
+            )
+    await reconciler.save()
+    return checked, corrected
@@ -0,0 +1,182 @@
+import os
+from datetime import datetime, timedelta
+from .json_file import read_json, write_atomic, dumps
+
+# 最近一次换算的自然日 (起始时间戳, 结束时间戳, 日期键)；记录大多按时间顺序到达，可直接复用
+_last_day = (0, 0, "")
+
+def day_key(ts):
+    '''按本地时间把时间戳归到自然日（YYYY-MM-DD）'''
+    global _last_day
+    start, end, key = _last_day
+    if start <= ts < end:
+        return key
+    dt = datetime.fromtimestamp(ts)
+    midnight = datetime(dt.year, dt.month, dt.day)
+    key = dt.strftime("%Y-%m-%d")
+    _last_day = (midnight.timestamp(), (midnight + timedelta(days=1)).timestamp(), key)
+    return key
+
+class PlaytimeRollup:
+    '''按 天 × 玩家 × 游戏 增量维护的游玩时长汇总，保存在游玩记录旁的 game_log_rollup/ 目录
+    每条新记录写入时顺带累加（跨零点的会话记在结束那天），每天另保留最长的几局；
+    排行榜与周统计只读取窗口内的天数，开销与历史长度无关。
+    按月分区保存（每月一个 YYYY-MM.json，玩家名/游戏名等放在 meta.json），落盘时只重写有变化的月份；
+    超过游玩记录保留天数的汇总随记录一起清理，手动清理游玩记录（/steam logc）不影响已汇总的数据。'''
+
+    META = "meta.json"
+
+    def __init__(self, path, longest_per_day=5):
+        self.path = path
+        self.legacy_path = path + ".json"  # 旧版本的单文件汇总，加载时迁移为按月分区
+        self.longest_per_day = longest_per_day
+        self.days = {}          # day -> {steamid: {gameid: [分钟, 局数]}}
+        self.longest = {}       # day -> [[分钟, steamid, gameid, end_time], ...]（降序）
+        self.player_names = {}  # steamid -> 最近记录的玩家名
+        self.game_names = {}    # gameid -> 最近记录的游戏名
+        self.last_end_time = 0  # 已汇总记录的最大结束时间，用于启动时补齐
+        self._dirty_months = set()
+        self._meta_dirty = False
+
+    @property
+    def dirty(self):
+        return bool(self._dirty_months) or self._meta_dirty
+
+    def add(self, item):
+        sid = item["steamid"]
+        gameid = str(item.get("gameid") or "")
+        duration = float(item.get("duration") or 0)
+        end_time = int(item.get("end_time") or 0)
+        day = day_key(end_time)
+        cell = self.days.setdefault(day, {}).setdefault(sid, {}).setdefault(gameid, [0.0, 0])
+        cell[0] += duration
+        # 会话对账的校正记录只修正时长（可为负），不算一局，也不进最长单局
+        reconciled = item.get("source") == "reconcile"
+        if not reconciled:
+            cell[1] += 1
+        top = self.longest.setdefault(day, [])
+        if not reconciled and (len(top) < self.longest_per_day or duration > top[-1][0]):
+            top.append([duration, sid, gameid, end_time])
+            top.sort(key=lambda x: -x[0])
+            del top[self.longest_per_day:]
+        if item.get("player_name"):
+            self.player_names[sid] = item["player_name"]
+        if item.get("game_name"):
+            self.game_names[gameid] = item["game_name"]
+        self.last_end_time = max(self.last_end_time, end_time)
+        self._dirty_months.add(day[:7])
+        self._meta_dirty = True
+
+    def _month_files(self):
+        if not os.path.isdir(self.path):
+            return []
+        return [n for n in os.listdir(self.path) if n.endswith(".json") and n != self.META]
+
+    def _reset(self):
+        '''丢弃已加载的数据；已有的月份文件标记为待重写，重建后没有数据的月份会被删除'''
+        self.days, self.longest = {}, {}
+        self.player_names, self.game_names = {}, {}
+        self.last_end_time = 0
+        self._dirty_months = {n[:-5] for n in self._month_files()}
+        self._meta_dirty = True
+
+    def load(self):
+        '''读取汇总，不存在或损坏时返回 False（需要从游玩记录重建）'''
+        try:
+            if not os.path.isdir(self.path):
+                data = read_json(self.legacy_path)
+                if data is None:
+                    return False
+                # 旧版本单文件：全部月份写成分区后删除旧文件
+                self.days = data["days"]
+                self.longest = data["longest"]
+                meta = data
+                self._dirty_months = {day[:7] for day in self.days}
+                self._meta_dirty = True
+            else:
+                meta = read_json(os.path.join(self.path, self.META))
+                if meta is None:
+                    self._reset()
+                    return False
+                for name in self._month_files():
+                    part = read_json(os.path.join(self.path, name))
+                    self.days.update(part["days"])
+                    self.longest.update(part["longest"])
+            self.player_names = meta.get("player_names", {})
+            self.game_names = meta.get("game_names", {})
+            self.last_end_time = meta.get("last_end_time", 0)
+        except Exception:
+            self._reset()
+            return False
+        return True
+
+    def prune_before(self, day):
+        '''删除 day（YYYY-MM-DD）之前各天的汇总，返回删除的天数'''
+        old = [d for d in self.days if d < day] + [d for d in self.longest if d < day and d not in self.days]
+        for d in old:
+            self.days.pop(d, None)
+            self.longest.pop(d, None)
+            self._dirty_months.add(d[:7])
+        return len(old)
+
+    def dumps(self):
+        '''序列化有变化的分区（在事件循环中调用，得到一致的快照）并清除修改标记
+        返回 {文件名: 内容}，内容为 None 表示该月已没有数据、删除文件'''
+        files = {}
+        for month in self._dirty_months:
+            days = {d: v for d, v in self.days.items() if d[:7] == month}
+            longest = {d: v for d, v in self.longest.items() if d[:7] == month}
+            files[f"{month}.json"] = dumps({"days": days, "longest": longest}) if days or longest else None
+        if self._meta_dirty:
+            files[self.META] = dumps({
+                "player_names": self.player_names,
+                "game_names": self.game_names,
+                "last_end_time": self.last_end_time
+            })
+        self._dirty_months = set()
+        self._meta_dirty = False
+        return files
+
+    def write(self, files):
+        os.makedirs(self.path, exist_ok=True)
+        # meta.json 最后写入：其中的 last_end_time 不会领先于已落盘的月份
+        for name in sorted(files, key=lambda n: n == self.META):
+            path = os.path.join(self.path, name)
+            if files[name] is None:
+                if os.path.exists(path):
+                    os.remove(path)
+            else:
+                write_atomic(path, files[name])
+        if os.path.exists(self.legacy_path):
+            os.remove(self.legacy_path)
+
+    @staticmethod
+    def window(days, today=None):
+        '''最近 days 天（含今天）的日期键，按时间先后排列'''
+        today = today or datetime.now().date()
+        return [(today - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days - 1, -1, -1)]
+
+    def summarize(self, steam_ids, days, today=None):
+        '''汇总窗口内指定玩家的数据：
+        players {steamid: 分钟}、daily {steamid: {day: 分钟}}、
+        games {gameid: [分钟, 局数, 玩家数]}、longest [[分钟, steamid, gameid, end_time], ...]'''
+        wanted = set(steam_ids)
+        players, daily, games, longest = {}, {}, {}, []
+        game_players = {}
+        for day in self.window(days, today):
+            for sid, by_game in self.days.get(day, {}).items():
+                if sid not in wanted:
+                    continue
+                for gameid, (minutes, sessions) in by_game.items():
+                    players[sid] = players.get(sid, 0) + minutes
+                    per_day = daily.setdefault(sid, {})
+                    per_day[day] = per_day.get(day, 0) + minutes
+                    entry = games.setdefault(gameid, [0.0, 0, 0])
+                    entry[0] += minutes
+                    entry[1] += sessions
+                    game_players.setdefault(gameid, set()).add(sid)
+            longest.extend(x for x in self.longest.get(day, ()) if x[1] in wanted)
+        for gameid, sids in game_players.items():
+            games[gameid][2] = len(sids)
+        longest.sort(key=lambda x: -x[0])
+        return {"players": players, "daily": daily, "games": games, "longest": longest}
@@ -0,0 +1,69 @@
+import heapq
+
+class PollScheduler:
+    '''按玩家状态安排下次查询时间的优先队列
+    游戏中/在线/刚有变化的玩家每轮都查，离线越久查得越少，但间隔不超过 max_interval，
+    保证状态变化的最长发现延迟有上限。'''
+
+    def __init__(self, base_interval, max_interval):
+        self.base_interval = base_interval
+        self.max_interval = max(base_interval, max_interval)
+        self._heap = []  # (到期时间, steamid)，过期条目惰性删除
+        self._due = {}   # steamid -> 当前有效的到期时间
+
+    def __len__(self):
+        return len(self._due)
+
+    def _push(self, sid, due_at):
+        self._due[sid] = due_at
+        heapq.heappush(self._heap, (due_at, sid))
+
+    def sync(self, steam_ids, now):
+        '''与当前监控列表同步：新增的玩家立即到期，已移除的玩家不再调度'''
+        wanted = set(steam_ids)
+        for sid in list(self._due):
+            if sid not in wanted:
+                del self._due[sid]
+        for sid in steam_ids:
+            if sid not in self._due:
+                self._push(sid, now)
+        if len(self._heap) > 2 * len(self._due) + 64:
+            # 惰性删除积累过多时重建堆
+            self._heap = [(t, sid) for sid, t in self._due.items()]
+            heapq.heapify(self._heap)
+
+    def pop_due(self, until):
+        '''取出所有到期时间不晚于 until 的玩家'''
+        due = []
+        while self._heap and self._heap[0][0] <= until:
+            due_at, sid = heapq.heappop(self._heap)
+            if self._due.get(sid) == due_at:
+                del self._due[sid]
+                due.append(sid)
+        return due
+
+    def expedite(self, steam_ids, now):
+        '''让指定玩家立即到期（下一轮就查询），用于刷新过期的缓存状态'''
+        for sid in steam_ids:
+            if self._due.get(sid, now + 1) > now:
+                self._push(sid, now)
+
+    def interval_for(self, status, now, changed=False):
+        '''根据玩家状态与最近活动计算下次查询间隔'''
+        if changed or not status:
+            # 刚发生变化或查询失败：下一轮继续关注
+            return self.base_interval
+        if status.gameid or status.online:
+            return self.base_interval
+        lastlogoff = status.lastlogoff
+        offline_for = now - int(lastlogoff) if lastlogoff else None
+        if offline_for is not None and offline_for < 3600:
+            interval = self.base_interval * 2
+        elif offline_for is not None and offline_for < 86400:
+            interval = self.base_interval * 4
+        else:
+            interval = self.max_interval
+        return min(interval, self.max_interval)
+
+    def reschedule(self, sid, status, now, changed=False):
+        self._push(sid, now + self.interval_for(status, now, changed))
@@ -0,0 +1,93 @@
+import asyncio
+
+class FlightAborted(Exception):
+    '''负责执行请求的调用被取消，等待者需要自己重新发起'''
+
+class SingleFlight:
+    '''进行中请求登记表：同一个 key 的并发调用只真正执行一次，其余调用等待同一个 future'''
+
+    def __init__(self):
+        self._inflight = {}
+
+    def _settle(self, fut, result=None, error=None):
+        if fut.done():
+            return
+        if isinstance(error, asyncio.CancelledError):
+            # 发起者被取消不代表等待者被取消：不取消共享 future，改为通知等待者重试
+            error = FlightAborted()
+        if error is not None:
+            fut.set_exception(error)
+            # 标记异常已被读取，避免没有等待者时事件循环打印告警
+            fut.exception()
+        else:
+            fut.set_result(result)
+
+    async def do(self, key, factory):
+        '''执行 factory()；若相同 key 的请求正在进行，则直接等待其结果（发起者被取消时自己重新执行）'''
+        while True:
+            fut = self._inflight.get(key)
+            if fut is None:
+                break
+            try:
+                return await asyncio.shield(fut)
+            except FlightAborted:
+                continue
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            result = await factory()
+        except BaseException as e:
+            self._settle(fut, error=e)
+            raise
+        else:
+            self._settle(fut, result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    async def do_many(self, keys, batch_factory):
+        '''批量版本：已在进行中的 key 直接等待，其余 key 合并交给 batch_factory(keys) 一次获取。
+        batch_factory 返回 {key: 结果} 字典，缺失的 key 结果为 None。返回 {key: 结果}。'''
+        loop = asyncio.get_running_loop()
+        waiting = {}
+        owned = {}
+        for key in keys:
+            if key in waiting or key in owned:
+                continue
+            fut = self._inflight.get(key)
+            if fut is not None:
+                waiting[key] = fut
+            else:
+                fut = loop.create_future()
+                self._inflight[key] = fut
+                owned[key] = fut
+        results = {}
+        if owned:
+            try:
+                fetched = await batch_factory(list(owned))
+            except BaseException as e:
+                for fut in owned.values():
+                    self._settle(fut, error=e)
+                raise
+            else:
+                for key, fut in owned.items():
+                    results[key] = fetched.get(key)
+                    self._settle(fut, results[key])
+            finally:
+                for key in owned:
+                    self._inflight.pop(key, None)
+        aborted = []
+        for key, fut in waiting.items():
+            try:
+                results[key] = await asyncio.shield(fut)
+            except asyncio.CancelledError:
+                # shield 之下只有当前任务自己被取消才会走到这里
+                raise
+            except FlightAborted:
+                aborted.append(key)
+            except Exception:
+                results[key] = None
+        if aborted:
+            # 这些 key 的发起者被取消：由本次调用重新获取
+            results.update(await self.do_many(aborted, batch_factory))
+        return results
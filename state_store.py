@@ -0,0 +1,31 @@
+import os
+import time
+from .json_file import JsonFile
+
+class StateSnapshotStore:
+    '''监控状态快照：保存 last_states / start_play_times 等运行状态，
+    重启后可直接从快照继续轮询，不丢失进行中的游戏会话。
+    写入先落到临时文件再原子替换，磁盘操作都在线程中执行。'''
+
+    def __init__(self):
+        self.path = os.path.join(os.path.dirname(__file__), "state_snapshot.json")
+        self._file = JsonFile(self.path)
+
+    async def load(self):
+        '''读取快照，不存在或损坏时返回 None'''
+        try:
+            return await self._file.load()
+        except Exception:
+            return None
+
+    async def save(self, last_states, start_play_times, state_updated_at, running, notify_session, api_usage=None):
+        snapshot = {
+            "saved_at": int(time.time()),
+            "running": running,
+            "notify_session": notify_session,
+            "last_states": last_states,
+            "start_play_times": start_play_times,
+            "state_updated_at": state_updated_at,
+            "api_usage": api_usage or {}
+        }
+        await self._file.save(snapshot)
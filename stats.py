@@ -0,0 +1,74 @@
+def _fmt_sec(seconds):
+    if seconds == float("inf"):
+        return ">60秒"
+    if seconds < 1:
+        return f"{seconds * 1000:.0f}毫秒"
+    return f"{seconds:.1f}秒"
+
+def _hist_line(hist):
+    avg = hist.sum / hist.count if hist.count else 0
+    return f"{hist.count} 次，平均 {_fmt_sec(avg)}，p50≤{_fmt_sec(hist.quantile(0.5))}，p95≤{_fmt_sec(hist.quantile(0.95))}"
+
+def _ratio(part, total):
+    return f"{part / total * 100:.1f}%" if total else "-"
+
+async def handle_steam_stats(self, event):
+    '''汇总运行指标：轮询耗时、各接口延迟、重试与失败、缓存命中率、通知队列与游玩记录规模'''
+    m = self.metrics
+    lines = ["Steam监控运行指标："]
+    lines.append(f"监控玩家: {m.read('steam_monitored_players')} 个，监控{'运行中' if self.running else '未运行'}")
+    rounds = m.histogram("steam_poll_round_seconds")
+    if rounds:
+        lines.append(f"轮询: {_hist_line(rounds)}，异常 {m.counter_value('steam_poll_errors_total'):.0f} 轮")
+    else:
+        lines.append("轮询: 暂无数据")
+    for labels, hist in sorted(m.series("steam_api_request_seconds"), key=lambda x: x[0].get("endpoint", "")):
+        endpoint = labels.get("endpoint", "")
+        errors = sum(
+            v for l, v in m.counter_series("steam_api_requests_total")
+            if l.get("endpoint") == endpoint and l.get("status") != "200"
+        )
+        lines.append(f"接口 {endpoint}: {_hist_line(hist)}，非200 {errors:.0f} 次")
+    lines.append(
+        f"批量查询: 重试 {m.counter_value('steam_api_retries_total'):.0f} 次，"
+        f"放弃 {m.counter_value('steam_api_failures_total'):.0f} 批"
+    )
+    hedged = m.counter_value("steam_api_hedged_total")
+    if hedged:
+        lines.append(f"对冲请求: {hedged:.0f} 次")
+    for breaker in self.breakers.values():
+        if breaker.trips or breaker.state != "closed":
+            lines.append(f"熔断器 {breaker.summary()}")
+    hits = m.counter_value("game_name_cache_requests_total", result="hit")
+    misses = m.counter_value("game_name_cache_requests_total", result="miss")
+    lines.append(
+        f"游戏名缓存: 命中率 {_ratio(hits, hits + misses)}（命中 {hits:.0f} / 未命中 {misses:.0f}），"
+        f"条目 {m.read('game_name_cache_entries')}"
+    )
+    hits = m.counter_value("openbox_profile_cache_total", result="hit")
+    misses = m.counter_value("openbox_profile_cache_total", result="miss")
+    if hits or misses:
+        lines.append(f"/steam openbox: 玩家信息缓存命中率 {_ratio(hits, hits + misses)}（命中 {hits:.0f} / 查询 {misses:.0f}）")
+    cached = m.counter_value("steam_list_requests_total", source="cache")
+    live = m.counter_value("steam_list_requests_total", source="live")
+    lines.append(f"/steam list: 读缓存 {cached:.0f} 次，实时查询 {live:.0f} 次")
+    lines.append(self.notifier.summary())
+    if self.RECONCILE_INTERVAL:
+        added = m.counter_value("steam_reconcile_minutes_total", direction="add")
+        removed = m.counter_value("steam_reconcile_minutes_total", direction="remove")
+        lines.append(
+            f"会话对账: 校正 {m.counter_value('steam_reconcile_adjustments_total'):.0f} 条"
+            f"（补录 {added:.0f} 分钟，扣除 {removed:.0f} 分钟），查询失败 {m.counter_value('steam_reconcile_failures_total'):.0f} 次"
+        )
+    lines.append(self.key_pool.summary())
+    if self.cluster is not None:
+        lines.append(self.cluster.summary())
+        applied = m.counter_value("steam_cluster_transitions_applied_total")
+        lines.append(f"  其他实例转发的状态变化: {applied:.0f} 条")
+    if len(self.key_pool) > 1 or any(k.benched() for k in self.key_pool.keys):
+        lines.extend(self.key_pool.key_lines())
+    lines.append(
+        f"游玩记录: {m.read('steam_game_log_records')} 条，"
+        f"占用 {m.read('steam_game_log_disk_bytes') / 1024 / 1024:.1f}MB"
+    )
+    yield event.plain_result("\n".join(lines))
@@ -0,0 +1,41 @@
+import time
+import random
+
+# 凌晨退出游戏时随机附带的吐槽
+NIGHT_TAILS = [
+    "解锁称号：速通人生（0.5分钟版）",
+    "你是夜猫子吗？咱可是正经猫娘喵，要睡觉的！",
+    "肝游戏不如肝工作，至少你老板会给你五险一金",
+    "你妈半夜起来看你还亮着屏幕，现在已经在抄家伙了喵",
+    "解锁称号：现实技能点全点在了虚拟肝上",
+    "你再不睡，你妈今晚就得拿电蚊拍给你开机重启了喵",
+    "再玩下去，咱怕你不是通关，是通灵了喵",
+    "你还在玩吗？咱都猫叫一晚上了喵～",
+    "你玩得再久，头发也不会原地复生的喵",
+    "主人再打下去，咱就得学急救知识啦，虽然咱是猫不会按人中喵～",
+    "主人你再不睡，咱今晚就罢工不喵叫了，气鼓鼓(｡•ˇ‸ˇ•｡)",
+    "解锁称号：‘玩到天明’，友情提示：你明天死定了喵～"
+]
+
+def format_duration(minutes):
+    '''游玩时长：一小时内按分钟显示，否则按小时显示'''
+    if minutes < 60:
+        return f"{minutes:.1f}分钟"
+    return f"{minutes/60:.1f}小时"
+
+def play_tail(duration_min, hour=None):
+    '''按游玩时长（凌晨则随机）挑选退出游戏通知的结尾'''
+    hour = time.localtime().tm_hour if hour is None else hour
+    if 1 <= hour < 6:
+        return random.choice(NIGHT_TAILS)
+    if duration_min < 5:
+        return "这也叫玩？开机都没热！"
+    if duration_min < 10:
+        return "疲软无力的~杂鱼~"
+    if duration_min < 30:
+        return "热身运动，指尖刚热"
+    if duration_min < 60:
+        return "轻松娱乐一下，刚刚好喵~"
+    if duration_min < 120:
+        return "认认真真地沉浸了一阵子喵~"
+    return "根本停不下来喵！眼睛都要冒烟啦！"
@@ -1,42 +1,121 @@
 import time
+from astrbot.api import logger
+from .status_text import format_duration
 
-async def handle_steam_list(self, event):
-    '''列出所有玩家当前状态'''
+def _format_age(seconds):
+    if seconds < 60:
+        return f"{int(seconds)}秒前"
+    if seconds < 3600:
+        return f"{seconds/60:.0f}分钟前"
+    return f"{seconds/3600:.1f}小时前"
+
+async def _render_head(self, sid, status):
+    '''状态文本中只取决于状态字段的部分（不含随时间变化的时长）'''
+    name = status.name or sid
+    if status.gameid:
+        zh_game_name = await self.get_chinese_game_name(status.gameid, status.gameextrainfo)
+        return f"🟢 {name} 正在玩\n{zh_game_name}"
+    elif status.online:
+        return f"🟡 {name} 在线"
+    else:
+        return f"⚪️ {name} 离线"
+
+async def render_status(self, sid, status, now):
+    '''把单个玩家状态渲染成 /steam list 的一段文本
+    不变的部分按状态指纹缓存在 self._status_lines，状态未变化的玩家不再查询游戏名、重新拼接文本'''
+    fingerprint = status.fingerprint()
+    cached = self._status_lines.get(sid)
+    if cached is None or cached[0] != fingerprint:
+        cached = self._status_lines[sid] = (fingerprint, await _render_head(self, sid, status))
+    head = cached[1]
+    if status.gameid:
+        # 游玩时长以监控中记录的会话开始时间为准（实时查询的状态本身不带会话信息）
+        tracked = self.last_states.get(sid)
+        if tracked is not None and tracked.gameid == status.gameid:
+            if tracked.session_start is None:
+                tracked.session_start = now
+            start = tracked.session_start
+        else:
+            start = now
+        return f"{head} 已玩{format_duration((now - start) / 60)}"
+    elif not status.online and status.lastlogoff:
+        hours_ago = (now - int(status.lastlogoff)) / 3600
+        return f"{head}\n上次在线 {hours_ago:.1f} 小时前"
+    return head
+
+async def _refresh_stale(self, steam_ids):
+    '''后台刷新过期的缓存状态
+    监控运行中时：开启自适应轮询则交给调度器在下一轮查询；否则直接对这些玩家执行一次状态检测
+    （与轮询互斥，正常检测状态变化并推送）。未运行时直接拉取并写入缓存'''
+    if self.running:
+        if self.ADAPTIVE_POLLING:
+            self.scheduler.expedite(steam_ids, time.time())
+            return
+        # 分片模式下只刷新本实例负责的玩家，其余玩家的状态由持有分片的实例发布
+        polled = set(self.polled_ids())
+        steam_ids = [sid for sid in steam_ids if sid in polled]
+        if not steam_ids:
+            return
+        try:
+            async with self._round_lock:
+                await self.check_status_change(steam_ids)
+        except Exception as e:
+            logger.warning(f"后台刷新玩家状态失败: {e}")
+        return
+    try:
+        statuses, _ = await self.fetch_players_status(steam_ids, retry=1)
+    except Exception as e:
+        logger.warning(f"后台刷新玩家状态失败: {e}")
+        return
+    now = int(time.time())
+    for sid, status in statuses.items():
+        prev = self.last_states.get(sid)
+        if status.gameid and prev is not None and prev.gameid == status.gameid:
+            status.session_start = prev.session_start
+        self.last_states[sid] = status
+        self.state_updated_at[sid] = now
+
+async def handle_steam_list(self, event, live=False, steam_ids=None):
+    '''列出所有玩家当前状态
+    默认直接读取轮询缓存（显示每条状态的更新时间），超过 list_fresh_sec 的条目在后台刷新；
+    live=True 或完全没有缓存时实时查询；steam_ids 为要列出的玩家（默认全部监控玩家）'''
+    steam_ids = self.STEAM_IDS if steam_ids is None else steam_ids
     start_time = time.time()
     msg_lines = []
     now = int(time.time())
-    for idx, sid in enumerate(self.STEAM_IDS):
-        status = await self.fetch_player_status(sid, retry=1)
-        if not status:
-            msg_lines.append(f"❌ [{sid}] 获取失败")
-        else:
-            name = status.get('name') or sid
-            gameid = status.get('gameid')
-            game = status.get('gameextrainfo')
-            lastlogoff = status.get('lastlogoff')
-            personastate = status.get('personastate', 0)
-            zh_game_name = await self.get_chinese_game_name(gameid, game) if gameid else (game or "未知游戏")
-            if gameid:
-                if sid not in self.start_play_times:
-                    self.start_play_times[sid] = now
-                play_seconds = now - self.start_play_times[sid]
-                play_minutes = play_seconds / 60
-                if play_minutes < 60:
-                    play_str = f"{play_minutes:.1f}分钟"
-                else:
-                    play_str = f"{play_minutes/60:.1f}小时"
-                msg = f"🟢 {name} 正在玩\n{zh_game_name} 已玩{play_str}"
-                msg_lines.append(msg)
-            elif personastate and int(personastate) > 0:
-                msg_lines.append(f"🟡 {name} 在线")
-            elif lastlogoff:
-                hours_ago = (now - int(lastlogoff)) / 3600
-                msg_lines.append(f"⚪️ {name} 离线\n上次在线 {hours_ago:.1f} 小时前")
+    cached = {sid: self.last_states.get(sid) for sid in steam_ids}
+    use_cache = not live and any(st is not None and st.personastate is not None for st in cached.values())
+    self.metrics.inc("steam_list_requests_total", source="cache" if use_cache else "live")
+    if use_cache:
+        stale = []
+        for sid in steam_ids:
+            status = cached[sid]
+            updated_at = self.state_updated_at.get(sid)
+            if not status or updated_at is None:
+                stale.append(sid)
+                msg_lines.append(f"⏳ [{sid}] 暂无缓存，正在后台刷新")
+            else:
+                age = now - updated_at
+                if age > self.LIST_FRESH_SEC:
+                    stale.append(sid)
+                msg_lines.append(await render_status(self, sid, status, now) + f"\n（{_format_age(age)}更新）")
+            # 每位玩家后都加一个空行
+            msg_lines.append("")
+        if stale:
+            self._spawn(_refresh_stale(self, stale))
+        source = "缓存" if not stale else f"缓存，{len(stale)}条后台刷新中"
+    else:
+        statuses, _ = await self.fetch_players_status(steam_ids, retry=1)
+        for idx, sid in enumerate(steam_ids):
+            status = statuses.get(sid)
+            if not status:
+                msg_lines.append(f"❌ [{sid}] 获取失败")
             else:
-                msg_lines.append(f"⚪️ {name} 离线")
-        # 每位玩家后都加一个空行
-        msg_lines.append("")
+                msg_lines.append(await render_status(self, sid, status, now))
+            # 每位玩家后都加一个空行
+            msg_lines.append("")
+        source = "实时"
     elapsed = time.time() - start_time
     output = "\n".join(msg_lines)
-    output += f"[{elapsed:.2f} 秒]"
+    output += f"[{source} {elapsed:.2f} 秒]"
     yield event.plain_result(output)
@@ -0,0 +1,98 @@
+import os
+import asyncio
+from .json_file import JsonFile
+
+# 订阅全部监控玩家（steam_ids 配置中的所有玩家，含之后新增的）
+ALL = "*"
+
+class SubscriptionTable:
+    '''会话订阅表：会话 -> 关注的 SteamID 集合
+    所有会话共用一条轮询流水线，轮询的是所有会话关注玩家的并集，
+    状态变化只推送给关注该玩家的会话。'''
+
+    def __init__(self):
+        self.path = os.path.join(os.path.dirname(__file__), "subscriptions.json")
+        self._file = JsonFile(self.path)
+        self._lock = asyncio.Lock()
+        self._subs = None  # session -> set(SteamID 或 ALL)
+        self.existed = False  # 加载时订阅表文件是否已存在（不存在说明是引入订阅表之前的数据）
+
+    async def load(self):
+        if self._subs is not None:
+            return
+        async with self._lock:
+            if self._subs is not None:
+                return
+            try:
+                data = await self._file.load()
+                self.existed = data is not None
+                self._subs = {session: set(ids) for session, ids in (data or {}).items()}
+            except Exception:
+                self._subs = {}
+
+    async def _save(self):
+        await self._file.save({s: sorted(ids) for s, ids in self._subs.items()})
+
+    def __bool__(self):
+        return bool(self._subs)
+
+    def sessions(self):
+        return list(self._subs or {})
+
+    def get(self, session):
+        return set((self._subs or {}).get(session, ()))
+
+    async def subscribe(self, session, steam_ids=None):
+        '''订阅指定玩家；steam_ids 为空时订阅全部监控玩家'''
+        await self.load()
+        ids = self._subs.setdefault(session, set())
+        ids.update(steam_ids or [ALL])
+        await self._save()
+
+    async def unsubscribe(self, session, steam_ids=None):
+        '''取消订阅指定玩家；steam_ids 为空时移除该会话的全部订阅。返回是否有变化'''
+        await self.load()
+        if session not in self._subs:
+            return False
+        if steam_ids:
+            before = len(self._subs[session])
+            self._subs[session].difference_update(steam_ids)
+            changed = len(self._subs[session]) != before
+            if not self._subs[session]:
+                del self._subs[session]
+        else:
+            del self._subs[session]
+            changed = True
+        if changed:
+            await self._save()
+        return changed
+
+    async def clear(self):
+        await self.load()
+        self._subs.clear()
+        await self._save()
+
+    def ids_for(self, session, configured_ids):
+        '''会话关注的玩家列表（展开 ALL），未订阅的会话返回全部监控玩家'''
+        ids = self.get(session)
+        if not ids or ALL in ids:
+            extra = [sid for sid in ids if sid != ALL and sid not in configured_ids]
+            return list(configured_ids) + sorted(extra)
+        return [sid for sid in configured_ids if sid in ids] + sorted(ids - set(configured_ids))
+
+    def union(self, configured_ids):
+        '''需要轮询的全部玩家（去重）：监控列表 + 各会话单独订阅的玩家'''
+        ids = dict.fromkeys(configured_ids)
+        for subs in (self._subs or {}).values():
+            for sid in subs:
+                if sid != ALL:
+                    ids.setdefault(sid)
+        return list(ids)
+
+    def sessions_for(self, steamid, configured_ids):
+        '''关注该玩家的所有会话'''
+        in_config = steamid in configured_ids
+        return [
+            session for session, ids in (self._subs or {}).items()
+            if steamid in ids or (in_config and ALL in ids)
+        ]
@@ -0,0 +1,11 @@
+import os
+import sys
+import importlib
+
+# 插件目录本身是一个包（内部使用相对导入），把上级目录加入 sys.path 后按目录名导入
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+PACKAGE = os.path.basename(ROOT)
+
+def plugin_module(name):
+    return importlib.import_module(f"{PACKAGE}.{name}")
@@ -0,0 +1,59 @@
+import asyncio
+import sqlite3
+from conftest import plugin_module
+
+ShardCoordinator = plugin_module("cluster").ShardCoordinator
+
+A_IDS = [f"7656119800000{i:04d}" for i in range(40)]
+B_IDS = [f"7656119800001{i:04d}" for i in range(40)]
+
+def _stall(db_path, instance, seconds):
+    '''模拟实例停顿：把它的心跳往前拨，下一次其他实例 rebalance 时会把它当作失效实例清理'''
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE members SET heartbeat = heartbeat - ? WHERE instance = ?", (seconds, instance))
+    conn.commit()
+    conn.close()
+
+def _polled(*coordinators):
+    return {sid for c in coordinators for sid in c.owned_ids}
+
+def test_shards_cover_union_of_watch_lists(tmp_path):
+    async def run():
+        db = str(tmp_path / "cluster.db")
+        a = ShardCoordinator(db, "a", shard_count=8, lease_ttl=5)
+        b = ShardCoordinator(db, "b", shard_count=8, lease_ttl=5)
+        try:
+            for _ in range(2):
+                await a.rebalance(A_IDS)
+                await b.rebalance(B_IDS)
+            await a.rebalance(A_IDS)
+            assert a.shards.isdisjoint(b.shards)
+            assert len(a.shards) + len(b.shards) == 8
+            assert _polled(a, b) == set(A_IDS) | set(B_IDS)
+        finally:
+            await a.close()
+            await b.close()
+    asyncio.run(run())
+
+def test_reaped_instance_reregisters_watch_list(tmp_path):
+    async def run():
+        db = str(tmp_path / "cluster.db")
+        a = ShardCoordinator(db, "a", shard_count=8, lease_ttl=1)
+        b = ShardCoordinator(db, "b", shard_count=8, lease_ttl=1)
+        try:
+            await a.rebalance(A_IDS)
+            await b.rebalance(B_IDS)
+            # a 的一轮轮询超过租约有效期：b 把它当作失效实例清理，a 的 watch 记录被删除
+            _stall(db, "a", 10)
+            await b.rebalance(B_IDS)
+            assert a.instance_id not in {r[0] for r in a._conn.execute("SELECT instance FROM members")}
+            assert not set(A_IDS) & set(b.owned_ids)
+            # a 恢复后重新加入，监控列表没变也要重新登记
+            await a.rebalance(A_IDS)
+            await b.rebalance(B_IDS)
+            await a.rebalance(A_IDS)
+            assert _polled(a, b) == set(A_IDS) | set(B_IDS)
+        finally:
+            await a.close()
+            await b.close()
+    asyncio.run(run())
@@ -0,0 +1,58 @@
+from conftest import plugin_module
+
+player_state = plugin_module("player_state")
+PlayerState, diff_states = player_state.PlayerState, player_state.diff_states
+START, SWITCH, STOP = player_state.START, player_state.SWITCH, player_state.STOP
+
+NOW = 1_800_000_000
+
+def _state(sid, gameid=None, game=None, personastate=1, session_start=None, name="p"):
+    return PlayerState(sid, name=name, personastate=personastate, gameid=gameid,
+                       gameextrainfo=game, session_start=session_start)
+
+def _snapshot(states):
+    return {sid: (st.gameid, st.personastate, st.session_start) for sid, st in states.items()}
+
+def test_start_switch_stop_and_continue():
+    prev = {
+        "a": _state("a"),
+        "b": _state("b", "570", "Dota 2", session_start=NOW - 600),
+        "c": _state("c", "730", "CS2", session_start=NOW - 300),
+        "d": _state("d", "570", "Dota 2", session_start=NOW - 900),
+    }
+    current = {
+        "a": _state("a", "570", "Dota 2"),
+        "b": _state("b", "730", "CS2"),
+        "c": _state("c", personastate=0),
+        "d": _state("d", "570", "Dota 2"),
+    }
+    events, starts = diff_states(prev, current, NOW)
+    assert [(e.kind, e.steamid) for e in events] == [(START, "a"), (SWITCH, "b"), (STOP, "c")]
+    switch, stop = events[1], events[2]
+    assert (switch.prev_gameid, switch.gameid, switch.session_start) == ("570", "730", NOW - 600)
+    assert (stop.prev_gameid, stop.prev_game, stop.session_start) == ("730", "CS2", NOW - 300)
+    assert starts == {"a": NOW, "b": NOW, "c": None, "d": NOW - 900}
+
+def test_inputs_are_not_modified():
+    prev = {"a": _state("a", "570", session_start=NOW - 60), "b": _state("b")}
+    current = {"a": _state("a", "730"), "b": _state("b", "570"), "c": _state("c", "440")}
+    before_prev, before_cur = _snapshot(prev), _snapshot(current)
+    diff_states(prev, current, NOW)
+    assert _snapshot(prev) == before_prev
+    assert _snapshot(current) == before_cur
+
+def test_new_player_in_game_starts_session():
+    events, starts = diff_states({}, {"a": _state("a", "570", "Dota 2")}, NOW)
+    assert [(e.kind, e.game) for e in events] == [(START, "Dota 2")]
+    assert starts == {"a": NOW}
+
+def test_online_offline_changes_produce_no_events():
+    prev = {"a": _state("a", personastate=1), "b": _state("b", personastate=0)}
+    current = {"a": _state("a", personastate=0), "b": _state("b", personastate=3)}
+    events, starts = diff_states(prev, current, NOW)
+    assert events == []
+    assert starts == {"a": None, "b": None}
+
+def test_name_falls_back_to_steamid():
+    events, _ = diff_states({}, {"a": _state("a", "570", name=None)}, NOW)
+    assert events[0].name == "a"
@@ -0,0 +1,85 @@
+import os
+import json
+import time
+from datetime import datetime
+from conftest import plugin_module
+
+PlaytimeRollup = plugin_module("rollups").PlaytimeRollup
+
+def _ts(day, hour=12):
+    return int(datetime.strptime(f"{day} {hour}", "%Y-%m-%d %H").timestamp())
+
+def _item(day, sid="1", gameid="570", duration=30.0, **extra):
+    return dict(steamid=sid, player_name=f"p{sid}", gameid=gameid, game_name="Dota 2",
+                duration=duration, end_time=_ts(day), **extra)
+
+def test_only_changed_months_are_rewritten(tmp_path):
+    path = str(tmp_path / "game_log_rollup")
+    rollup = PlaytimeRollup(path)
+    rollup.add(_item("2026-01-10"))
+    rollup.add(_item("2026-02-03"))
+    rollup.write(rollup.dumps())
+    assert sorted(os.listdir(path)) == ["2026-01.json", "2026-02.json", "meta.json"]
+    january = os.path.getmtime(os.path.join(path, "2026-01.json"))
+
+    time.sleep(0.01)
+    rollup.add(_item("2026-02-04", duration=10.0))
+    files = rollup.dumps()
+    assert set(files) == {"2026-02.json", "meta.json"}
+    rollup.write(files)
+    assert os.path.getmtime(os.path.join(path, "2026-01.json")) == january
+    assert not rollup.dirty
+
+    loaded = PlaytimeRollup(path)
+    assert loaded.load()
+    assert loaded.days == rollup.days
+    assert loaded.last_end_time == _ts("2026-02-04")
+
+def test_prune_drops_old_days_and_empty_months(tmp_path):
+    path = str(tmp_path / "game_log_rollup")
+    rollup = PlaytimeRollup(path)
+    for day in ("2026-01-10", "2026-02-03", "2026-02-20"):
+        rollup.add(_item(day))
+    rollup.write(rollup.dumps())
+    assert rollup.prune_before("2026-02-10") == 2
+    rollup.write(rollup.dumps())
+    assert sorted(os.listdir(path)) == ["2026-02.json", "meta.json"]
+    loaded = PlaytimeRollup(path)
+    assert loaded.load()
+    assert list(loaded.days) == ["2026-02-20"]
+    assert list(loaded.longest) == ["2026-02-20"]
+
+def test_legacy_single_file_is_migrated(tmp_path):
+    path = str(tmp_path / "game_log_rollup")
+    old = PlaytimeRollup(path)
+    old.add(_item("2026-01-10"))
+    old.add(_item("2026-03-01", source="reconcile"))
+    legacy = {"days": old.days, "longest": old.longest, "player_names": old.player_names,
+              "game_names": old.game_names, "last_end_time": old.last_end_time}
+    with open(path + ".json", "w", encoding="utf-8") as f:
+        json.dump(legacy, f)
+
+    rollup = PlaytimeRollup(path)
+    assert rollup.load()
+    rollup.write(rollup.dumps())
+    assert not os.path.exists(path + ".json")
+    assert sorted(os.listdir(path)) == ["2026-01.json", "2026-03.json", "meta.json"]
+    loaded = PlaytimeRollup(path)
+    assert loaded.load()
+    assert loaded.days == old.days
+    assert loaded.days["2026-03-01"]["1"]["570"] == [30.0, 0]
+
+def test_corrupt_partition_is_rebuilt(tmp_path):
+    path = str(tmp_path / "game_log_rollup")
+    rollup = PlaytimeRollup(path)
+    rollup.add(_item("2026-01-10"))
+    rollup.add(_item("2026-02-03"))
+    rollup.write(rollup.dumps())
+    with open(os.path.join(path, "2026-01.json"), "w") as f:
+        f.write("{")
+    rebuilt = PlaytimeRollup(path)
+    assert not rebuilt.load()
+    # 从游玩记录重建时只剩 2 月的记录：1 月的分区随之删除
+    rebuilt.add(_item("2026-02-03"))
+    rebuilt.write(rebuilt.dumps())
+    assert sorted(os.listdir(path)) == ["2026-02.json", "meta.json"]